@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# Not imported from aider_mcp_server.atoms.utils: importing the package creates
+# its loggers, which must already see the test state directory
+STATE_DIR_ENV = "AIDER_MCP_STATE_DIR"
+
+_state_dir = None
+
+
+def pytest_configure(config):
+    """Keep the state the tests write (logs, journals, indexes) out of the repo."""
+    global _state_dir
+    if STATE_DIR_ENV not in os.environ:
+        _state_dir = tempfile.mkdtemp(prefix="aider-mcp-state-")
+        os.environ[STATE_DIR_ENV] = _state_dir
+
+
+def pytest_unconfigure(config):
+    if _state_dir is not None:
+        os.environ.pop(STATE_DIR_ENV, None)
+        shutil.rmtree(_state_dir, ignore_errors=True)
@@ -1,8 +1,28 @@
 import argparse
 import asyncio
 
-from aider_mcp_server.atoms.utils import DEFAULT_EDITOR_MODEL
-from aider_mcp_server.server import serve
+from aider_mcp_server.atoms.admission import DEFAULT_QUEUE_TIMEOUT
+from aider_mcp_server.atoms.cache_warmer import DEFAULT_WARMING_PINGS
+from aider_mcp_server.atoms.cassette import DEFAULT_CASSETTE_DIR
+from aider_mcp_server.atoms.http_client import DEFAULT_MAX_CONNECTIONS
+from aider_mcp_server.atoms.job_pool import (
+    DEFAULT_MAX_INFLIGHT_PER_CLIENT,
+    DEFAULT_MAX_WORKERS,
+)
+from aider_mcp_server.atoms.job_store import DEFAULT_JOB_STORE_PATH
+from aider_mcp_server.atoms.sessions import DEFAULT_IDLE_TIMEOUT, DEFAULT_MAX_SESSIONS
+from aider_mcp_server.atoms.utils import DEFAULT_EDITOR_MODEL, STATE_DIR_ENV
+from aider_mcp_server.atoms.verify import DEFAULT_CHECK_TIMEOUT
+from aider_mcp_server.atoms.warm_state import (
+    DEFAULT_SAVE_INTERVAL,
+    DEFAULT_WARM_STATE_PATH,
+)
+from aider_mcp_server.server import (
+    DEFAULT_SSE_HOST,
+    DEFAULT_SSE_PORT,
+    TRANSPORTS,
+    serve,
+)
 
 
 def main():
@@ -24,13 +44,227 @@ def main():
         required=True,
         help="Current working directory (must be a valid git repository)",
     )
+    parser.add_argument(
+        "--http-pool-size",
+        type=int,
+        default=DEFAULT_MAX_CONNECTIONS,
+        help=(
+            "Maximum pooled HTTP connections shared by all LLM requests "
+            f"(default: {DEFAULT_MAX_CONNECTIONS})"
+        ),
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="stdio",
+        help=(
+            "Client transport: stdio serves one client, sse serves many clients "
+            "over HTTP (default: stdio)"
+        ),
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_SSE_HOST,
+        help=f"Host to bind the sse transport to (default: {DEFAULT_SSE_HOST})",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_SSE_PORT,
+        help=f"Port for the sse transport (default: {DEFAULT_SSE_PORT})",
+    )
+    parser.add_argument(
+        "--unix-socket",
+        type=str,
+        default=None,
+        help="Unix socket path for the sse transport, used instead of host/port",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Aider jobs that may run concurrently (default: {DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--max-inflight-per-client",
+        type=int,
+        default=DEFAULT_MAX_INFLIGHT_PER_CLIENT,
+        help=(
+            "Aider jobs one client may have running before its further calls "
+            f"wait (default: {DEFAULT_MAX_INFLIGHT_PER_CLIENT})"
+        ),
+    )
+    parser.add_argument(
+        "--job-store",
+        type=str,
+        default=DEFAULT_JOB_STORE_PATH,
+        help=(
+            "Sqlite file that keeps aider_ai_code results, relative to the state "
+            f"directory; empty to disable (default: {DEFAULT_JOB_STORE_PATH})"
+        ),
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        default=None,
+        help=(
+            "Memory budget for aider jobs; calls beyond it queue, then get a "
+            "retry-after hint. 0 disables (default: 75%% of system memory)"
+        ),
+    )
+    parser.add_argument(
+        "--admission-timeout",
+        type=float,
+        default=DEFAULT_QUEUE_TIMEOUT,
+        help=(
+            "Seconds an aider job waits for memory before it is rejected "
+            f"(default: {DEFAULT_QUEUE_TIMEOUT})"
+        ),
+    )
+    parser.add_argument(
+        "--cache-warming-pings",
+        type=int,
+        default=DEFAULT_WARMING_PINGS,
+        help=(
+            "Keepalive pings (one every ~5 minutes) that keep each model's prompt "
+            f"cache warm after its last job (default: {DEFAULT_WARMING_PINGS})"
+        ),
+    )
+    parser.add_argument(
+        "--map-latency-target",
+        type=float,
+        default=None,
+        help=(
+            "Target seconds per job; adapts each repository's repo map budget "
+            "(down to no map) to meet it (default: Aider's fixed budget)"
+        ),
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=DEFAULT_MAX_SESSIONS,
+        help=(
+            "Multi-turn sessions kept alive at once; the least recently used are "
+            f"saved to disk (default: {DEFAULT_MAX_SESSIONS})"
+        ),
+    )
+    parser.add_argument(
+        "--session-idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help=(
+            "Seconds after which an unused session is saved to disk and dropped "
+            f"(default: {DEFAULT_IDLE_TIMEOUT})"
+        ),
+    )
+
+    parser.add_argument(
+        "--lint-cmd",
+        default=None,
+        help=(
+            "Lint command for jobs that ask for verification; {files} is replaced "
+            "by the changed files, e.g. 'ruff check {files}'"
+        ),
+    )
+    parser.add_argument(
+        "--test-cmd",
+        default=None,
+        help=(
+            "Test command for jobs that ask for verification; {files} is replaced "
+            "by the tests affected by the changed files, e.g. 'pytest -q {files}'"
+        ),
+    )
+    parser.add_argument(
+        "--check-timeout",
+        type=float,
+        default=DEFAULT_CHECK_TIMEOUT,
+        help=(
+            f"Seconds a lint or test command may run (default: {DEFAULT_CHECK_TIMEOUT})"
+        ),
+    )
+
+    parser.add_argument(
+        "--provider-config",
+        default=None,
+        help=(
+            "JSON file with the provider profile: model_provider to map models "
+            "to and per-provider litellm settings (default: from the environment)"
+        ),
+    )
+
+    parser.add_argument(
+        "--record-dir",
+        default=None,
+        help=(
+            "Record every aider_ai_code job (request, files and LLM replies) "
+            "into a cassette in this directory, relative to the state directory, "
+            "for aider-mcp-replay "
+            f"(e.g. {DEFAULT_CASSETTE_DIR}; default: off)"
+        ),
+    )
+
+    parser.add_argument(
+        "--warm-state",
+        type=str,
+        default=DEFAULT_WARM_STATE_PATH,
+        help=(
+            "File the warm caches are saved to on shutdown and periodically, "
+            "and restored from at startup, relative to the state directory; "
+            "empty to disable "
+            f"(default: {DEFAULT_WARM_STATE_PATH})"
+        ),
+    )
+    parser.add_argument(
+        "--warm-state-interval",
+        type=float,
+        default=DEFAULT_SAVE_INTERVAL,
+        help=(
+            "Seconds between snapshots of the warm caches, 0 to only save on "
+            f"shutdown (default: {DEFAULT_SAVE_INTERVAL})"
+        ),
+    )
+
+    parser.add_argument(
+        "--state-dir",
+        default=None,
+        help=(
+            "Directory for the journals, job store, sessions, symbol indexes, "
+            f"profiles, cassettes and warm state (default: ${STATE_DIR_ENV}, "
+            "else $XDG_STATE_HOME/aider-mcp-server or "
+            "~/.local/state/aider-mcp-server)"
+        ),
+    )
 
     args = parser.parse_args()
 
     # Run the server asynchronously
     asyncio.run(
         serve(
-            editor_model=args.editor_model, current_working_dir=args.current_working_dir
+            editor_model=args.editor_model,
+            current_working_dir=args.current_working_dir,
+            http_pool_size=args.http_pool_size,
+            transport=args.transport,
+            host=args.host,
+            port=args.port,
+            unix_socket=args.unix_socket,
+            max_workers=args.max_workers,
+            max_inflight_per_client=args.max_inflight_per_client,
+            job_store_path=args.job_store or None,
+            memory_budget_mb=args.memory_budget_mb,
+            admission_timeout=args.admission_timeout,
+            cache_warming_pings=args.cache_warming_pings,
+            map_latency_target=args.map_latency_target,
+            max_sessions=args.max_sessions,
+            session_idle_timeout=args.session_idle_timeout,
+            lint_cmd=args.lint_cmd,
+            test_cmd=args.test_cmd,
+            check_timeout=args.check_timeout,
+            provider_config=args.provider_config,
+            record_dir=args.record_dir,
+            warm_state_path=args.warm_state or None,
+            warm_state_interval=args.warm_state_interval,
+            state_dir=args.state_dir,
         )
     )
 
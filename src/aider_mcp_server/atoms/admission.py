@@ -0,0 +1,238 @@
+import asyncio
+import contextlib
+import math
+import os
+import subprocess
+import threading
+import time
+from collections.abc import AsyncIterator
+from typing import Any, Optional
+
+import psutil
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+
+# Fixed cost of a Coder with its model, IO and chat history before any files
+BASE_JOB_BYTES = 150 * MB
+# Files end up in memory several times over (content, chat messages, tokens)
+FILE_BYTES_MULTIPLIER = 8
+# Tree-sitter tags and cache entries kept per tracked file by the repo map
+REPO_MAP_BYTES_PER_FILE = 32 * 1024
+
+DEFAULT_BUDGET_FRACTION = 0.75
+DEFAULT_QUEUE_TIMEOUT = 30.0
+DEFAULT_RETRY_AFTER = 30.0
+
+# How long a repository's tracked file count is reused before recounting
+_TRACKED_FILES_TTL = 300.0
+_tracked_files: dict[str, tuple[float, int]] = {}
+_tracked_files_lock = threading.Lock()
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job does not fit in the memory budget."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def default_memory_budget() -> int:
+    """
+    Get the default memory budget for the server process.
+
+    Returns:
+        DEFAULT_BUDGET_FRACTION of the machine's total memory, in bytes
+    """
+    return int(psutil.virtual_memory().total * DEFAULT_BUDGET_FRACTION)
+
+
+def _count_tracked_files(working_dir: str) -> int:
+    now = time.monotonic()
+    with _tracked_files_lock:
+        cached = _tracked_files.get(working_dir)
+    if cached is not None and now - cached[0] < _TRACKED_FILES_TTL:
+        return cached[1]
+
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z"],
+            cwd=working_dir,
+            capture_output=True,
+            check=True,
+        )
+        count = result.stdout.count(b"\0")
+    except (OSError, subprocess.CalledProcessError):
+        # Not a git repository, so aider builds no repo map
+        count = 0
+
+    with _tracked_files_lock:
+        _tracked_files[working_dir] = (now, count)
+    return count
+
+
+def estimate_job_cost(working_dir: str, relative_files: list[str]) -> int:
+    """
+    Estimate the peak memory an aider job will need.
+
+    Args:
+        working_dir: The repository the job runs in
+        relative_files: Editable and read-only files of the job
+
+    Returns:
+        Estimated bytes, from the file sizes and the size of the repo map
+    """
+    file_bytes = 0
+    for fname in relative_files:
+        try:
+            file_bytes += os.path.getsize(os.path.join(working_dir, fname))
+        except OSError:
+            # New files start empty
+            pass
+
+    repo_map_bytes = _count_tracked_files(working_dir) * REPO_MAP_BYTES_PER_FILE
+    return BASE_JOB_BYTES + file_bytes * FILE_BYTES_MULTIPLIER + repo_map_bytes
+
+
+class AdmissionController:
+    """Admits jobs only while the process stays within its memory budget."""
+
+    def __init__(
+        self,
+        memory_budget: Optional[int] = None,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            memory_budget: Bytes the server process may use. Defaults to
+                default_memory_budget().
+            queue_timeout: Seconds a job waits for memory before it is rejected
+        """
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.queue_timeout = queue_timeout
+        self._process = psutil.Process()
+        self._baseline_rss = self._process.memory_info().rss
+        self._lock = threading.Lock()
+        self._changed: Optional[asyncio.Condition] = None
+        self._reserved = 0
+        self._inflight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._avg_duration: Optional[float] = None
+
+    def _projected(self, estimate: int) -> int:
+        # RSS lags behind jobs that are still loading, so count in-flight
+        # reservations on top of the baseline until RSS catches up.
+        rss = self._process.memory_info().rss
+        return max(rss, self._baseline_rss + self._reserved) + estimate
+
+    def _fits(self, estimate: int) -> bool:
+        # A lone job is always admitted so an idle server can make progress
+        return self._inflight == 0 or self._projected(estimate) <= self.memory_budget
+
+    def retry_after(self) -> float:
+        """
+        Suggest when a rejected client should try again.
+
+        Returns:
+            Seconds, based on how long recent jobs took to finish
+        """
+        if self._avg_duration is None:
+            return DEFAULT_RETRY_AFTER
+        return float(max(1, math.ceil(self._avg_duration)))
+
+    def _reject(self, message: str) -> AdmissionRejected:
+        with self._lock:
+            self._rejected += 1
+        retry_after = self.retry_after()
+        logger.warning(f"{message}; retry after {retry_after}s")
+        return AdmissionRejected(message, retry_after)
+
+    @contextlib.asynccontextmanager
+    async def admit(self, estimate: int) -> AsyncIterator[None]:
+        """
+        Hold a memory reservation for the duration of a job.
+
+        Waits up to queue_timeout for running jobs to release memory.
+
+        Args:
+            estimate: Estimated bytes the job needs, see estimate_job_cost()
+
+        Raises:
+            AdmissionRejected: If the job does not fit in the budget in time
+        """
+        if estimate > self.memory_budget:
+            raise self._reject(
+                f"Job needs about {estimate // MB} MB, more than the memory "
+                f"budget of {self.memory_budget // MB} MB"
+            )
+
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        changed = self._changed
+
+        async with changed:
+            if not self._fits(estimate):
+                self._queued += 1
+                try:
+                    # Memory is freed by jobs finishing, which notify us, but
+                    # RSS can also drop on its own, so re-check periodically.
+                    deadline = time.monotonic() + self.queue_timeout
+                    while not self._fits(estimate):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject(
+                                f"Memory budget of {self.memory_budget // MB} MB "
+                                f"exhausted by {self._inflight} running jobs"
+                            )
+                        with contextlib.suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(
+                                changed.wait(), timeout=min(remaining, 1.0)
+                            )
+                finally:
+                    self._queued -= 1
+            with self._lock:
+                self._reserved += estimate
+                self._inflight += 1
+                self._admitted += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - started
+            async with changed:
+                with self._lock:
+                    self._reserved -= estimate
+                    self._inflight -= 1
+                    if self._avg_duration is None:
+                        self._avg_duration = duration
+                    else:
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                changed.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report admission state.
+
+        Returns:
+            Dictionary with the budget, memory use and job counters
+        """
+        with self._lock:
+            return {
+                "memory_budget_mb": self.memory_budget // MB,
+                "rss_mb": self._process.memory_info().rss // MB,
+                "reserved_mb": self._reserved // MB,
+                "inflight": self._inflight,
+                "queued": self._queued,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "retry_after": self.retry_after(),
+            }
@@ -0,0 +1,211 @@
+import threading
+import time
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Provider prompt caches expire after about five minutes without use
+DEFAULT_WARMING_INTERVAL = 5 * 60 - 5
+DEFAULT_WARMING_PINGS = 0
+
+# Appended to the cached prefix so the ping ends with a user turn
+_PING_MESSAGE = {"role": "user", "content": "Reply with OK."}
+
+
+def stable_prefix(chunks: Any) -> list[dict[str, Any]]:
+    """
+    Get the part of an Aider prompt that is shared by jobs on the same repo.
+
+    Args:
+        chunks: The ChatChunks Aider formatted for a request
+
+    Returns:
+        The system prompt, examples, read-only files and repo map messages
+    """
+    return chunks.system + chunks.examples + chunks.readonly_files + chunks.repo
+
+
+class CacheWarmer:
+    """Keeps provider prompt caches warm between bursts of jobs."""
+
+    def __init__(
+        self,
+        pings: int = DEFAULT_WARMING_PINGS,
+        interval: float = DEFAULT_WARMING_INTERVAL,
+    ):
+        """
+        Initialize the warmer.
+
+        Args:
+            pings: Keepalive pings sent after the last job for each prefix,
+                0 disables warming
+            interval: Seconds between pings, just under the cache lifetime
+        """
+        self.pings = pings
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # (model, repo) -> latest prefix, model extra params, pings left, due time
+        self._prefixes: dict[tuple[str, str], dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._sent = 0
+        self._errors = 0
+        self._cache_hit_tokens = 0
+
+    def register(
+        self,
+        model: str,
+        repo: str,
+        messages: list[dict[str, Any]],
+        extra_params: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """
+        Keep the cached prefix of the latest job for a model and repo warm.
+
+        Args:
+            model: The model name the prefix was sent to
+            repo: The repository the job ran against
+            messages: The stable prompt prefix, see stable_prefix()
+            extra_params: The model's extra litellm parameters
+        """
+        if self.pings <= 0 or not messages:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._prefixes[(model, repo)] = {
+                "messages": messages,
+                "extra_params": dict(extra_params or {}),
+                "pings_left": self.pings,
+                "due": time.monotonic() + self.interval,
+            }
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="cache-warmer", daemon=True
+                )
+                self._thread.start()
+            self._wakeup.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                due = [
+                    (key, entry)
+                    for key, entry in self._prefixes.items()
+                    if entry["due"] <= now
+                ]
+                for key, entry in due:
+                    entry["pings_left"] -= 1
+                    entry["due"] = now + self.interval
+                    if entry["pings_left"] <= 0:
+                        del self._prefixes[key]
+                if not due:
+                    next_due = min(
+                        (entry["due"] for entry in self._prefixes.values()),
+                        default=now + self.interval,
+                    )
+                    self._wakeup.wait(timeout=max(next_due - now, 0.1))
+                    continue
+
+            for (model, _), entry in due:
+                self._ping(model, entry["messages"], entry["extra_params"])
+
+    def _ping(
+        self, model: str, messages: list[dict[str, Any]], extra_params: dict[str, Any]
+    ) -> None:
+        import litellm
+
+        kwargs = dict(extra_params)
+        kwargs["max_tokens"] = 1
+        try:
+            completion = litellm.completion(
+                model=model,
+                messages=messages + [_PING_MESSAGE],
+                stream=False,
+                **kwargs,
+            )
+        except Exception as e:
+            logger.warning(f"Cache warming ping to {model} failed: {e}")
+            with self._lock:
+                self._errors += 1
+            return
+
+        usage = getattr(completion, "usage", None)
+        hit_tokens = (
+            getattr(usage, "prompt_cache_hit_tokens", 0)
+            or getattr(usage, "cache_read_input_tokens", 0)
+            or 0
+        )
+        with self._lock:
+            self._sent += 1
+            self._cache_hit_tokens += hit_tokens
+        logger.info(f"Warmed {hit_tokens} cached prompt tokens for {model}")
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report warming activity.
+
+        Returns:
+            Dictionary with the tracked prefixes and ping counters
+        """
+        with self._lock:
+            return {
+                "pings_per_prefix": self.pings,
+                "interval": self.interval,
+                "warm_prefixes": len(self._prefixes),
+                "pings_sent": self._sent,
+                "ping_errors": self._errors,
+                "cache_hit_tokens": self._cache_hit_tokens,
+            }
+
+    def close(self) -> None:
+        """Stop sending pings."""
+        with self._lock:
+            self._closed = True
+            self._prefixes.clear()
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_warmer: Optional[CacheWarmer] = None
+_warmer_lock = threading.Lock()
+
+
+def configure_cache_warmer(
+    pings: int = DEFAULT_WARMING_PINGS,
+    interval: float = DEFAULT_WARMING_INTERVAL,
+) -> CacheWarmer:
+    """
+    Replace the process-wide cache warmer.
+
+    Args:
+        pings: Keepalive pings sent after the last job for each prefix
+        interval: Seconds between pings
+
+    Returns:
+        The shared CacheWarmer instance
+    """
+    global _warmer
+    with _warmer_lock:
+        previous = _warmer
+        _warmer = CacheWarmer(pings, interval)
+    if previous is not None:
+        previous.close()
+    return _warmer
+
+
+def get_cache_warmer() -> Optional[CacheWarmer]:
+    """
+    Get the process-wide cache warmer.
+
+    Returns:
+        The shared CacheWarmer, or None if warming has not been configured
+    """
+    return _warmer
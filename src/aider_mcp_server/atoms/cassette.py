@@ -0,0 +1,290 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from aider_mcp_server.atoms.changes import read_files
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.utils import state_path
+
+logger = get_logger(__name__)
+
+CASSETTE_VERSION = 1
+# Relative to the state directory, see utils.state_path()
+DEFAULT_CASSETTE_DIR = "cassettes"
+RECORD = "record"
+REPLAY = "replay"
+# Reply of helper model calls (e.g. chat summaries) during replay
+STUB_RESPONSE = "Ok."
+
+
+def messages_key(messages: list[dict[str, Any]]) -> str:
+    """Hash the messages of an LLM call, to match it with its recorded reply."""
+    encoded = json.dumps(messages, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class Cassette:
+    """One aider_ai_code job: its request, its files and the model's replies.
+
+    While recording, every LLM reply is appended in call order. While
+    replaying, each call gets the unused reply recorded for the same
+    messages, or else the next unused reply, so that calls whose prompt
+    differs slightly (e.g. a repo map built from fewer files) still line up.
+    """
+
+    def __init__(self, data: Optional[dict[str, Any]] = None):
+        self.data: dict[str, Any] = data or {
+            "version": CASSETTE_VERSION,
+            "recorded_at": time.time(),
+            "request": {},
+            "job": {},
+            "files": {},
+            "interactions": [],
+            "result": {},
+        }
+        self.mode = RECORD
+        self._used: set[int] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Cassette":
+        """
+        Read a cassette file.
+
+        Args:
+            path: The cassette file
+
+        Returns:
+            The cassette
+
+        Raises:
+            ValueError: If the file is not a cassette of this version
+        """
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read cassette {path}: {e}") from e
+        if not isinstance(data, dict) or data.get("version") != CASSETTE_VERSION:
+            raise ValueError(
+                f"{path} is not a version {CASSETTE_VERSION} cassette, record it again"
+            )
+        return cls(data)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Write the cassette to a file, replacing it in one step.
+
+        Args:
+            path: The cassette file
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with self._lock:
+            tmp_path.write_text(json.dumps(self.data, indent=1), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def snapshot_files(self, working_dir: str, relative_files: list[str]) -> None:
+        """
+        Keep the current content of files that are not in the cassette yet.
+
+        Args:
+            working_dir: The repository the paths are relative to
+            relative_files: The files, None is kept for missing files
+        """
+        files = self.data["files"]
+        new_files = [f for f in dict.fromkeys(relative_files) if f not in files]
+        contents = read_files(os.path.join(working_dir, f) for f in new_files)
+        for rel in new_files:
+            content = contents[os.path.join(working_dir, rel)]
+            files[rel] = (
+                content.decode("utf-8", errors="replace")
+                if isinstance(content, bytes)
+                else None
+            )
+
+    def add_interaction(
+        self, model: str, messages: list[dict[str, Any]], content: str
+    ) -> None:
+        """
+        Record the reply of an LLM call.
+
+        Args:
+            model: The model that replied
+            messages: The messages sent
+            content: The full reply
+        """
+        with self._lock:
+            self.data["interactions"].append(
+                {"key": messages_key(messages), "model": model, "content": content}
+            )
+
+    def next_response(self, messages: list[dict[str, Any]]) -> Optional[str]:
+        """
+        Find the recorded reply of an LLM call during replay.
+
+        Args:
+            messages: The messages sent
+
+        Returns:
+            The reply, None when every recorded reply has been used
+        """
+        key = messages_key(messages)
+        with self._lock:
+            unused = [
+                (index, interaction)
+                for index, interaction in enumerate(self.data["interactions"])
+                if index not in self._used
+            ]
+            if not unused:
+                return None
+            index, interaction = next(
+                ((i, item) for i, item in unused if item["key"] == key), unused[0]
+            )
+            if interaction["key"] != key:
+                logger.debug(f"No recorded reply for messages {key}, using call order")
+            self._used.add(index)
+            return interaction["content"]
+
+
+_active: contextvars.ContextVar[Optional[Cassette]] = contextvars.ContextVar(
+    "aider_mcp_cassette", default=None
+)
+
+
+@contextmanager
+def use_cassette(cassette: Cassette, mode: str = RECORD) -> Iterator[Cassette]:
+    """
+    Record or replay the LLM calls made in this context.
+
+    Threads started inside the context only see the cassette if they run in
+    a copy of it, see contextvars.copy_context().
+
+    Args:
+        cassette: The cassette to record into or replay from
+        mode: RECORD or REPLAY
+
+    Yields:
+        The cassette
+    """
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"mode must be {RECORD!r} or {REPLAY!r}")
+    cassette.mode = mode
+    token = _active.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active.reset(token)
+
+
+def current_cassette() -> Optional[Cassette]:
+    """
+    Get the cassette of the current context.
+
+    Returns:
+        The cassette, None when LLM calls are neither recorded nor replayed
+    """
+    return _active.get()
+
+
+class CassetteRecorder:
+    """Records every aider_ai_code job into a cassette file."""
+
+    def __init__(self, output_dir: Optional[str] = None):
+        self.output_dir = output_dir or state_path(DEFAULT_CASSETTE_DIR)
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def record(
+        self,
+        job_id: str,
+        request: dict[str, Any],
+        job: dict[str, Any],
+        working_dir: str,
+    ) -> Iterator[Cassette]:
+        """
+        Record one job, saving its cassette when the job ends.
+
+        Args:
+            job_id: The job's id, used as file name
+            request: The validated MCP arguments of the job
+            job: The arguments the job runs code_with_aider with, except the
+                working directory
+            working_dir: The repository the job runs in
+
+        Yields:
+            The cassette; set its "result" before the block ends
+        """
+        cassette = Cassette()
+        cassette.data["job_id"] = job_id
+        cassette.data["request"] = request
+        cassette.data["job"] = job
+        cassette.snapshot_files(
+            working_dir,
+            job.get("relative_editable_files", [])
+            + job.get("relative_readonly_files", []),
+        )
+
+        path = os.path.join(self.output_dir, f"{job_id}.json")
+        try:
+            with use_cassette(cassette, RECORD):
+                yield cassette
+        finally:
+            try:
+                cassette.save(path)
+                logger.info(
+                    f"Recorded {len(cassette.data['interactions'])} LLM replies "
+                    f"of job {job_id} to {path}"
+                )
+                with self._lock:
+                    self._recorded += 1
+            except OSError as e:
+                logger.warning(f"Cannot save cassette {path}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the recorded jobs.
+
+        Returns:
+            Dictionary with the cassette directory and number of recordings
+        """
+        with self._lock:
+            return {"output_dir": self.output_dir, "recorded": self._recorded}
+
+
+_recorder: Optional[CassetteRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def configure_recorder(output_dir: Optional[str]) -> Optional[CassetteRecorder]:
+    """
+    Start or stop recording aider_ai_code jobs.
+
+    Args:
+        output_dir: Directory the cassettes are written to, None to not record
+
+    Returns:
+        The shared CassetteRecorder, None when recording is off
+    """
+    global _recorder
+    with _recorder_lock:
+        _recorder = CassetteRecorder(output_dir) if output_dir else None
+        return _recorder
+
+
+def get_recorder() -> Optional[CassetteRecorder]:
+    """
+    Get the process-wide cassette recorder.
+
+    Returns:
+        The shared CassetteRecorder, None when recording is off
+    """
+    return _recorder
@@ -0,0 +1,216 @@
+import hashlib
+import os
+from collections.abc import Iterable
+from typing import Any, Optional, Union
+
+from grep_ast import filename_to_lang
+from grep_ast.tsl import get_parser
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Files larger than this are only hashed for change detection, not kept in
+# memory or parsed
+MAX_COMPARE_BYTES = 1024 * 1024
+_HASH_CHUNK_BYTES = 256 * 1024
+
+
+class LargeFile:
+    """Stands in for the content of a file too large to keep, by size and hash."""
+
+    __slots__ = ("size", "sha256")
+
+    def __init__(self, size: int, sha256: str):
+        self.size = size
+        self.sha256 = sha256
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, LargeFile) and (self.size, self.sha256) == (
+            other.size,
+            other.sha256,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.size, self.sha256))
+
+    def __repr__(self) -> str:
+        return f"LargeFile(size={self.size}, sha256={self.sha256[:12]})"
+
+
+# Content of a file, its LargeFile stand-in, or None if it does not exist
+FileSnapshot = Union[bytes, LargeFile, None]
+
+
+def _hash_stream(f: Any, size: int) -> LargeFile:
+    """Hash an open file chunk by chunk, without holding its content."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    return LargeFile(size, digest.hexdigest())
+
+
+def read_files(
+    paths: Iterable[str], max_bytes: Optional[int] = None
+) -> dict[str, FileSnapshot]:
+    """
+    Read the content of files.
+
+    Args:
+        paths: Absolute paths of the files
+        max_bytes: Files larger than this are hashed while streaming and
+            returned as a LargeFile, None to always read the content
+
+    Returns:
+        Absolute path -> content, None for files that do not exist
+    """
+    contents: dict[str, FileSnapshot] = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if max_bytes is not None and size > max_bytes:
+                    contents[path] = _hash_stream(f, size)
+                else:
+                    contents[path] = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            contents[path] = None
+        except OSError as e:
+            logger.warning(f"Cannot read {path} for change detection: {e}")
+            contents[path] = None
+    return contents
+
+
+def content_hash(content: FileSnapshot) -> Optional[str]:
+    """Hash file content, None for a missing file."""
+    if isinstance(content, LargeFile):
+        return content.sha256
+    return None if content is None else hashlib.sha256(content).hexdigest()
+
+
+def _syntax_tokens(
+    fname: str, content: bytes
+) -> Optional[tuple[list[tuple[str, bytes, int]], bool]]:
+    """
+    Tokenize a source file with tree-sitter, ignoring comments and whitespace.
+
+    Args:
+        fname: The file name, which selects the language
+        content: The file content
+
+    Returns:
+        Tuple of (leaf tokens with their nesting depth, whether the file has
+        syntax errors), or None if the language is not supported
+    """
+    lang = filename_to_lang(fname)
+    if not lang:
+        return None
+    try:
+        parser = get_parser(lang)
+    except Exception:
+        return None
+
+    tree = parser.parse(content)
+    tokens = []
+    stack = [(tree.root_node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if "comment" in node.type:
+            continue
+        if node.child_count == 0:
+            if node.text:
+                tokens.append((node.type, node.text, depth))
+            continue
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return tokens, tree.root_node.has_error
+
+
+def describe_change(
+    fname: str, before: FileSnapshot, after: FileSnapshot
+) -> Optional[dict[str, Any]]:
+    """
+    Classify how a file changed.
+
+    Args:
+        fname: The file's path, relative to the working directory
+        before: Content before the job, None if the file did not exist
+        after: Content after the job, None if the file no longer exists
+
+    Returns:
+        None if the content is identical, otherwise a dictionary with the
+        "path", its "status" (created, modified or deleted), whether the change
+        is "meaningful" (more than whitespace and comments), whether the new
+        content "parses" (None for unsupported languages and files larger
+        than MAX_COMPARE_BYTES, whose every change is meaningful) and its
+        "sha256"
+    """
+    if before == after:
+        return None
+
+    change: dict[str, Any] = {
+        "path": fname,
+        "status": "created"
+        if before is None
+        else "deleted"
+        if after is None
+        else "modified",
+        "meaningful": True,
+        "parses": None,
+        "sha256": content_hash(after),
+    }
+    if after is None:
+        return change
+    if (
+        # Too large to parse: any change counts
+        isinstance(after, LargeFile)
+        or isinstance(before, LargeFile)
+        or len(after) > MAX_COMPARE_BYTES
+        or len(before or b"") > MAX_COMPARE_BYTES
+    ):
+        return change
+
+    syntax_after = _syntax_tokens(fname, after)
+    if syntax_after is not None:
+        tokens_after, has_error = syntax_after
+        change["parses"] = not has_error
+        if before is not None:
+            syntax_before = _syntax_tokens(fname, before)
+            change["meaningful"] = syntax_before is None or (
+                syntax_before[0] != tokens_after
+            )
+        else:
+            change["meaningful"] = bool(tokens_after)
+    else:
+        # Unknown language: only changes beyond whitespace count
+        change["meaningful"] = (before or b"").split() != after.split()
+    return change
+
+
+def detect_changes(
+    before: dict[str, FileSnapshot],
+    after: dict[str, FileSnapshot],
+    working_dir: str,
+) -> list[dict[str, Any]]:
+    """
+    Compare the files of a job before and after it ran.
+
+    Files with identical content are skipped without parsing, so the cost is
+    one comparison per unchanged file, or one hash comparison for files read
+    as LargeFile.
+
+    Args:
+        before: Absolute path -> content before the job
+        after: Absolute path -> content after the job
+        working_dir: The directory the reported paths are relative to
+
+    Returns:
+        One description per changed file, see describe_change()
+    """
+    changes = []
+    for path in sorted(set(before) | set(after)):
+        change = describe_change(
+            os.path.relpath(path, working_dir), before.get(path), after.get(path)
+        )
+        if change is not None:
+            changes.append(change)
+    return changes
@@ -1,6 +1,20 @@
-from typing import Any, Optional, Union
+from typing import Any, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+
+from aider_mcp_server.atoms.paths import ignored_paths, normalize_paths
+from aider_mcp_server.atoms.utils import (
+    DEFAULT_MAX_MAP_FILES,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SAMPLE_INTERVAL,
+    DEFAULT_SEARCH_LIMIT,
+    EDIT_FORMATS,
+    MAP_REFRESH_POLICIES,
+    MAX_MAP_TOKENS,
+    MAX_PAGE_SIZE,
+    MAX_REFLECTIONS,
+    SESSION_ID_PATTERN,
+)
 
 
 # MCP Protocol Base Types
@@ -23,19 +37,454 @@ class MCPErrorResponse(MCPResponse):
     error: str
 
 
-# Tool-specific request parameter models
+def _file_list(value: Any) -> Any:
+    """Accept a single file path (or null) where a list is expected."""
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else value
+
+
+def _check_files(
+    value: list[str], info: ValidationInfo, editable: bool = False
+) -> list[str]:
+    """
+    Normalize and dedupe file paths against the working directory in the context.
+
+    Args:
+        value: The requested paths
+        info: Validation info whose context may hold the "working_dir"
+        editable: Also reject files that git or Aider ignore
+
+    Returns:
+        The normalized paths
+    """
+    working_dir = (info.context or {}).get("working_dir")
+    files = normalize_paths(value, working_dir)
+    if editable and working_dir and files:
+        ignored = ignored_paths(files, working_dir)
+        if ignored:
+            raise ValueError(f"files are ignored by git or .aiderignore: {ignored}")
+    return files
+
+
+_EDITABLE_FILES_DESCRIPTION = "LIST of relative paths to files that can be edited"
+
+
+# Tool-specific request parameter models. Their JSON schemas are the tools'
+# MCP inputSchema, see input_schema()
 class AICodeParams(BaseModel):
     """Parameters for the aider_ai_code tool."""
 
-    ai_coding_prompt: str
-    relative_editable_files: list[str]
-    relative_readonly_files: list[str] = Field(default_factory=list)
+    ai_coding_prompt: str = Field(description="The prompt for the AI to execute")
+    relative_editable_files: list[str] = Field(description=_EDITABLE_FILES_DESCRIPTION)
+    relative_readonly_files: list[str] = Field(
+        default_factory=list,
+        description=(
+            "LIST of relative paths to files that can be read but not "
+            "edited, add files that are not editable but useful for context"
+        ),
+    )
+    model: Optional[str] = Field(
+        default=None,
+        description=(
+            "The primary AI model Aider should use for generating code, "
+            "leave blank unless model is specified in the request"
+        ),
+    )
+    failover_models: Optional[list[str]] = Field(
+        default=None,
+        description=(
+            "Ordered LIST of equivalent models to fall back to when the "
+            "primary model keeps failing, leave blank to use the default "
+            "provider failover"
+        ),
+    )
+    architect: bool = Field(
+        default=False,
+        description=(
+            "Plan the change once with the primary model, then apply it "
+            "to each editable file in parallel with the editor model"
+        ),
+    )
+    editor_model: Optional[str] = Field(
+        default=None,
+        description=(
+            "The model that applies the plan in architect mode, leave "
+            "blank to use the server's editor model"
+        ),
+    )
+    fan_out: bool = Field(
+        default=False,
+        description=(
+            "Plan the change once, then edit each file (or file group) "
+            "in parallel with the primary model"
+        ),
+    )
+    file_groups: Optional[list[list[str]]] = Field(
+        default=None,
+        description=(
+            "LIST of groups of editable files that one architect or "
+            "fan-out editor edits together, other files are edited alone"
+        ),
+    )
+
+    # Aider performance settings, None keeps Aider's default
+    map_tokens: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description=(
+            "Token budget for the repo map, 0 disables it for the fastest "
+            f"responses (capped at {MAX_MAP_TOKENS})"
+        ),
+    )
+    map_refresh: Optional[str] = Field(
+        default=None,
+        description="How often the repo map is recomputed",
+        json_schema_extra={"enum": list(MAP_REFRESH_POLICIES)},
+    )
+    edit_format: Optional[str] = Field(
+        default=None,
+        description=(
+            "Format the model writes edits in, leave blank for the model's default"
+        ),
+        json_schema_extra={"enum": list(EDIT_FORMATS)},
+    )
+    cache_prompts: Optional[bool] = Field(
+        default=None, description="Enable provider prompt caching"
+    )
+    max_reflections: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description=(
+            "Maximum rounds of fixing edits that failed to apply "
+            f"(capped at {MAX_REFLECTIONS})"
+        ),
+    )
+    stream: Optional[bool] = Field(
+        default=None, description="Stream responses from the provider"
+    )
+
+    auto_context: bool = Field(
+        default=False,
+        description=(
+            "Add the files defining the symbols the editable files use "
+            "as read-only context"
+        ),
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        pattern=SESSION_ID_PATTERN,
+        description=(
+            "Continue the conversation of earlier calls with the same id "
+            "(letters, digits, '.', '_' or '-'); the chat history and "
+            "files are kept, so follow-ups only need the new instruction"
+        ),
+    )
+    dry_run: bool = Field(
+        default=False,
+        description=(
+            "Return the proposed diff without changing any file; the "
+            "editable files must already exist"
+        ),
+    )
+    verify: bool = Field(
+        default=False,
+        description=(
+            "Run the server's lint and test commands on the changed files "
+            "and the tests affected by them; failures get one fix round"
+        ),
+    )
+
+    @field_validator(
+        "relative_editable_files", "relative_readonly_files", mode="before"
+    )
+    @classmethod
+    def _single_file_to_list(cls, value: Any) -> Any:
+        """Accept a single file path (or null) where a list is expected."""
+        return _file_list(value)
+
+    @field_validator("relative_editable_files")
+    @classmethod
+    def _check_editable_files(cls, value: list[str], info: ValidationInfo):
+        """Normalize the editable files and keep them inside the repository."""
+        return _check_files(value, info, editable=True)
+
+    @field_validator("relative_readonly_files")
+    @classmethod
+    def _check_readonly_files(cls, value: list[str], info: ValidationInfo):
+        """Normalize the read-only files and keep them inside the repository."""
+        return _check_files(value, info)
+
+    @field_validator("file_groups")
+    @classmethod
+    def _check_file_groups(
+        cls, value: Optional[list[list[str]]], info: ValidationInfo
+    ) -> Optional[list[list[str]]]:
+        """Normalize grouped files the same way as the editable files."""
+        if value is None:
+            return None
+        return [_check_files(group, info) for group in value]
+
+    @field_validator("map_tokens")
+    @classmethod
+    def _cap_map_tokens(cls, value: Optional[int]) -> Optional[int]:
+        """Cap the repo map budget at the server limit."""
+        return None if value is None else min(value, MAX_MAP_TOKENS)
+
+    @field_validator("max_reflections")
+    @classmethod
+    def _cap_reflections(cls, value: Optional[int]) -> Optional[int]:
+        """Cap the number of reflection rounds at the server limit."""
+        return None if value is None else min(value, MAX_REFLECTIONS)
+
+    @field_validator("edit_format")
+    @classmethod
+    def _check_edit_format(cls, value: Optional[str]) -> Optional[str]:
+        """Only allow edit formats that edit files."""
+        if value is not None and value not in EDIT_FORMATS:
+            raise ValueError(f"edit_format must be one of {EDIT_FORMATS}")
+        return value
+
+    @field_validator("map_refresh")
+    @classmethod
+    def _check_map_refresh(cls, value: Optional[str]) -> Optional[str]:
+        """Only allow the refresh policies Aider's repo map knows."""
+        if value is not None and value not in MAP_REFRESH_POLICIES:
+            raise ValueError(f"map_refresh must be one of {MAP_REFRESH_POLICIES}")
+        return value
 
 
 class ListModelsParams(BaseModel):
     """Parameters for the list_models tool."""
 
-    substring: str = ""
+    substring: str = Field(
+        default="", description="Substring to match against available models"
+    )
+    provider: Optional[str] = Field(
+        default=None, description='Only list models of this provider, e.g. "gemini"'
+    )
+    edit_format: Optional[str] = Field(
+        default=None,
+        description="Only list models Aider edits with this format by default",
+    )
+    capabilities: list[str] = Field(
+        default_factory=list,
+        description=(
+            'Only list models supporting all of these, e.g. "vision" or '
+            '"prompt_caching"'
+        ),
+    )
+    min_context: Optional[int] = Field(
+        default=None, ge=0, description="Minimum context window in tokens"
+    )
+    max_input_price: Optional[float] = Field(
+        default=None,
+        ge=0,
+        description="Maximum price per million input tokens, in USD",
+    )
+    sort: Literal["relevance", "name", "context", "price"] = Field(
+        default="relevance",
+        description=(
+            "Order of the models: best name matches first, by name, largest "
+            "context window first or cheapest first"
+        ),
+    )
+    offset: int = Field(default=0, ge=0, description="Number of models to skip")
+    limit: int = Field(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Maximum number of models to return",
+    )
+
+    @field_validator("substring", mode="before")
+    @classmethod
+    def _no_substring(cls, value: Any) -> Any:
+        """Treat a null substring as matching every model."""
+        return "" if value is None else value
+
+    @field_validator("capabilities", mode="before")
+    @classmethod
+    def _single_capability_to_list(cls, value: Any) -> Any:
+        """Accept a single capability (or null) where a list is expected."""
+        if value is None:
+            return []
+        return [value] if isinstance(value, str) else value
+
+
+class EstimateParams(BaseModel):
+    """Parameters for the aider_estimate tool."""
+
+    ai_coding_prompt: str = Field(
+        default="", description="The prompt for the AI to execute"
+    )
+    relative_editable_files: list[str] = Field(description=_EDITABLE_FILES_DESCRIPTION)
+    relative_readonly_files: list[str] = Field(
+        default_factory=list,
+        description="LIST of relative paths to files that can be read",
+    )
+    model: Optional[str] = Field(
+        default=None, description="The primary AI model the request would use"
+    )
+    map_tokens: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="Repo map token budget, leave blank for the default",
+    )
+
+    @field_validator(
+        "relative_editable_files", "relative_readonly_files", mode="before"
+    )
+    @classmethod
+    def _single_file_to_list(cls, value: Any) -> Any:
+        """Accept a single file path (or null) where a list is expected."""
+        return _file_list(value)
+
+    @field_validator("relative_editable_files", "relative_readonly_files")
+    @classmethod
+    def _check_file_paths(cls, value: list[str], info: ValidationInfo):
+        """Normalize the files and keep them inside the repository."""
+        return _check_files(value, info)
+
+
+class GetJobResultParams(BaseModel):
+    """Parameters for the get_job_result tool."""
+
+    job_id: str = Field(description="The job id reported by aider_ai_code")
+
+
+class ListJobsParams(BaseModel):
+    """Parameters for the list_jobs tool."""
+
+    repo: Optional[str] = Field(
+        default=None,
+        description=(
+            "Repository path to list jobs for, defaults to the server's "
+            "working directory"
+        ),
+    )
+    fingerprint: Optional[str] = Field(
+        default=None, description="Only list jobs with this request fingerprint"
+    )
+    limit: int = Field(default=20, ge=1, description="Maximum number of jobs to return")
+
+
+class RepoMapParams(BaseModel):
+    """Parameters for the repo_map tool."""
+
+    path_prefix: str = Field(
+        default="",
+        description="Only list files whose relative path starts with this",
+    )
+    focus_files: list[str] = Field(
+        default_factory=list,
+        description=(
+            "Relative paths of files of interest; only files defining "
+            "symbols they use are listed, most relevant first"
+        ),
+    )
+    max_files: int = Field(
+        default=DEFAULT_MAX_MAP_FILES,
+        ge=1,
+        description="Maximum number of files to list",
+    )
+
+    @field_validator("path_prefix", mode="before")
+    @classmethod
+    def _no_prefix(cls, value: Any) -> Any:
+        """Treat a null prefix as no prefix."""
+        return "" if value is None else value
+
+    @field_validator("focus_files", mode="before")
+    @classmethod
+    def _single_file_to_list(cls, value: Any) -> Any:
+        """Accept a single file path (or null) where a list is expected."""
+        return _file_list(value)
+
+    @field_validator("focus_files")
+    @classmethod
+    def _check_focus_files(cls, value: list[str], info: ValidationInfo):
+        """Normalize the files and keep them inside the repository."""
+        return _check_files(value, info)
+
+
+class SymbolSearchParams(BaseModel):
+    """Parameters for the symbol_search tool."""
+
+    query: str = Field(
+        min_length=1, description="Part of the symbol name, case-insensitive"
+    )
+    limit: int = Field(
+        default=DEFAULT_SEARCH_LIMIT,
+        ge=1,
+        description="Maximum number of definitions to return",
+    )
+    include_references: bool = Field(
+        default=False, description="Also list the files that use each symbol"
+    )
+
+
+class ServerStatsParams(BaseModel):
+    """Parameters for the server_stats tool, which takes none."""
+
+
+class ProfileNextParams(BaseModel):
+    """Parameters for the profile_next tool."""
+
+    count: int = Field(
+        default=1,
+        ge=0,
+        description="Number of aider_ai_code jobs to profile, 0 to cancel",
+    )
+    mode: Literal["deterministic", "sampling"] = Field(
+        default="deterministic",
+        description=(
+            "deterministic runs the jobs under cProfile and writes pstats files, "
+            "sampling samples their stacks and writes collapsed stacks for "
+            "flame graphs"
+        ),
+    )
+    interval: float = Field(
+        default=DEFAULT_SAMPLE_INTERVAL,
+        gt=0,
+        description="Seconds between stack samples in sampling mode",
+    )
+
+
+def _compact_schema(schema: Any) -> Any:
+    """Drop pydantic's titles and spell optional fields the way MCP clients expect."""
+    if isinstance(schema, list):
+        return [_compact_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    compact = {
+        key: _compact_schema(value) for key, value in schema.items() if key != "title"
+    }
+    options = compact.get("anyOf")
+    if options and len(options) == 2 and {"type": "null"} in options:
+        # Optional[X]: a missing value means the default, so describe X only
+        del compact["anyOf"]
+        compact.update(next(o for o in options if o != {"type": "null"}))
+    if "default" in compact and compact["default"] in (None, [], ""):
+        del compact["default"]
+    return compact
+
+
+def input_schema(params_model: type[BaseModel]) -> dict[str, Any]:
+    """
+    Generate the MCP inputSchema of a tool from its parameter model.
+
+    Args:
+        params_model: The tool's parameter model
+
+    Returns:
+        JSON schema of the tool's arguments
+    """
+    schema = _compact_schema(params_model.model_json_schema())
+    # The tool has its own description
+    schema.pop("description", None)
+    schema.setdefault("properties", {})
+    return schema
 
 
 # Tool-specific response models
@@ -49,7 +498,10 @@ class AICodeResponse(MCPResponse):
 class ListModelsResponse(MCPResponse):
     """Response for the list_models tool."""
 
-    models: list[str]
+    models: list[dict[str, Any]]
+    total: int
+    offset: int
+    next_offset: Optional[int] = None
 
 
 # Specific request types
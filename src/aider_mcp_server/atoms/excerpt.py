@@ -0,0 +1,132 @@
+import io
+import mmap
+import os
+from collections.abc import Iterable
+from typing import Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Bytes shown from the start and the end of a file that is too big to show
+DEFAULT_HEAD_BYTES = 16 * 1024
+DEFAULT_TAIL_BYTES = 4 * 1024
+# Bytes of file content in one fallback, across all files
+DEFAULT_TOTAL_BYTES = 256 * 1024
+# Files larger than this are mapped instead of read
+MMAP_THRESHOLD = 1024 * 1024
+# Like git, a NUL byte in the first 8000 bytes marks a file as binary
+_BINARY_PROBE_BYTES = 8000
+
+
+def is_binary(data: bytes | memoryview | mmap.mmap) -> bool:
+    """Check whether content looks binary."""
+    # A memoryview slice holds ints, so "in" would never find a byte string
+    return b"\0" in bytes(data[:_BINARY_PROBE_BYTES])
+
+
+def _excerpt(data: bytes | memoryview | mmap.mmap, head: int, tail: int) -> str:
+    """Decode the head and tail of content, marking what was left out."""
+    size = len(data)
+    if size <= head + tail:
+        return bytes(data[:]).decode("utf-8", errors="replace")
+    omitted = size - head - tail
+    parts = [bytes(data[:head]).decode("utf-8", errors="replace")]
+    parts.append(f"\n... [{omitted} bytes omitted] ...\n")
+    if tail:
+        parts.append(bytes(data[size - tail :]).decode("utf-8", errors="replace"))
+    return "".join(parts)
+
+
+def file_excerpt(
+    path: str,
+    content: Optional[bytes] = None,
+    head_bytes: int = DEFAULT_HEAD_BYTES,
+    tail_bytes: int = DEFAULT_TAIL_BYTES,
+) -> str:
+    """
+    Show a file's content, or its head and tail if it is large.
+
+    Large files are memory-mapped so only the excerpt is read, and binary
+    files are summarized instead of shown.
+
+    Args:
+        path: The file
+        content: The file's content if it was already read
+        head_bytes: Bytes shown from the start of a large file
+        tail_bytes: Bytes shown from the end of a large file
+
+    Returns:
+        The excerpt
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    if content is not None:
+        view = memoryview(content)
+        if is_binary(view):
+            return f"(Binary file, {len(content)} bytes)"
+        return _excerpt(view, head_bytes, tail_bytes)
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        if size < MMAP_THRESHOLD:
+            data = f.read()
+            if is_binary(data):
+                return f"(Binary file, {size} bytes)"
+            return _excerpt(data, head_bytes, tail_bytes)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if is_binary(mapped):
+                return f"(Binary file, {size} bytes)"
+            return _excerpt(mapped, head_bytes, tail_bytes)
+
+
+def content_fallback(
+    relative_files: Iterable[str],
+    working_dir: Optional[str] = None,
+    contents: Optional[dict[str, Optional[bytes]]] = None,
+    total_bytes: int = DEFAULT_TOTAL_BYTES,
+) -> str:
+    """
+    Show the current content of files when no diff is available.
+
+    Args:
+        relative_files: The files to show
+        working_dir: The directory the files are relative to
+        contents: Absolute path -> content already read, so files are not read
+            again
+        total_bytes: Bytes of content shown across all files; the per-file
+            excerpts shrink to fit and files beyond it are only listed
+
+    Returns:
+        The files' content, one section per file
+    """
+    relative_files = list(relative_files)
+    out = io.StringIO()
+    out.write("Git diff failed. Current file contents:\n\n")
+    budget = total_bytes
+    for index, file_path in enumerate(relative_files):
+        full_path = os.path.join(working_dir, file_path) if working_dir else file_path
+        if budget <= 0:
+            out.write(f"--- {file_path} --- (Omitted, output limit reached)\n\n")
+            continue
+        # Share what is left between the remaining files
+        share = budget // (len(relative_files) - index)
+        head = min(DEFAULT_HEAD_BYTES, share * 4 // 5)
+        tail = min(DEFAULT_TAIL_BYTES, share - head)
+        known = contents.get(os.path.abspath(full_path)) if contents else None
+        try:
+            text = file_excerpt(full_path, known, head, tail)
+        except FileNotFoundError:
+            logger.warning(f"File {full_path} not found during content fallback.")
+            out.write(f"--- {file_path} --- (File not found)\n\n")
+            continue
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed reading file {full_path} for content fallback: {e}")
+            out.write(f"--- {file_path} --- (Error reading file)\n\n")
+            continue
+        budget -= min(len(text), head + tail)
+        out.write(f"--- {file_path} ---\n{text}\n\n")
+    return out.getvalue()
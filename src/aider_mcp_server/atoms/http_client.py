@@ -0,0 +1,226 @@
+import importlib.util
+import threading
+from typing import Any, Optional
+
+import httpx
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 120.0
+DEFAULT_TIMEOUT = httpx.Timeout(timeout=600.0, connect=5.0)
+
+# litellm providers whose sync completion path builds a fresh HTTPHandler (and
+# therefore a fresh TLS connection) per call unless a client is passed in.
+HANDLER_PROVIDERS = frozenset({"gemini", "vertex_ai", "vertex_ai_beta", "anthropic"})
+
+
+class PooledHTTPClients:
+    """Process-wide keep-alive HTTP clients shared by every LLM request."""
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        http2: Optional[bool] = None,
+    ):
+        """
+        Initialize the pooled clients.
+
+        Args:
+            max_connections: Maximum open connections per client
+            keepalive_expiry: Seconds an idle connection is kept for reuse
+            http2: Enable HTTP/2. Defaults to enabled when the h2 package is
+                installed.
+        """
+        if http2 is None:
+            http2 = importlib.util.find_spec("h2") is not None
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connections_opened = 0
+
+        self._transport = httpx.HTTPTransport(http2=http2, limits=self.limits)
+        self._async_transport = httpx.AsyncHTTPTransport(
+            http2=http2, limits=self.limits
+        )
+        self.client = httpx.Client(
+            transport=self._transport,
+            timeout=DEFAULT_TIMEOUT,
+            event_hooks={"request": [self._on_request]},
+        )
+        self.async_client = httpx.AsyncClient(
+            transport=self._async_transport,
+            timeout=DEFAULT_TIMEOUT,
+            event_hooks={"request": [self._on_async_request]},
+        )
+
+    def _count(self, event_name: str) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections_opened += 1
+
+    def _trace(self, event_name: str, info: dict[str, Any]) -> None:
+        self._count(event_name)
+
+    async def _async_trace(self, event_name: str, info: dict[str, Any]) -> None:
+        self._count(event_name)
+
+    def _on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self._requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _on_async_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self._requests += 1
+        request.extensions["trace"] = self._async_trace
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report connection pool statistics.
+
+        Returns:
+            Dictionary with request and connection counters for both clients
+        """
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        with self._lock:
+            requests = self._requests
+            opened = self._connections_opened
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "requests": requests,
+            "connections_opened": opened,
+            "reused_connection_requests": max(requests - opened, 0),
+            "open_connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+        }
+
+    def close(self) -> None:
+        """Close the sync client. The async client is closed by aclose()."""
+        self.client.close()
+
+    async def aclose(self) -> None:
+        """Close both clients."""
+        self.client.close()
+        await self.async_client.aclose()
+
+
+_clients: Optional[PooledHTTPClients] = None
+_clients_lock = threading.Lock()
+
+
+def get_http_clients() -> PooledHTTPClients:
+    """
+    Get the process-wide pooled clients, creating them with defaults if needed.
+
+    Returns:
+        The shared PooledHTTPClients instance
+    """
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            _clients = PooledHTTPClients()
+        return _clients
+
+
+def configure_http_clients(
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+    http2: Optional[bool] = None,
+) -> PooledHTTPClients:
+    """
+    Replace the process-wide pooled clients with newly configured ones.
+
+    Args:
+        max_connections: Maximum open connections per client
+        keepalive_expiry: Seconds an idle connection is kept for reuse
+        http2: Enable HTTP/2, defaults to enabled when h2 is installed
+
+    Returns:
+        The new shared PooledHTTPClients instance
+    """
+    global _clients
+    with _clients_lock:
+        previous = _clients
+        _clients = PooledHTTPClients(max_connections, keepalive_expiry, http2)
+    if previous is not None:
+        previous.close()
+    logger.info(
+        f"Configured pooled HTTP clients: max_connections={max_connections}, "
+        f"keepalive_expiry={keepalive_expiry}s, http2={_clients.http2}"
+    )
+    return _clients
+
+
+def install_litellm_clients() -> None:
+    """
+    Route litellm traffic through the process-wide pooled clients.
+
+    OpenAI-compatible providers pick up litellm.client_session and
+    litellm.aclient_session. Providers in HANDLER_PROVIDERS ignore those and
+    would otherwise open a new connection per sync call, so completion() is
+    wrapped to hand them a pooled HTTPHandler unless the caller passed a client.
+    """
+    import litellm
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+    # litellm's own decorators set __wrapped__, so use a private marker to avoid
+    # wrapping our wrapper when this is called more than once.
+    completion = getattr(litellm.completion, "_unpooled", litellm.completion)
+    sessions = getattr(
+        litellm.completion,
+        "_unpooled_sessions",
+        (litellm.client_session, litellm.aclient_session),
+    )
+
+    clients = get_http_clients()
+    litellm.client_session = clients.client
+    litellm.aclient_session = clients.async_client
+
+    def pooled_completion(*args, **kwargs):
+        if kwargs.get("client") is None and _uses_http_handler(kwargs.get("model")):
+            kwargs["client"] = HTTPHandler(client=get_http_clients().client)
+        return completion(*args, **kwargs)
+
+    pooled_completion._unpooled = completion  # type: ignore[attr-defined]
+    pooled_completion._unpooled_sessions = sessions  # type: ignore[attr-defined]
+    litellm.completion = pooled_completion
+    logger.info("Installed pooled HTTP clients for litellm.")
+
+
+def uninstall_litellm_clients() -> None:
+    """Undo install_litellm_clients(), restoring litellm's completion and sessions."""
+    import litellm
+
+    completion = getattr(litellm.completion, "_unpooled", None)
+    if completion is None:
+        return
+    litellm.client_session, litellm.aclient_session = (
+        litellm.completion._unpooled_sessions
+    )
+    litellm.completion = completion
+    logger.info("Uninstalled pooled HTTP clients for litellm.")
+
+
+def _uses_http_handler(model: Optional[str]) -> bool:
+    if not model:
+        return False
+    import litellm
+
+    try:
+        _, provider, _, _ = litellm.get_llm_provider(model)
+    except Exception:
+        return False
+    return provider in HANDLER_PROVIDERS
@@ -0,0 +1,126 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_INFLIGHT_PER_CLIENT = 2
+
+T = TypeVar("T")
+
+# Semaphore bounding in-flight jobs for the client connection being served
+_client_slots: contextvars.ContextVar[Optional[asyncio.Semaphore]] = (
+    contextvars.ContextVar("client_slots", default=None)
+)
+
+
+class JobPool:
+    """Worker pool shared by every client connection of one server process."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_inflight_per_client: int = DEFAULT_MAX_INFLIGHT_PER_CLIENT,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            max_workers: Number of jobs that may run at the same time
+            max_inflight_per_client: Jobs a single connection may have running;
+                further calls from that connection wait for a free slot
+        """
+        self.max_workers = max_workers
+        self.max_inflight_per_client = max_inflight_per_client
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="aider-job"
+        )
+        self._lock = threading.Lock()
+        self._clients = 0
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+
+    @contextlib.contextmanager
+    def client_connection(self) -> Iterator[None]:
+        """
+        Scope the calls made while serving one client connection.
+
+        Tasks spawned inside this context (such as the MCP request handlers)
+        share a per-connection semaphore that provides backpressure.
+        """
+        token = _client_slots.set(asyncio.Semaphore(self.max_inflight_per_client))
+        with self._lock:
+            self._clients += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._clients -= 1
+            _client_slots.reset(token)
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Run a blocking function on the shared worker pool.
+
+        Args:
+            func: The function to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The return value of func
+        """
+        slots = _client_slots.get()
+        with self._lock:
+            self._waiting += 1
+        try:
+            if slots is not None:
+                await slots.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        with self._lock:
+            self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+            if slots is not None:
+                slots.release()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Report pool usage.
+
+        Returns:
+            Dictionary with connection and job counters
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_inflight_per_client": self.max_inflight_per_client,
+                "clients": self._clients,
+                "waiting": self._waiting,
+                "running": self._running,
+                "completed": self._completed,
+            }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running jobs to finish."""
+        logger.info("Shutting down job pool.")
+        self._executor.shutdown(wait=True)
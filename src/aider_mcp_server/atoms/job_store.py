@@ -0,0 +1,329 @@
+import contextlib
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Relative to the state directory, see utils.state_path()
+DEFAULT_JOB_STORE_PATH = "jobs.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    repo TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    model TEXT,
+    prompt TEXT,
+    success INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    duration REAL,
+    timings TEXT,
+    usage TEXT,
+    diff TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_repo_created ON jobs (repo, created_at);
+CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    diff TEXT,
+    PRIMARY KEY (job_id, path)
+);
+"""
+
+# Columns returned by list_jobs, which leaves out the (large) diffs
+_SUMMARY_KEYS = (
+    "job_id",
+    "repo",
+    "fingerprint",
+    "model",
+    "prompt",
+    "success",
+    "created_at",
+    "duration",
+    "timings",
+    "usage",
+)
+_SUMMARY_COLUMNS = ", ".join(_SUMMARY_KEYS)
+
+_STOP = object()
+
+
+def job_fingerprint(
+    prompt: str,
+    editable_files: list[str],
+    readonly_files: list[str],
+    model: str,
+) -> str:
+    """
+    Compute a stable fingerprint identifying equivalent job requests.
+
+    Args:
+        prompt: The coding prompt
+        editable_files: Files the job may edit
+        readonly_files: Files given as read-only context
+        model: The model used for the job
+
+    Returns:
+        Hex digest that is equal for jobs with the same inputs
+    """
+    payload = json.dumps(
+        [prompt, sorted(editable_files), sorted(readonly_files), model]
+    ).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def split_diff_by_file(diff: str) -> dict[str, str]:
+    """
+    Split a multi-file git diff into one diff per file.
+
+    Args:
+        diff: Output of git diff
+
+    Returns:
+        Mapping of file path to its part of the diff. Empty if the text is not
+        a git diff (e.g. the content fallback or an error message).
+    """
+    files: dict[str, str] = {}
+    path = None
+    chunk: list[str] = []
+    for line in diff.splitlines(keepends=True):
+        if line.startswith("diff --git "):
+            if path is not None:
+                files[path] = "".join(chunk)
+            path = line.rstrip("\n").split(" b/", 1)[-1]
+            chunk = []
+        if path is not None:
+            chunk.append(line)
+    if path is not None:
+        files[path] = "".join(chunk)
+    return files
+
+
+class JobStore:
+    """Sqlite-backed store of finished aider jobs, written on a background thread."""
+
+    def __init__(self, db_path: Union[str, Path]):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path: Path of the sqlite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+        # Jobs queued for writing, so reads never miss a just-finished job
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="job-store-writer", daemon=True
+        )
+        self._writer.start()
+        logger.info(f"Job store opened at: {self.db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, job: dict[str, Any]) -> None:
+        """
+        Queue a finished job for writing without blocking the caller.
+
+        Args:
+            job: Job data with at least job_id, repo, fingerprint, success and
+                created_at. Optional keys: model, prompt, duration, timings,
+                usage and diff.
+        """
+        with self._pending_lock:
+            self._pending[job["job_id"]] = job
+        self._queue.put(job)
+
+    def _write_loop(self) -> None:
+        with contextlib.closing(self._connect()) as conn:
+            while True:
+                job = self._queue.get()
+                try:
+                    if job is _STOP:
+                        return
+                    self._write(conn, job)
+                except Exception as e:
+                    logger.error(f"Failed to store job {job.get('job_id')}: {e}")
+                finally:
+                    if job is not _STOP:
+                        with self._pending_lock:
+                            self._pending.pop(job["job_id"], None)
+                    self._queue.task_done()
+
+    def _write(self, conn: sqlite3.Connection, job: dict[str, Any]) -> None:
+        diff = job.get("diff") or ""
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["job_id"],
+                    job["repo"],
+                    job["fingerprint"],
+                    job.get("model"),
+                    job.get("prompt"),
+                    int(bool(job["success"])),
+                    job["created_at"],
+                    job.get("duration"),
+                    json.dumps(job.get("timings") or {}),
+                    json.dumps(job.get("usage") or {}),
+                    diff,
+                ),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_files VALUES (?, ?, ?)",
+                [
+                    (job["job_id"], path, file_diff)
+                    for path, file_diff in split_diff_by_file(diff).items()
+                ],
+            )
+
+    def flush(self) -> None:
+        """Block until every queued job has been written."""
+        self._queue.join()
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        """
+        Fetch a job with its full and per-file diffs.
+
+        Args:
+            job_id: The job id returned by aider_ai_code
+
+        Returns:
+            The job data, or None if the job is unknown
+        """
+        with self._pending_lock:
+            pending = self._pending.get(job_id)
+        if pending is not None:
+            job = dict(pending)
+            job["files"] = split_diff_by_file(job.get("diff") or "")
+            return job
+
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            files = conn.execute(
+                "SELECT path, diff FROM job_files WHERE job_id = ? ORDER BY path",
+                (job_id,),
+            ).fetchall()
+        job = _row_to_job(row)
+        job["files"] = {f["path"]: f["diff"] for f in files}
+        return job
+
+    def list_jobs(
+        self,
+        repo: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+        limit: int = 20,
+    ) -> list[dict[str, Any]]:
+        """
+        List the most recent jobs, without their diffs.
+
+        Args:
+            repo: Only return jobs run against this repository
+            fingerprint: Only return jobs with this request fingerprint
+            limit: Maximum number of jobs to return
+
+        Returns:
+            Job summaries, newest first
+        """
+        # Queued jobs are listed from memory rather than waiting for the writer
+        with self._pending_lock:
+            pending = [
+                _summary(job)
+                for job in self._pending.values()
+                if (not repo or job["repo"] == repo)
+                and (not fingerprint or job["fingerprint"] == fingerprint)
+            ]
+
+        clauses, args = [], []
+        if repo:
+            clauses.append("repo = ?")
+            args.append(repo)
+        if fingerprint:
+            clauses.append("fingerprint = ?")
+            args.append(fingerprint)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM jobs {where} "
+                "ORDER BY created_at DESC LIMIT ?",
+                (*args, limit),
+            ).fetchall()
+        jobs = {job["job_id"]: job for job in map(_row_to_job, rows)}
+        # A job written since the snapshot is in both, its summaries are equal
+        jobs.update((job["job_id"], job) for job in pending)
+        newest = sorted(jobs.values(), key=lambda job: job["created_at"], reverse=True)
+        return newest[:limit]
+
+    def close(self) -> None:
+        """Write all queued jobs and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._writer.join()
+
+
+def _summary(job: dict[str, Any]) -> dict[str, Any]:
+    summary = {key: job.get(key) for key in _SUMMARY_KEYS}
+    summary["success"] = bool(summary["success"])
+    for key in ("timings", "usage"):
+        summary[key] = summary[key] or {}
+    return summary
+
+
+def _row_to_job(row: sqlite3.Row) -> dict[str, Any]:
+    job = dict(row)
+    job["success"] = bool(job["success"])
+    for key in ("timings", "usage"):
+        job[key] = json.loads(job[key] or "{}")
+    return job
+
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+
+def configure_job_store(db_path: Union[str, Path]) -> JobStore:
+    """
+    Open the process-wide job store.
+
+    Args:
+        db_path: Path of the sqlite database file
+
+    Returns:
+        The shared JobStore instance
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store = JobStore(db_path)
+        return _store
+
+
+def get_job_store() -> Optional[JobStore]:
+    """
+    Get the process-wide job store.
+
+    Returns:
+        The shared JobStore, or None if no store has been configured
+    """
+    return _store
@@ -2,6 +2,8 @@ import logging
 from pathlib import Path
 from typing import Optional, Union
 
+from aider_mcp_server.atoms.utils import default_state_dir
+
 
 class Logger:
     """Custom logger that writes to both console and file."""
@@ -17,7 +19,7 @@ class Logger:
 
         Args:
             name: Logger name
-            log_dir: Directory to store log files (defaults to ./logs)
+            log_dir: Directory to store log files, None for no log file
             level: Logging level
         """
         self.name = name
@@ -99,15 +101,15 @@ def get_logger(
 
     Args:
         name: Logger name
-        log_dir: Directory to store log files (defaults to ./logs)
+        log_dir: Directory to store log files (defaults to the state
+            directory, see utils.default_state_dir())
         level: Logging level
 
     Returns:
         Configured Logger instance
     """
     if log_dir is None:
-        # Default log directory is ./logs
-        log_dir = Path("./logs")
+        log_dir = default_state_dir()
 
     return Logger(
         name=name,
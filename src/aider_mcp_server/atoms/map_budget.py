@@ -0,0 +1,195 @@
+import threading
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Repo map budgets the controller chooses from, 0 disables the repo map
+MAP_TOKEN_CANDIDATES = (0, 512, 1024, 2048, 4096, 8192)
+
+# Weight of the newest sample in the moving averages
+SMOOTHING = 0.3
+
+
+class _RepoSamples:
+    """Moving averages of the jobs run against one repository."""
+
+    def __init__(self) -> None:
+        self.jobs = 0
+        self.latency = 0.0
+        self.input_tokens = 0.0
+        self.map_tokens = 0.0
+        self.build_seconds_per_token = 0.0
+
+    def add(
+        self, map_tokens: int, build_time: float, input_tokens: int, latency: float
+    ) -> None:
+        weight = 1.0 if self.jobs == 0 else SMOOTHING
+        self.jobs += 1
+        self.latency += weight * (latency - self.latency)
+        self.input_tokens += weight * (input_tokens - self.input_tokens)
+        self.map_tokens += weight * (map_tokens - self.map_tokens)
+        if map_tokens:
+            per_token = build_time / map_tokens
+            self.build_seconds_per_token += weight * (
+                per_token - self.build_seconds_per_token
+            )
+
+    def predict(self, map_tokens: int) -> float:
+        # Latency scales with input tokens, plus the time to build the map
+        seconds_per_token = self.latency / max(self.input_tokens, 1.0)
+        cost_per_map_token = seconds_per_token + self.build_seconds_per_token
+        return self.latency + cost_per_map_token * (map_tokens - self.map_tokens)
+
+
+class MapBudgetController:
+    """Chooses a repo map token budget per job to meet a latency target."""
+
+    def __init__(
+        self,
+        latency_target: float,
+        candidates: tuple[int, ...] = MAP_TOKEN_CANDIDATES,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            latency_target: Seconds a job should take end to end
+            candidates: Map token budgets to choose from
+        """
+        self.latency_target = latency_target
+        self.candidates = tuple(sorted(candidates))
+        self._lock = threading.Lock()
+        self._repos: dict[str, _RepoSamples] = {}
+
+    def choose(self, repo: str) -> Optional[int]:
+        """
+        Pick the largest map budget predicted to meet the latency target.
+
+        Args:
+            repo: The repository the job runs against
+
+        Returns:
+            Map tokens for the job, or None to use Aider's default while there
+            are no samples for the repository yet
+        """
+        with self._lock:
+            samples = self._repos.get(repo)
+            if samples is None:
+                return None
+            fitting = [
+                tokens
+                for tokens in self.candidates
+                if samples.predict(tokens) <= self.latency_target
+            ]
+        return fitting[-1] if fitting else self.candidates[0]
+
+    def record(
+        self,
+        repo: str,
+        map_tokens: int,
+        build_time: float,
+        input_tokens: int,
+        latency: float,
+    ) -> None:
+        """
+        Record the measurements of a finished job.
+
+        Args:
+            repo: The repository the job ran against
+            map_tokens: Tokens in the repo map that was sent
+            build_time: Seconds spent building the repo map
+            input_tokens: Prompt tokens sent to the model
+            latency: Seconds the job took end to end
+        """
+        with self._lock:
+            samples = self._repos.setdefault(repo, _RepoSamples())
+            samples.add(map_tokens, build_time, input_tokens, latency)
+
+    def export_state(self) -> dict[str, dict[str, Any]]:
+        """
+        Export the measurements, e.g. to restore them after a restart.
+
+        Returns:
+            Repository -> its moving averages
+        """
+        with self._lock:
+            return {repo: vars(samples).copy() for repo, samples in self._repos.items()}
+
+    def restore_state(self, repos: dict[str, dict[str, Any]]) -> int:
+        """
+        Restore exported measurements of repositories without samples yet.
+
+        Args:
+            repos: Measurements returned by export_state()
+
+        Returns:
+            Number of restored repositories
+        """
+        restored = 0
+        with self._lock:
+            for repo, state in repos.items():
+                if repo in self._repos:
+                    continue
+                samples = _RepoSamples()
+                for name in vars(samples):
+                    setattr(samples, name, state.get(name, getattr(samples, name)))
+                self._repos[repo] = samples
+                restored += 1
+        return restored
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the measurements and next budget for every repository.
+
+        Returns:
+            Dictionary with the latency target and per-repository averages
+        """
+        with self._lock:
+            repos: dict[str, dict[str, Any]] = {
+                repo: {
+                    "jobs": samples.jobs,
+                    "latency": round(samples.latency, 3),
+                    "input_tokens": round(samples.input_tokens),
+                    "map_tokens": round(samples.map_tokens),
+                    "build_seconds_per_token": samples.build_seconds_per_token,
+                }
+                for repo, samples in self._repos.items()
+            }
+        for repo in repos:
+            repos[repo]["next_map_tokens"] = self.choose(repo)
+        return {"latency_target": self.latency_target, "repos": repos}
+
+
+_controller: Optional[MapBudgetController] = None
+
+
+def configure_map_budget(
+    latency_target: Optional[float],
+) -> Optional[MapBudgetController]:
+    """
+    Enable or disable the process-wide repo map budget controller.
+
+    Args:
+        latency_target: Seconds a job should take end to end, or None to keep
+            Aider's default map budget
+
+    Returns:
+        The shared controller, or None if disabled
+    """
+    global _controller
+    _controller = MapBudgetController(latency_target) if latency_target else None
+    if _controller is not None:
+        logger.info(f"Adaptive repo map budget targeting {latency_target}s per job")
+    return _controller
+
+
+def get_map_budget() -> Optional[MapBudgetController]:
+    """
+    Get the process-wide repo map budget controller.
+
+    Returns:
+        The shared controller, or None if adaptive budgets are disabled
+    """
+    return _controller
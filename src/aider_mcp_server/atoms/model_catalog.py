@@ -0,0 +1,314 @@
+import difflib
+import threading
+import time
+from collections.abc import Iterable, Mapping
+from typing import Any, Optional
+
+import litellm
+from aider.models import MODEL_SETTINGS, model_info_manager
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.utils import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+logger = get_logger(__name__)
+
+# Orders list_models can return models in
+SORT_ORDERS = ("relevance", "name", "context", "price")
+
+# Prices are reported per million tokens
+TOKENS_PER_PRICE_UNIT = 1_000_000
+
+
+def _price(value: Any) -> Optional[float]:
+    """Convert a litellm per-token cost into a cost per million tokens."""
+    if not isinstance(value, (int, float)):
+        return None
+    return round(value * TOKENS_PER_PRICE_UNIT, 6)
+
+
+class ModelCatalog:
+    """The chat models Aider can use, with their limits, prices and edit formats.
+
+    The metadata of litellm and Aider is read once when the catalog is built,
+    so lookups and listings only filter and sort precomputed entries.
+    """
+
+    def __init__(
+        self,
+        model_cost: Optional[Mapping[str, Mapping[str, Any]]] = None,
+        model_settings: Optional[Iterable[Any]] = None,
+    ):
+        """
+        Build the catalog.
+
+        Args:
+            model_cost: litellm-style metadata by model name, defaults to
+                litellm's and Aider's local model metadata
+            model_settings: Aider ModelSettings, defaults to Aider's built-in ones
+        """
+        started = time.perf_counter()
+        if model_cost is None:
+            model_cost = {
+                **litellm.model_cost,
+                **model_info_manager.local_model_metadata,
+            }
+        settings = {
+            ms.name: ms
+            for ms in (MODEL_SETTINGS if model_settings is None else model_settings)
+        }
+
+        self._models: dict[str, dict[str, Any]] = {}
+        # Every name a model can be requested by, lowercased -> catalog name
+        self._names: dict[str, str] = {}
+        all_names: set[str] = set()
+        for orig_name, info in model_cost.items():
+            if info.get("mode") != "chat":
+                continue
+            provider = (info.get("litellm_provider") or "").lower()
+            if not provider:
+                continue
+            if orig_name.lower().startswith(f"{provider}/"):
+                name = orig_name
+            else:
+                name = f"{provider}/{orig_name}"
+            ms = settings.get(name) or settings.get(orig_name)
+            self._models[name] = {
+                "name": name,
+                "provider": provider,
+                "context_window": info.get("max_input_tokens")
+                or info.get("max_tokens"),
+                "max_output_tokens": info.get("max_output_tokens"),
+                "input_price": _price(info.get("input_cost_per_token")),
+                "output_price": _price(info.get("output_cost_per_token")),
+                # None when Aider picks the format from the model name
+                "edit_format": ms.edit_format if ms else None,
+                "editor_edit_format": ms.editor_edit_format if ms else None,
+                "capabilities": sorted(
+                    key[len("supports_") :]
+                    for key, value in info.items()
+                    if key.startswith("supports_") and value is True
+                ),
+            }
+            self._names[name.lower()] = name
+            self._names.setdefault(orig_name.lower(), name)
+            all_names.update((name, orig_name))
+        self._all_names = sorted(all_names)
+        self._entries = [(name.lower(), model) for name, model in self._models.items()]
+
+        self.build_seconds = time.perf_counter() - started
+        logger.info(
+            f"Model catalog built with {len(self._models)} chat models "
+            f"in {self.build_seconds:.3f}s"
+        )
+
+    def export_state(self) -> dict[str, Any]:
+        """
+        Export the precomputed entries, e.g. to restore them after a restart.
+
+        Returns:
+            JSON-serializable state for from_state()
+        """
+        return {
+            "models": self._models,
+            "names": self._names,
+            "all_names": self._all_names,
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, Any]) -> "ModelCatalog":
+        """
+        Restore a catalog without reading litellm's and Aider's metadata.
+
+        Args:
+            state: State returned by export_state()
+
+        Returns:
+            The restored catalog
+        """
+        started = time.perf_counter()
+        catalog = cls.__new__(cls)
+        catalog._models = dict(state["models"])
+        catalog._names = dict(state["names"])
+        catalog._all_names = list(state["all_names"])
+        catalog._entries = [
+            (name.lower(), model) for name, model in catalog._models.items()
+        ]
+        catalog.build_seconds = time.perf_counter() - started
+        return catalog
+
+    def get(self, name: str) -> Optional[dict[str, Any]]:
+        """
+        Look up a model by any of its names.
+
+        Args:
+            name: The model name, with or without provider prefix
+
+        Returns:
+            A copy of the model's entry, None if the model is unknown
+        """
+        model = self._names.get(name.lower())
+        return dict(self._models[model]) if model else None
+
+    def names(self, substring: str = "") -> list[str]:
+        """
+        List model names containing a substring, like aider's fuzzy_match_models.
+
+        Names are listed both with and without their provider prefix. When no
+        name contains the substring, close misspellings are returned instead.
+
+        Args:
+            substring: Case-insensitive part of the model name
+
+        Returns:
+            Sorted model names
+        """
+        substring = substring.lower()
+        matching = [name for name in self._all_names if substring in name.lower()]
+        if matching:
+            return matching
+        return sorted(
+            difflib.get_close_matches(substring, self._all_names, n=3, cutoff=0.8)
+        )
+
+    def search(
+        self,
+        substring: str = "",
+        provider: Optional[str] = None,
+        edit_format: Optional[str] = None,
+        capabilities: Optional[list[str]] = None,
+        min_context: Optional[int] = None,
+        max_input_price: Optional[float] = None,
+        sort: str = "relevance",
+        offset: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> dict[str, Any]:
+        """
+        Filter, rank and page through the catalog.
+
+        Args:
+            substring: Case-insensitive part of the model name
+            provider: Only models of this litellm provider, e.g. "gemini"
+            edit_format: Only models Aider edits with this format by default
+            capabilities: Only models supporting all of these, e.g. "vision"
+            min_context: Only models with at least this many input tokens
+            max_input_price: Only models costing at most this per million
+                input tokens
+            sort: One of SORT_ORDERS; "relevance" puts exact and prefix
+                matches and models Aider has settings for first
+            offset: Number of matching models to skip
+            limit: Maximum number of models to return
+
+        Returns:
+            Dictionary with the page of models, the number of matching models
+            and the offset of the next page (None on the last page)
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"sort must be one of {SORT_ORDERS}")
+        substring = substring.lower()
+        provider = provider.lower() if provider else None
+        wanted = set(capabilities or [])
+
+        matches = []
+        for lowered, model in self._entries:
+            if substring and substring not in lowered:
+                continue
+            if provider and model["provider"] != provider:
+                continue
+            if edit_format and model["edit_format"] != edit_format:
+                continue
+            if wanted and not wanted.issubset(model["capabilities"]):
+                continue
+            if min_context and (model["context_window"] or 0) < min_context:
+                continue
+            if max_input_price is not None and (
+                model["input_price"] is None or model["input_price"] > max_input_price
+            ):
+                continue
+            matches.append(model)
+
+        matches.sort(key=self._sort_key(sort, substring))
+        limit = min(limit, MAX_PAGE_SIZE)
+        page = matches[offset : offset + limit]
+        next_offset = offset + limit if offset + limit < len(matches) else None
+        return {
+            "models": [dict(model) for model in page],
+            "total": len(matches),
+            "offset": offset,
+            "next_offset": next_offset,
+        }
+
+    @staticmethod
+    def _sort_key(sort: str, substring: str):
+        """Build the sort key of an order; ties are broken by name."""
+        if sort == "name":
+            return lambda m: m["name"]
+        if sort == "context":
+            return lambda m: (-(m["context_window"] or 0), m["name"])
+        if sort == "price":
+            return lambda m: (
+                m["input_price"] is None,
+                m["input_price"] or 0.0,
+                m["name"],
+            )
+
+        def relevance(model: dict[str, Any]) -> tuple:
+            short_name = model["name"].lower().split("/")[-1]
+            return (
+                short_name != substring,
+                not short_name.startswith(substring),
+                model["edit_format"] is None,
+                model["name"],
+            )
+
+        return relevance
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the size of the catalog.
+
+        Returns:
+            Dictionary with the model and provider counts and the build time
+        """
+        return {
+            "models": len(self._models),
+            "providers": len({m["provider"] for m in self._models.values()}),
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+_catalog: Optional[ModelCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def configure_model_catalog(
+    catalog: Optional[ModelCatalog] = None,
+) -> ModelCatalog:
+    """
+    Build the process-wide model catalog, e.g. at server startup.
+
+    Args:
+        catalog: A prebuilt catalog, defaults to one built from litellm's and
+            Aider's metadata
+
+    Returns:
+        The shared ModelCatalog
+    """
+    global _catalog
+    catalog = catalog or ModelCatalog()
+    with _catalog_lock:
+        _catalog = catalog
+    return catalog
+
+
+def get_model_catalog() -> ModelCatalog:
+    """
+    Get the process-wide model catalog, building it on first use.
+
+    Returns:
+        The shared ModelCatalog
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog()
+        return _catalog
@@ -0,0 +1,94 @@
+import difflib
+import os
+from typing import Any, Optional
+
+from aider.io import InputOutput
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class OverlayIO(InputOutput):
+    """Aider IO whose file writes land in memory instead of on disk.
+
+    Reads fall through to the working tree until a file has been written, so a
+    dry-run job only holds the files it changes. Several IO objects may share
+    one overlay, e.g. the editors of a fan-out job working on disjoint files.
+    """
+
+    def __init__(self, overlay: Optional[dict[str, str]] = None, **kwargs: Any):
+        """
+        Initialize the IO.
+
+        Args:
+            overlay: Absolute path -> written content, shared with other IO
+                objects of the same job; a new one is created when None
+            **kwargs: Arguments for Aider's InputOutput, yes=True by default
+        """
+        kwargs.setdefault("yes", True)
+        super().__init__(**kwargs)
+        self.overlay: dict[str, str] = overlay if overlay is not None else {}
+
+    def read_text(self, filename, silent=False):
+        content = self.overlay.get(os.path.abspath(str(filename)))
+        if content is not None:
+            return content
+        return super().read_text(filename, silent=silent)
+
+    def write_text(self, filename, content, max_retries=5, initial_delay=0.1):
+        self.overlay[os.path.abspath(str(filename))] = content
+
+
+def _diff_lines(lines: list[str]) -> list[str]:
+    """Mark lines without a trailing newline the way git does."""
+    marked = []
+    for line in lines:
+        if line.endswith("\n"):
+            marked.append(line)
+        else:
+            marked.append(line + "\n\\ No newline at end of file\n")
+    return marked
+
+
+def overlay_diff(overlay: dict[str, str], working_dir: str) -> tuple[str, list[str]]:
+    """
+    Diff the files written to an overlay against the working tree.
+
+    Args:
+        overlay: Absolute path -> written content
+        working_dir: The directory the diff paths are made relative to
+
+    Returns:
+        Tuple of (git-style unified diff, relative paths of the changed files)
+    """
+    diff = []
+    changed = []
+    for fname in sorted(overlay):
+        rel_fname = os.path.relpath(fname, working_dir)
+        try:
+            with open(fname, encoding="utf-8") as f:
+                original = f.read()
+        except FileNotFoundError:
+            original = ""
+        except (OSError, UnicodeError) as e:
+            logger.warning(f"Cannot diff {rel_fname} against the working tree: {e}")
+            continue
+        if original == overlay[fname]:
+            continue
+
+        changed.append(rel_fname)
+        diff.append(f"diff --git a/{rel_fname} b/{rel_fname}\n")
+        diff.extend(
+            _diff_lines(
+                list(
+                    difflib.unified_diff(
+                        original.splitlines(keepends=True),
+                        overlay[fname].splitlines(keepends=True),
+                        fromfile=f"a/{rel_fname}",
+                        tofile=f"b/{rel_fname}",
+                    )
+                )
+            )
+        )
+    return "".join(diff), changed
@@ -0,0 +1,177 @@
+import os
+import subprocess
+import threading
+from collections.abc import Iterable
+from typing import Optional
+
+import pathspec
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Ignore files at the repository root, relative to it
+GIT_IGNORE_FILES = (".gitignore", os.path.join(".git", "info", "exclude"))
+# Ignore file of each subdirectory, whose patterns are relative to it
+NESTED_IGNORE_FILE = ".gitignore"
+AIDER_IGNORE_FILE = ".aiderignore"
+
+
+def normalize_paths(paths: Iterable[str], root: Optional[str] = None) -> list[str]:
+    """
+    Normalize file paths and drop duplicates, keeping the first occurrence.
+
+    Args:
+        paths: Paths relative to root, or absolute paths inside it
+        root: The repository the paths must stay inside, None to only clean
+            up the paths lexically
+
+    Returns:
+        Normalized paths relative to root, with "/" as separator
+
+    Raises:
+        ValueError: If a path is empty or points outside root
+    """
+    real_root = os.path.realpath(root) if root else None
+    normalized: dict[str, None] = {}
+    for path in paths:
+        if not path or not path.strip():
+            raise ValueError("File paths must not be empty")
+        if root and os.path.isabs(path):
+            path = os.path.relpath(path, root)
+        path = os.path.normpath(path).replace(os.sep, "/")
+        if path == ".." or path.startswith("../"):
+            raise ValueError(f"{path} is outside the repository")
+        if real_root is not None:
+            # Symlinks may still lead out of the repository
+            real_path = os.path.realpath(os.path.join(real_root, path))
+            if os.path.commonpath([real_root, real_path]) != real_root:
+                raise ValueError(f"{path} resolves outside the repository")
+        normalized.setdefault(path, None)
+    return list(normalized)
+
+
+def _load_spec(paths: list[str]) -> Optional[pathspec.PathSpec]:
+    """Compile the patterns of the ignore files that exist, None if there are none."""
+    lines: list[str] = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                lines.extend(f.read().splitlines())
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Cannot read ignore file {path}: {e}")
+    if not lines:
+        return None
+    return pathspec.GitIgnoreSpec.from_lines(lines)
+
+
+class _IgnoreRules:
+    """A repository's ignore patterns, recompiled when the files change."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.git_files = [os.path.join(root, name) for name in GIT_IGNORE_FILES]
+        self.aider_files = [os.path.join(root, AIDER_IGNORE_FILE)]
+        self._stamp: Optional[tuple[Optional[float], ...]] = None
+        self.git_spec: Optional[pathspec.PathSpec] = None
+        self.aider_spec: Optional[pathspec.PathSpec] = None
+        # Subdirectory -> (mtime of its ignore file, its patterns)
+        self._nested: dict[
+            str, tuple[Optional[float], Optional[pathspec.PathSpec]]
+        ] = {}
+
+    def refresh(self) -> None:
+        stamp = tuple(
+            os.path.getmtime(path) if os.path.isfile(path) else None
+            for path in self.git_files + self.aider_files
+        )
+        if stamp != self._stamp:
+            self.git_spec = _load_spec(self.git_files)
+            self.aider_spec = _load_spec(self.aider_files)
+            self._stamp = stamp
+
+    def _nested_spec(self, directory: str) -> Optional[pathspec.PathSpec]:
+        """Get the patterns of a subdirectory's ignore file, None without one."""
+        path = os.path.join(self.root, directory, NESTED_IGNORE_FILE)
+        try:
+            stamp: Optional[float] = os.path.getmtime(path)
+        except OSError:
+            stamp = None
+        cached = self._nested.get(directory)
+        if cached is None or cached[0] != stamp:
+            spec = _load_spec([path]) if stamp is not None else None
+            cached = self._nested[directory] = (stamp, spec)
+        return cached[1]
+
+    def git_matches(self, path: str) -> bool:
+        """
+        Check whether any .gitignore pattern on the way to a path matches it.
+
+        A match does not mean git ignores the path, since a later pattern may
+        negate it or the file may be tracked, but git ignores no path without
+        one.
+        """
+        if self.git_spec is not None and self.git_spec.match_file(path):
+            return True
+        parts = path.split("/")[:-1]
+        for depth in range(1, len(parts) + 1):
+            directory = "/".join(parts[:depth])
+            spec = self._nested_spec(directory)
+            if spec is not None and spec.match_file(path[len(directory) + 1 :]):
+                return True
+        return False
+
+
+_rules: dict[str, _IgnoreRules] = {}
+_rules_lock = threading.Lock()
+
+
+def _git_ignored(root: str, paths: list[str]) -> set[str]:
+    """Ask git which paths are ignored; tracked files never are."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", root, "check-ignore", "--stdin", "-z"],
+            input="\0".join(paths),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return set(paths)
+    if result.returncode not in (0, 1):
+        # Not a git repository: trust the patterns
+        return set(paths)
+    return {path for path in result.stdout.split("\0") if path}
+
+
+def ignored_paths(paths: list[str], root: str) -> list[str]:
+    """
+    Find the paths that git or Aider ignore.
+
+    The ignore files of the root and of the directories on the way to each
+    path are matched in memory and only recompiled when they change; git is
+    asked to confirm .gitignore matches, since tracked files are not ignored
+    and later patterns may negate earlier ones. Aider skips files matching
+    .aiderignore in any case.
+
+    Args:
+        paths: Normalized paths relative to root
+        root: The repository
+
+    Returns:
+        The ignored paths
+    """
+    with _rules_lock:
+        rules = _rules.get(root)
+        if rules is None:
+            rules = _rules[root] = _IgnoreRules(root)
+        rules.refresh()
+        aider_spec = rules.aider_spec
+        candidates = [path for path in paths if rules.git_matches(path)]
+
+    ignored = {p for p in paths if aider_spec is not None and aider_spec.match_file(p)}
+    if candidates:
+        ignored |= _git_ignored(root, candidates)
+    return [path for path in paths if path in ignored]
@@ -0,0 +1,212 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.utils import DEFAULT_SAMPLE_INTERVAL, state_path
+
+logger = get_logger(__name__)
+
+# Relative to the state directory, see utils.state_path()
+DEFAULT_PROFILE_DIR = "profiles"
+PROFILE_MODES = ("deterministic", "sampling")
+# Recently written profiles reported by stats()
+MAX_RECENT_PROFILES = 20
+
+
+class _StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} "
+                    f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str) -> None:
+        """Write the samples in the collapsed-stack format flame graph tools read."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """Profiles the next N jobs on request, at no cost to the others.
+
+    Jobs check a counter before running; only armed jobs pay for a profiler.
+    The deterministic mode uses cProfile and writes pstats files, the
+    sampling mode samples the job thread's stack and writes collapsed stacks.
+    Both only see the thread that runs the job.
+    """
+
+    def __init__(self, output_dir: Optional[str] = None):
+        self.output_dir = output_dir or state_path(DEFAULT_PROFILE_DIR)
+        self._remaining = 0
+        self._mode = "deterministic"
+        self._interval = DEFAULT_SAMPLE_INTERVAL
+        self._lock = threading.Lock()
+        self._profiled = 0
+        self._recent: list[dict[str, Any]] = []
+
+    def arm(
+        self,
+        count: int = 1,
+        mode: str = "deterministic",
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ) -> dict[str, Any]:
+        """
+        Profile the next jobs, replacing any earlier request.
+
+        Args:
+            count: Number of jobs to profile, 0 to cancel
+            mode: One of PROFILE_MODES
+            interval: Seconds between samples in sampling mode
+
+        Returns:
+            Dictionary with the jobs left to profile, the mode and where the
+            profiles are written
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {PROFILE_MODES}")
+        if count < 0 or interval <= 0:
+            raise ValueError("count must not be negative and interval must be positive")
+        with self._lock:
+            self._remaining = count
+            self._mode = mode
+            self._interval = interval
+        logger.info(f"Profiling the next {count} jobs ({mode})")
+        return {"remaining": count, "mode": mode, "output_dir": self.output_dir}
+
+    def _take(self) -> Optional[tuple[str, float]]:
+        """Claim one armed profile, returning its mode and sampling interval."""
+        with self._lock:
+            if self._remaining <= 0:
+                return None
+            self._remaining -= 1
+            return self._mode, self._interval
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[Optional[str]]:
+        """
+        Run a block under the profiler if the profiler is armed.
+
+        Args:
+            label: Name of the profiled job, used in the file name
+
+        Yields:
+            The path the profile will be written to, or None if the block is
+            not profiled
+        """
+        # Unlocked read: a job racing with arm() is profiled by the next one
+        claimed = self._take() if self._remaining > 0 else None
+        if claimed is None:
+            yield None
+            return
+
+        mode, interval = claimed
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        suffix = "pstats" if mode == "deterministic" else "collapsed"
+        path = os.path.join(self.output_dir, f"{stamp}-{label}.{suffix}")
+
+        profiler: Optional[cProfile.Profile] = None
+        sampler: Optional[_StackSampler] = None
+        if mode == "deterministic":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = _StackSampler(threading.get_ident(), interval)
+            sampler.start()
+        started = time.perf_counter()
+        try:
+            yield path
+        finally:
+            duration = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(path)
+            if sampler is not None:
+                sampler.stop()
+                sampler.write_collapsed(path)
+            logger.info(f"Wrote {mode} profile of {label} ({duration:.2f}s) to {path}")
+            with self._lock:
+                self._profiled += 1
+                self._recent.append({"path": path, "mode": mode, "duration": duration})
+                del self._recent[:-MAX_RECENT_PROFILES]
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report pending and written profiles.
+
+        Returns:
+            Dictionary with the jobs left to profile, the mode, the number of
+            profiled jobs and the most recent profile files
+        """
+        with self._lock:
+            return {
+                "remaining": self._remaining,
+                "mode": self._mode,
+                "profiled": self._profiled,
+                "recent": list(self._recent),
+            }
+
+
+_profiler = JobProfiler()
+_profiler_lock = threading.Lock()
+
+
+def configure_profiler(output_dir: Optional[str] = None) -> JobProfiler:
+    """
+    Set up the process-wide job profiler.
+
+    Args:
+        output_dir: Directory the profiles are written to, defaults to
+            DEFAULT_PROFILE_DIR in the state directory
+
+    Returns:
+        The shared JobProfiler, disarmed
+    """
+    global _profiler
+    with _profiler_lock:
+        _profiler = JobProfiler(output_dir)
+        return _profiler
+
+
+def get_profiler() -> JobProfiler:
+    """
+    Get the process-wide job profiler.
+
+    Returns:
+        The shared JobProfiler
+    """
+    return _profiler
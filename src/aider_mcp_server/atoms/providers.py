@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+from collections.abc import Mapping
+from typing import Any, Optional
+
+from aider.models import Model
+from pydantic import BaseModel, ConfigDict, Field
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Project and region used for Vertex AI when running in GitHub Actions
+CI_VERTEX_PROJECT = "github-actions-457316"
+CI_VERTEX_LOCATION = "us-central1"
+
+# Config values of this form are read from the environment at startup
+ENV_PREFIX = "env:"
+
+
+class ProviderProfile(BaseModel):
+    """How models are mapped to a provider and the litellm settings they get.
+
+    A profile is resolved once at startup and never changes, so concurrent
+    jobs can share it without touching the process environment.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    name: str = "default"
+    # Provider every model is moved to, e.g. "vertex_ai", None keeps models as given
+    model_provider: Optional[str] = None
+    # Provider prefix -> litellm parameters such as region, credentials or timeout
+    providers: dict[str, dict[str, Any]] = Field(default_factory=dict)
+
+    def model_name(self, model: str) -> str:
+        """
+        Map a requested model name to the profile's provider.
+
+        Args:
+            model: The requested model, e.g. "gemini/gemini-2.5-pro"
+
+        Returns:
+            The model name to use, e.g. "vertex_ai/gemini-2.5-pro"
+        """
+        if not self.model_provider or model.startswith(f"{self.model_provider}/"):
+            return model
+        return f"{self.model_provider}/{model.split('/')[-1]}"
+
+    def params_for(self, model: str) -> dict[str, Any]:
+        """
+        Get the litellm parameters for a model.
+
+        Args:
+            model: The model name, whose prefix selects the provider
+
+        Returns:
+            A copy of the provider's parameters
+        """
+        provider = model.split("/", 1)[0] if "/" in model else ""
+        return dict(self.providers.get(provider, {}))
+
+    def apply(self, model: Model) -> Model:
+        """
+        Add the provider parameters to an Aider model and its helper models.
+
+        Parameters the model already sets win over the profile's.
+
+        Args:
+            model: The Aider model
+
+        Returns:
+            The same model
+        """
+        for target in (model, model.weak_model, model.editor_model):
+            if target is None:
+                continue
+            params = self.params_for(target.name)
+            if params:
+                target.extra_params = {**params, **(target.extra_params or {})}
+        return model
+
+
+def _resolve_env(value: Any, environ: Mapping[str, str]) -> Any:
+    """Replace "env:NAME" values with the environment variable's value."""
+    if isinstance(value, str) and value.startswith(ENV_PREFIX):
+        return environ.get(value[len(ENV_PREFIX) :])
+    if isinstance(value, dict):
+        return {key: _resolve_env(item, environ) for key, item in value.items()}
+    return value
+
+
+def load_provider_profile(
+    config_path: Optional[str] = None, environ: Optional[Mapping[str, str]] = None
+) -> ProviderProfile:
+    """
+    Resolve the provider profile from a config file or the environment.
+
+    Without a config file, GitHub Actions runs use Vertex AI with application
+    default credentials and every other environment uses the model names and
+    API keys as given.
+
+    Args:
+        config_path: JSON file with the profile's fields; string values of the
+            form "env:NAME" are read from the environment
+        environ: The environment, defaults to os.environ
+
+    Returns:
+        The resolved profile
+
+    Raises:
+        ValueError: If the config file cannot be read or is invalid
+    """
+    environ = os.environ if environ is None else environ
+    if config_path:
+        try:
+            with open(config_path) as f:
+                config = json.load(f)
+            profile = ProviderProfile.model_validate(_resolve_env(config, environ))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Invalid provider config {config_path}: {e}") from e
+    elif environ.get("GITHUB_ACTIONS") == "true":
+        profile = ProviderProfile(
+            name="ci-vertex",
+            model_provider="vertex_ai",
+            providers={
+                "vertex_ai": {
+                    "vertex_project": environ.get("VERTEX_PROJECT", CI_VERTEX_PROJECT),
+                    "vertex_location": environ.get(
+                        "VERTEX_LOCATION", CI_VERTEX_LOCATION
+                    ),
+                }
+            },
+        )
+        if "GOOGLE_API_KEY" in environ:
+            logger.warning(
+                "GOOGLE_API_KEY found in environment, ADC should still be used"
+                " for Vertex."
+            )
+    else:
+        profile = ProviderProfile()
+    logger.info(
+        f"Provider profile '{profile.name}': model provider "
+        f"{profile.model_provider or 'as requested'}, "
+        f"settings for {sorted(profile.providers) or 'no providers'}"
+    )
+    return profile
+
+
+_profile: Optional[ProviderProfile] = None
+_profile_lock = threading.Lock()
+
+
+def configure_provider_profile(profile: ProviderProfile) -> ProviderProfile:
+    """
+    Set the process-wide provider profile.
+
+    Args:
+        profile: The resolved profile
+
+    Returns:
+        The same profile
+    """
+    global _profile
+    with _profile_lock:
+        _profile = profile
+    return profile
+
+
+def get_provider_profile() -> ProviderProfile:
+    """
+    Get the process-wide provider profile, resolving it from the environment once.
+
+    Returns:
+        The shared ProviderProfile
+    """
+    global _profile
+    with _profile_lock:
+        if _profile is None:
+            _profile = load_provider_profile()
+        return _profile
@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+from importlib import metadata
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.cassette import REPLAY, Cassette, use_cassette
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.tools.aider_ai_code import code_with_aider
+
+logger = get_logger(__name__)
+
+# Committer of the snapshot commit replays run against
+_GIT_IDENTITY = ["-c", "user.name=replay", "-c", "user.email=replay@localhost"]
+
+
+def _version(package: str) -> str:
+    """Get the installed version of a package, "unknown" when not installed."""
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _materialize(cassette: Cassette, root: str) -> None:
+    """Create a git repository holding the cassette's file snapshots."""
+    for rel, content in cassette.data["files"].items():
+        if content is None:
+            continue
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    for args in (
+        ["init", "-q"],
+        ["add", "-A"],
+        ["commit", "-q", "--allow-empty", "--no-gpg-sign", "-m", "Replay snapshot"],
+    ):
+        subprocess.run(
+            ["git", *_GIT_IDENTITY, *args],
+            cwd=root,
+            capture_output=True,
+            check=True,
+        )
+
+
+def timing_deltas(
+    baseline: dict[str, float], current: dict[str, float]
+) -> dict[str, dict[str, Optional[float]]]:
+    """
+    Compare per-phase timings.
+
+    Args:
+        baseline: Seconds per phase of the reference run
+        current: Seconds per phase of the run to compare
+
+    Returns:
+        Phase -> baseline and current seconds, their difference and ratio
+        (None when a phase is missing from either run)
+    """
+    deltas: dict[str, dict[str, Optional[float]]] = {}
+    for phase in sorted(set(baseline) | set(current)):
+        before, after = baseline.get(phase), current.get(phase)
+        delta = ratio = None
+        if before is not None and after is not None:
+            delta = round(after - before, 3)
+            ratio = round(after / before, 2) if before else None
+        deltas[phase] = {
+            "baseline": before,
+            "current": after,
+            "delta": delta,
+            "ratio": ratio,
+        }
+    return deltas
+
+
+def replay_cassette(cassette: Cassette, repeat: int = 1) -> dict[str, Any]:
+    """
+    Re-run a recorded job offline and measure its phases.
+
+    Each run starts from a fresh git repository holding the recorded files,
+    and the model's replies come from the cassette through litellm's
+    mock_response, so only this server, Aider and litellm are measured. The
+    repo map only sees the recorded files, and session jobs start a new
+    conversation.
+
+    Args:
+        cassette: The recorded job
+        repeat: Number of runs; the median of each phase is reported
+
+    Returns:
+        Dictionary with the job id, whether the replay succeeded and produced
+        the recorded diff (which also shows edits that were uncommitted when
+        the job was recorded), the recorded and replayed timings and their
+        deltas
+    """
+    job = dict(cassette.data["job"])
+    # Earlier turns of a session are not in the cassette
+    job["session_id"] = None
+    recorded = cassette.data.get("result") or {}
+
+    runs: list[dict[str, Any]] = []
+    for _ in range(max(repeat, 1)):
+        root = tempfile.mkdtemp(prefix="aider-replay-")
+        try:
+            _materialize(cassette, root)
+            # A fresh copy, so every run uses the replies from the start
+            tape = Cassette(cassette.data)
+            with use_cassette(tape, REPLAY):
+                runs.append(json.loads(code_with_aider(working_dir=root, **job)))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    phases = {phase for run in runs for phase in run.get("timings", {})}
+    timings = {
+        phase: round(
+            statistics.median(
+                run["timings"][phase] for run in runs if phase in run.get("timings", {})
+            ),
+            3,
+        )
+        for phase in sorted(phases)
+    }
+    last = runs[-1]
+    return {
+        "job_id": cassette.data.get("job_id"),
+        "success": last.get("success", False),
+        "diff_matches": last.get("diff") == recorded.get("diff"),
+        "runs": len(runs),
+        "recorded_timings": recorded.get("timings", {}),
+        "timings": timings,
+        "deltas": timing_deltas(recorded.get("timings", {}), timings),
+    }
+
+
+def replay_report(
+    cassettes: list[Cassette],
+    repeat: int = 1,
+    baseline: Optional[dict[str, Any]] = None,
+) -> dict[str, Any]:
+    """
+    Replay cassettes and compare their timings with a baseline.
+
+    Args:
+        cassettes: The recorded jobs
+        repeat: Runs per cassette, see replay_cassette()
+        baseline: An earlier report, e.g. of another server version, to
+            compare with instead of the recorded timings
+
+    Returns:
+        Report with the server and Aider versions and one entry per cassette
+    """
+    baseline_jobs = {job["job_id"]: job for job in (baseline or {}).get("jobs", [])}
+    jobs = []
+    for cassette in cassettes:
+        result = replay_cassette(cassette, repeat)
+        reference = baseline_jobs.get(result["job_id"])
+        if reference is not None:
+            result["deltas"] = timing_deltas(reference["timings"], result["timings"])
+        logger.info(
+            f"Replayed job {result['job_id']}: success {result['success']}, "
+            f"total {result['timings'].get('total')}s"
+        )
+        jobs.append(result)
+    return {
+        "server_version": _version("aider-mcp-server"),
+        "aider_version": _version("aider-chat"),
+        "baseline": None
+        if baseline is None
+        else {
+            "server_version": baseline.get("server_version"),
+            "aider_version": baseline.get("aider_version"),
+        },
+        "jobs": jobs,
+    }
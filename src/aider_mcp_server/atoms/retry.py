@@ -0,0 +1,120 @@
+import random
+from typing import Optional
+
+# Error classes returned by classify_error
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+SERVER = "server"
+AUTH = "auth"
+FATAL = "fatal"
+
+# Errors worth retrying against the same model after a backoff delay
+RETRYABLE_ERRORS = frozenset({RATE_LIMIT, TIMEOUT, SERVER})
+
+# Errors that should move on to the next model in the failover chain
+FAILOVER_ERRORS = frozenset({RATE_LIMIT, TIMEOUT, SERVER, AUTH})
+
+# Providers that serve the same underlying models, in failover order
+EQUIVALENT_PROVIDERS: dict[str, list[str]] = {
+    "gemini": ["vertex_ai"],
+    "vertex_ai": ["gemini"],
+}
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+_RATE_LIMIT_NAMES = {"RateLimitError", "RouterRateLimitError"}
+_TIMEOUT_NAMES = {"Timeout", "APITimeoutError", "TimeoutError", "ReadTimeout"}
+_SERVER_NAMES = {
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "APIConnectionError",
+    "ConnectError",
+}
+_AUTH_NAMES = {"AuthenticationError", "PermissionDeniedError"}
+
+
+def classify_error(err: BaseException) -> str:
+    """
+    Classify a provider error so the caller can decide how to recover.
+
+    Args:
+        err: The exception raised while talking to the LLM provider.
+
+    Returns:
+        One of RATE_LIMIT, TIMEOUT, SERVER, AUTH or FATAL.
+    """
+    names = {cls.__name__ for cls in type(err).__mro__}
+    if names & _RATE_LIMIT_NAMES:
+        return RATE_LIMIT
+    if names & _AUTH_NAMES:
+        return AUTH
+    if names & _TIMEOUT_NAMES:
+        return TIMEOUT
+    if names & _SERVER_NAMES:
+        return SERVER
+
+    status_code = getattr(err, "status_code", None)
+    if isinstance(status_code, int):
+        if status_code == 429:
+            return RATE_LIMIT
+        if status_code in (401, 403):
+            return AUTH
+        if status_code == 408:
+            return TIMEOUT
+        if status_code >= 500:
+            return SERVER
+
+    return FATAL
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    rng: Optional[random.Random] = None,
+) -> float:
+    """
+    Compute a "full jitter" exponential backoff delay.
+
+    Args:
+        attempt: Zero-based retry attempt number.
+        base_delay: Delay ceiling for the first retry, in seconds.
+        max_delay: Upper bound for any single delay, in seconds.
+        rng: Optional random source (useful for deterministic tests).
+
+    Returns:
+        Number of seconds to sleep before the next attempt.
+    """
+    ceiling = min(max_delay, base_delay * (2**attempt))
+    return (rng or random).uniform(0, ceiling)
+
+
+def failover_chain(
+    model: str, failover_models: Optional[list[str]] = None
+) -> list[str]:
+    """
+    Build the ordered list of models to try for a request.
+
+    Args:
+        model: The primary model requested by the caller.
+        failover_models: Explicit fallbacks. When None, equivalent providers
+            from EQUIVALENT_PROVIDERS are used.
+
+    Returns:
+        The primary model followed by its fallbacks, without duplicates.
+    """
+    if failover_models is None:
+        provider, sep, base_name = model.partition("/")
+        failover_models = (
+            [f"{alt}/{base_name}" for alt in EQUIVALENT_PROVIDERS.get(provider, [])]
+            if sep
+            else []
+        )
+
+    chain = [model]
+    for candidate in failover_models:
+        if candidate and candidate not in chain:
+            chain.append(candidate)
+    return chain
@@ -0,0 +1,285 @@
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.utils import SESSION_ID_PATTERN
+
+logger = get_logger(__name__)
+
+# Relative to the state directory, see utils.state_path()
+DEFAULT_SESSION_DIR = "sessions"
+DEFAULT_MAX_SESSIONS = 16
+DEFAULT_IDLE_TIMEOUT = 30 * 60
+
+_SESSION_ID_RE = re.compile(SESSION_ID_PATTERN)
+
+
+class Session:
+    """A conversation whose Aider coder is kept alive between turns."""
+
+    def __init__(self, session_id: str, working_dir: str):
+        self.session_id = session_id
+        self.working_dir = working_dir
+        # The live coder, or None until the first turn or after a restore
+        self.coder: Any = None
+        # State of an evicted coder, used to rebuild it on the next turn
+        self.saved: Optional[dict[str, Any]] = None
+        self.turns = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Capture what is needed to continue the conversation later.
+
+        Returns:
+            Dictionary with the chat history and the files in the chat
+        """
+        if self.coder is None:
+            return dict(self.saved or {}, turns=self.turns)
+        return {
+            "session_id": self.session_id,
+            "working_dir": self.working_dir,
+            "turns": self.turns,
+            "model": self.coder.main_model.name,
+            "editable_files": sorted(self.coder.abs_fnames),
+            "readonly_files": sorted(self.coder.abs_read_only_fnames),
+            "done_messages": list(self.coder.done_messages)
+            + list(self.coder.cur_messages),
+        }
+
+
+class SessionTable:
+    """Bounded table of live sessions; idle ones are saved to disk and dropped."""
+
+    def __init__(
+        self,
+        persist_dir: Optional[str] = None,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ):
+        """
+        Initialize the table.
+
+        Args:
+            persist_dir: Directory evicted sessions are saved to, or None to
+                forget them
+            max_sessions: Sessions kept alive at once, least recently used
+                ones are evicted first
+            idle_timeout: Seconds after which an unused session is evicted
+        """
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._evicted = 0
+        self._restored = 0
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop, name="session-sweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def _path(self, session_id: str) -> Optional[Path]:
+        return self.persist_dir / f"{session_id}.json" if self.persist_dir else None
+
+    def _load(self, session_id: str) -> Optional[dict[str, Any]]:
+        path = self._path(session_id)
+        if path is None or not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable session {path}: {e}")
+            return None
+
+    def _persist(self, session: Session) -> None:
+        path = self._path(session.session_id)
+        if path is None or (session.coder is None and session.saved is None):
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(session.snapshot()))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not save session {session.session_id}: {e}")
+
+    @contextlib.contextmanager
+    def checkout(self, session_id: str, working_dir: str) -> Iterator[Session]:
+        """
+        Use a session exclusively for one turn.
+
+        A session that is not live is created, restoring its saved state from
+        disk if it was evicted before. Concurrent turns of the same session
+        wait for each other.
+
+        Args:
+            session_id: The client-chosen session id
+            working_dir: The repository the session works in
+
+        Yields:
+            The session; set its coder before the turn ends to keep it alive
+
+        Raises:
+            ValueError: If the session id is malformed or the session belongs
+                to a different working directory
+        """
+        if not _SESSION_ID_RE.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        while True:
+            session = self._lookup(session_id, working_dir)
+            session.lock.acquire()
+            with self._lock:
+                # The session may have been evicted while we waited for it
+                if self._sessions.get(session_id) is session:
+                    break
+            session.lock.release()
+
+        try:
+            if os.path.abspath(session.working_dir) != os.path.abspath(working_dir):
+                raise ValueError(
+                    f"Session {session_id} belongs to working_dir {session.working_dir}"
+                )
+            yield session
+            session.turns += 1
+        finally:
+            session.last_used = time.monotonic()
+            session.lock.release()
+        self.evict()
+
+    def _lookup(self, session_id: str, working_dir: str) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, working_dir)
+                saved = self._load(session_id)
+                if saved is not None:
+                    session.saved = saved
+                    session.turns = saved.get("turns", 0)
+                    session.working_dir = saved.get("working_dir", working_dir)
+                    self._restored += 1
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def evict(self, force: bool = False) -> int:
+        """
+        Save and drop idle sessions and those beyond the table's size.
+
+        Sessions that are running a turn are never evicted.
+
+        Args:
+            force: Evict every session that is not in use
+
+        Returns:
+            Number of sessions evicted
+        """
+        now = time.monotonic()
+        victims = []
+        with self._lock:
+            live = len(self._sessions)
+            # Least recently used first
+            for session_id, session in list(self._sessions.items()):
+                over_capacity = live > self.max_sessions
+                idle = now - session.last_used >= self.idle_timeout
+                if not (force or over_capacity or idle):
+                    continue
+                if not session.lock.acquire(blocking=False):
+                    continue
+                del self._sessions[session_id]
+                victims.append(session)
+                live -= 1
+
+        for session in victims:
+            try:
+                self._persist(session)
+                logger.info(
+                    f"Evicted session {session.session_id} after {session.turns} turns"
+                )
+            finally:
+                session.coder = None
+                session.lock.release()
+        with self._lock:
+            self._evicted += len(victims)
+        return len(victims)
+
+    def _sweep_loop(self) -> None:
+        interval = max(min(self.idle_timeout / 2, 60.0), 0.1)
+        while not self._stop.wait(interval):
+            self.evict()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the live sessions.
+
+        Returns:
+            Dictionary with the table limits and session counters
+        """
+        with self._lock:
+            return {
+                "live_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_timeout": self.idle_timeout,
+                "evicted": self._evicted,
+                "restored": self._restored,
+            }
+
+    def close(self) -> None:
+        """Save every live session and stop the idle sweeper."""
+        self._stop.set()
+        self._sweeper.join()
+        self.evict(force=True)
+
+
+_table: Optional[SessionTable] = None
+_table_lock = threading.Lock()
+
+
+def configure_session_table(
+    persist_dir: Optional[str] = None,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+) -> SessionTable:
+    """
+    Replace the process-wide session table.
+
+    Args:
+        persist_dir: Directory evicted sessions are saved to, or None
+        max_sessions: Sessions kept alive at once
+        idle_timeout: Seconds after which an unused session is evicted
+
+    Returns:
+        The shared SessionTable instance
+    """
+    global _table
+    with _table_lock:
+        previous = _table
+        _table = SessionTable(persist_dir, max_sessions, idle_timeout)
+    if previous is not None:
+        previous.close()
+    return _table
+
+
+def get_session_table() -> SessionTable:
+    """
+    Get the process-wide session table, creating one with defaults if needed.
+
+    Returns:
+        The shared SessionTable instance
+    """
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = SessionTable()
+        return _table
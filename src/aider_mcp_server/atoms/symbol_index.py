@@ -0,0 +1,465 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from aider.io import InputOutput
+from aider.repomap import RepoMap, filename_to_lang
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Relative to the state directory, see utils.state_path()
+DEFAULT_INDEX_DIR = "symbol_index"
+INDEX_VERSION = 1
+
+# Names defined in more files than this are too ambiguous to pick context by
+MAX_DEFINITIONS_PER_NAME = 5
+DEFAULT_MAX_CONTEXT_FILES = 8
+
+# Seconds an index is trusted before queries check the tree for changes again;
+# jobs that edit files invalidate it right away, see invalidate_symbol_index()
+DEFAULT_MAX_AGE = 30.0
+
+
+class _ContentIO(InputOutput):
+    """Aider IO that hands the tag reader the content the index hashed."""
+
+    content = ""
+
+    def read_text(self, filename, silent=False):
+        return self.content
+
+
+class _TagReader(RepoMap):
+    """RepoMap that only extracts tags, without Aider's on-disk tags cache."""
+
+    def __init__(self) -> None:
+        self.io = _ContentIO(yes=True, pretty=False)
+
+    def read_tags(self, fname: str, rel_fname: str, content: bytes) -> list[Any]:
+        """Extract the tags of a file from the given content, not from disk."""
+        self.io.content = content.decode("utf-8", errors="replace")
+        try:
+            return list(self.get_tags_raw(fname, rel_fname) or [])
+        finally:
+            self.io.content = ""
+
+
+def list_source_files(root: str) -> list[str]:
+    """List the repository's files that tree-sitter can parse, relative to root."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z"],
+            cwd=root,
+            capture_output=True,
+            check=True,
+        )
+        files = [f for f in result.stdout.decode().split("\0") if f]
+    except (OSError, subprocess.CalledProcessError):
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                files.append(os.path.relpath(os.path.join(dirpath, name), root))
+    return sorted(f for f in files if filename_to_lang(f))
+
+
+class SymbolIndex:
+    """Definitions and references of every source file in a repository."""
+
+    def __init__(self, root: str, index_path: Optional[Union[str, Path]] = None):
+        """
+        Load the index of a repository, if one was saved before.
+
+        Args:
+            root: The repository root
+            index_path: JSON file the index is persisted to, or None to keep it
+                in memory only
+        """
+        self.root = root
+        self.index_path = Path(index_path) if index_path else None
+        # Guards the index for queries; updates parse files without holding it
+        self._lock = threading.Lock()
+        # Serializes updates, and the tag reader they share
+        self._update_lock = threading.Lock()
+        self._reader = _TagReader()
+        # rel path -> {"mtime", "size", "hash", "defs": [[name, line]], "refs": [..]}
+        self._files: dict[str, dict[str, Any]] = {}
+        self._definitions: dict[str, list[tuple[str, int]]] = {}
+        self._updated_at: Optional[float] = None
+        self._load()
+
+    def _load(self) -> None:
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            data = json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable symbol index {self.index_path}: {e}")
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.root:
+            self._files = data["files"]
+            self._rebuild_definitions()
+
+    def _save(self, files: dict[str, dict[str, Any]]) -> None:
+        if self.index_path is None:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"version": INDEX_VERSION, "root": self.root, "files": files})
+        )
+        os.replace(tmp_path, self.index_path)
+
+    def _rebuild_definitions(self) -> None:
+        self._definitions = _definitions_of(self._files)
+
+    def _index_file(self, rel_fname: str, content: bytes) -> dict[str, Any]:
+        fname = os.path.join(self.root, rel_fname)
+        defs, refs = [], set()
+        # Parse the bytes that are hashed, which a later write cannot change
+        for tag in self._reader.read_tags(fname, rel_fname, content):
+            if tag.kind == "def":
+                defs.append([tag.name, tag.line])
+            else:
+                refs.add(tag.name)
+        return {
+            "hash": hashlib.sha256(content).hexdigest(),
+            "defs": defs,
+            "refs": sorted(refs),
+        }
+
+    def update(self, max_age: float = 0.0) -> dict[str, int]:
+        """
+        Bring the index up to date with the working tree.
+
+        Files whose modification time and size are unchanged are skipped; other
+        files are hashed and only re-parsed if their content changed. Queries
+        keep answering from the previous state while files are parsed.
+
+        Args:
+            max_age: Skip the check if the index was updated less than this
+                many seconds ago, or if another update is running and the
+                index was updated before
+
+        Returns:
+            Counts of indexed, re-parsed and removed files
+        """
+        started = time.perf_counter()
+        with self._lock:
+            fresh = self._updated_at is not None and (
+                started - self._updated_at < max_age
+            )
+            skipped = {"files": len(self._files), "parsed": 0, "removed": 0}
+        if fresh:
+            return skipped
+        # Queries answer from the current index instead of waiting for another
+        # update, unless there is nothing to answer from yet
+        wait = not max_age or skipped["files"] == 0
+        if not self._update_lock.acquire(blocking=wait):
+            return skipped
+        try:
+            return self._update(started)
+        finally:
+            self._update_lock.release()
+
+    def _update(self, started: float) -> dict[str, int]:
+        """Re-index the changed files; the caller holds the update lock."""
+        with self._lock:
+            old_files = self._files
+        files: dict[str, dict[str, Any]] = {}
+        parsed = 0
+        changed = False
+
+        for rel_fname in list_source_files(self.root):
+            try:
+                stat = os.stat(os.path.join(self.root, rel_fname))
+            except OSError:
+                continue
+            entry = old_files.get(rel_fname)
+            if (
+                entry is not None
+                and entry["mtime"] == stat.st_mtime
+                and entry["size"] == stat.st_size
+            ):
+                files[rel_fname] = entry
+                continue
+
+            try:
+                with open(os.path.join(self.root, rel_fname), "rb") as f:
+                    content = f.read()
+            except OSError:
+                continue
+            content_hash = hashlib.sha256(content).hexdigest()
+            if entry is None or entry["hash"] != content_hash:
+                entry = self._index_file(rel_fname, content)
+                parsed += 1
+            else:
+                entry = dict(entry)
+            entry["mtime"] = stat.st_mtime
+            entry["size"] = stat.st_size
+            files[rel_fname] = entry
+            changed = True
+
+        removed = set(old_files) - set(files)
+        definitions = _definitions_of(files) if parsed or removed else None
+        with self._lock:
+            self._files = files
+            if definitions is not None:
+                self._definitions = definitions
+            self._updated_at = time.perf_counter()
+        if changed or removed:
+            self._save(files)
+
+        if parsed or removed:
+            logger.info(
+                f"Symbol index of {self.root}: parsed {parsed} files, removed "
+                f"{len(removed)} in {time.perf_counter() - started:.2f}s"
+            )
+        return {"files": len(files), "parsed": parsed, "removed": len(removed)}
+
+    def invalidate(self) -> None:
+        """Make the next update check the tree, e.g. after a job edited files."""
+        with self._lock:
+            self._updated_at = None
+
+    def definitions(self, name: str) -> list[tuple[str, int]]:
+        """
+        Find where a symbol is defined.
+
+        Args:
+            name: The exact symbol name
+
+        Returns:
+            (relative file, 0-based line) of every definition
+        """
+        with self._lock:
+            return list(self._definitions.get(name, []))
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[str, str, int]]:
+        """
+        Find definitions whose name contains a query, case-insensitively.
+
+        Args:
+            query: Part of the symbol name
+            limit: Maximum number of definitions to return
+
+        Returns:
+            (name, relative file, 0-based line) of the matching definitions,
+            exact matches first, then prefix matches, then the rest
+        """
+        needle = query.lower()
+        with self._lock:
+            names = [name for name in self._definitions if needle in name.lower()]
+            names.sort(
+                key=lambda name: (
+                    name.lower() != needle,
+                    not name.lower().startswith(needle),
+                    len(name),
+                    name,
+                )
+            )
+            matches = []
+            for name in names:
+                for rel_fname, line in self._definitions[name]:
+                    matches.append((name, rel_fname, line))
+                if len(matches) >= limit:
+                    break
+        return matches[:limit]
+
+    def references(self, name: str) -> list[str]:
+        """
+        Find the files that use a symbol.
+
+        Args:
+            name: The exact symbol name
+
+        Returns:
+            Relative paths of the files referencing the symbol
+        """
+        with self._lock:
+            return sorted(
+                f for f, entry in self._files.items() if name in entry["refs"]
+            )
+
+    def outline(self, path_prefix: str = "") -> dict[str, list[tuple[str, int]]]:
+        """
+        List the definitions of every indexed file.
+
+        Args:
+            path_prefix: Only include files whose relative path starts with this
+
+        Returns:
+            Relative file -> (name, 0-based line) of its definitions, in order
+        """
+        with self._lock:
+            return {
+                rel_fname: sorted(
+                    ((name, line) for name, line in entry["defs"]),
+                    key=lambda d: d[1],
+                )
+                for rel_fname, entry in sorted(self._files.items())
+                if rel_fname.startswith(path_prefix)
+            }
+
+    def rank_files(self, relative_files: list[str]) -> dict[str, int]:
+        """
+        Score other files by how many symbols used by the given files they define.
+
+        Args:
+            relative_files: The files of interest
+
+        Returns:
+            Relative file -> number of referenced symbols it defines, for every
+            file that defines at least one
+        """
+        with self._lock:
+            referenced: set[str] = set()
+            for rel_fname in relative_files:
+                entry = self._files.get(rel_fname)
+                if entry is not None:
+                    referenced.update(entry["refs"])
+            scores: dict[str, int] = defaultdict(int)
+            for name in referenced:
+                for rel_fname in {f for f, _ in self._definitions.get(name, [])}:
+                    if rel_fname not in relative_files:
+                        scores[rel_fname] += 1
+        return dict(scores)
+
+    def select_context_files(
+        self,
+        relative_editable_files: list[str],
+        max_files: int = DEFAULT_MAX_CONTEXT_FILES,
+    ) -> list[str]:
+        """
+        Pick the fewest files that define the symbols the editable files use.
+
+        Greedily takes the file defining the most still-uncovered symbols, so
+        every referenced symbol is covered by as few read-only files as
+        possible. Symbols defined in the editable files themselves, or in too
+        many files to be meaningful, are ignored.
+
+        Args:
+            relative_editable_files: The files that will be edited
+            max_files: Maximum number of files to select
+
+        Returns:
+            Relative paths of the selected read-only files
+        """
+        with self._lock:
+            editable = set(relative_editable_files)
+            referenced: set[str] = set()
+            defined_here: set[str] = set()
+            for rel_fname in editable:
+                entry = self._files.get(rel_fname)
+                if entry is not None:
+                    referenced.update(entry["refs"])
+                    defined_here.update(name for name, _ in entry["defs"])
+
+            # candidate file -> referenced symbols it defines
+            provides: dict[str, set[str]] = defaultdict(set)
+            for name in referenced - defined_here:
+                locations = {f for f, _ in self._definitions.get(name, [])}
+                if len(locations) > MAX_DEFINITIONS_PER_NAME:
+                    continue
+                for rel_fname in locations - editable:
+                    provides[rel_fname].add(name)
+
+        selected: list[str] = []
+        uncovered = set().union(*provides.values()) if provides else set()
+        while uncovered and len(selected) < max_files:
+            best = max(sorted(provides), key=lambda f: len(provides[f] & uncovered))
+            gained = provides[best] & uncovered
+            if not gained:
+                break
+            selected.append(best)
+            uncovered -= gained
+        return selected
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the size of the index.
+
+        Returns:
+            Dictionary with file and symbol counts
+        """
+        with self._lock:
+            return {
+                "root": self.root,
+                "files": len(self._files),
+                "symbols": len(self._definitions),
+            }
+
+
+def _definitions_of(
+    files: dict[str, dict[str, Any]],
+) -> dict[str, list[tuple[str, int]]]:
+    """Map each defined name to the (file, line) of its definitions."""
+    definitions: dict[str, list[tuple[str, int]]] = defaultdict(list)
+    for rel_fname, entry in files.items():
+        for name, line in entry["defs"]:
+            definitions[name].append((rel_fname, line))
+    return dict(definitions)
+
+
+# Indexes stay in memory until the server configures a directory
+_index_dir: Optional[str] = None
+_indexes: dict[str, SymbolIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def configure_symbol_index(index_dir: Optional[str]) -> None:
+    """
+    Set where symbol indexes are persisted.
+
+    Args:
+        index_dir: Directory for the index files, or None to keep them in memory
+    """
+    global _index_dir
+    with _indexes_lock:
+        _index_dir = index_dir
+        _indexes.clear()
+
+
+def get_symbol_index(root: str) -> SymbolIndex:
+    """
+    Get the process-wide symbol index of a repository.
+
+    Args:
+        root: The repository root
+
+    Returns:
+        The shared SymbolIndex, loaded from disk when it was persisted before.
+        Call update() before querying it.
+    """
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index_path = None
+            if _index_dir:
+                name = hashlib.sha256(root.encode()).hexdigest()[:16]
+                index_path = os.path.join(_index_dir, f"{name}.json")
+            index = SymbolIndex(root, index_path)
+            _indexes[root] = index
+        return index
+
+
+def invalidate_symbol_index(root: str) -> None:
+    """
+    Make the next query of a repository's index check the tree for changes.
+
+    Args:
+        root: The repository root; nothing happens if it has no index yet
+    """
+    with _indexes_lock:
+        index = _indexes.get(os.path.abspath(root))
+    if index is not None:
+        index.invalidate()
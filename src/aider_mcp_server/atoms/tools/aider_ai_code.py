@@ -1,24 +1,85 @@
+import contextlib
+import contextvars
+import functools
 import json
 import os
 import os.path
 import subprocess
-from typing import Union
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
 
 from aider.coders import Coder
 from aider.io import InputOutput
 from aider.models import Model, fuzzy_match_models
+from aider.repo import GitRepo
 
+from aider_mcp_server.atoms.cache_warmer import get_cache_warmer, stable_prefix
+from aider_mcp_server.atoms.cassette import (
+    RECORD,
+    REPLAY,
+    STUB_RESPONSE,
+    current_cassette,
+)
+from aider_mcp_server.atoms.changes import (
+    MAX_COMPARE_BYTES,
+    FileSnapshot,
+    detect_changes,
+    read_files,
+)
+from aider_mcp_server.atoms.excerpt import content_fallback
 from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.map_budget import get_map_budget
+from aider_mcp_server.atoms.overlay import OverlayIO, overlay_diff
+from aider_mcp_server.atoms.providers import get_provider_profile
+from aider_mcp_server.atoms.retry import (
+    DEFAULT_BASE_DELAY,
+    DEFAULT_MAX_RETRIES,
+    FAILOVER_ERRORS,
+    RETRYABLE_ERRORS,
+    backoff_delay,
+    classify_error,
+    failover_chain,
+)
+from aider_mcp_server.atoms.sessions import Session, get_session_table
+from aider_mcp_server.atoms.symbol_index import (
+    get_symbol_index,
+    invalidate_symbol_index,
+)
+from aider_mcp_server.atoms.tools.aider_estimate import (
+    estimate_context,
+    trim_readonly_files,
+)
+from aider_mcp_server.atoms.transaction import (
+    FileTransaction,
+    TransactionalIO,
+    begin_transaction,
+)
+from aider_mcp_server.atoms.utils import DEFAULT_CACHE_PROMPTS
+from aider_mcp_server.atoms.verify import Verifier, failure_report, get_verifier
 
 # Configure logging for this module
 logger = get_logger(__name__)
 
 # Type alias for response dictionary
-ResponseDict = dict[str, Union[bool, str]]
+ResponseDict = dict[str, Any]
+
+# Editor sub-jobs one architect or fan-out job may run at the same time
+DEFAULT_MAX_EDITORS = 4
+
+EDITOR_PROMPT = (
+    "{plan}\n\n"
+    "Apply the changes described above that belong in {fnames}. "
+    "The other files are being edited separately, do not change them."
+)
 
 
 def _get_changes_diff_or_content(
-    relative_editable_files: list[str], working_dir: str | None = None
+    relative_editable_files: list[str],
+    working_dir: str | None = None,
+    contents: dict[str, bytes | None] | None = None,
 ) -> str:
     """
     Get the git diff for the specified files, or their content if git fails.
@@ -26,6 +87,8 @@ def _get_changes_diff_or_content(
     Args:
         relative_editable_files: List of files to check for changes
         working_dir: The working directory where the git repo is located
+        contents: Absolute path -> content already read, so the fallback does
+            not read the files again
     """
     diff = ""
     # Log current directory for debugging
@@ -35,19 +98,18 @@ def _get_changes_diff_or_content(
         logger.info(f"Using working directory: {working_dir}")
 
     # Always attempt to use git
-    files_arg = " ".join(relative_editable_files)
     logger.info(f"Attempting to get git diff for: {' '.join(relative_editable_files)}")
 
     try:
         # Use git -C to specify the repository directory
+        diff_cmd = ["git"]
         if working_dir:
-            diff_cmd = f"git -C {working_dir} diff -- {files_arg}"
-        else:
-            diff_cmd = f"git diff -- {files_arg}"
+            diff_cmd += ["-C", working_dir]
+        diff_cmd += ["diff", "--", *relative_editable_files]
 
-        logger.info(f"Running git command: {diff_cmd}")
+        logger.info(f"Running git command: {' '.join(diff_cmd)}")
         diff = subprocess.check_output(
-            diff_cmd, shell=True, text=True, stderr=subprocess.PIPE
+            diff_cmd, encoding="utf-8", errors="replace", stderr=subprocess.PIPE
         )
         logger.info("Successfully obtained git diff.")
     except subprocess.CalledProcessError as e:
@@ -56,26 +118,7 @@ def _get_changes_diff_or_content(
             f"Error: {e.stderr.strip()}"
         )
         logger.warning("Falling back to reading file contents.")
-        diff = "Git diff failed. Current file contents:\n\n"
-        for file_path in relative_editable_files:
-            full_path = (
-                os.path.join(working_dir, file_path) if working_dir else file_path
-            )
-            if os.path.exists(full_path):
-                try:
-                    with open(full_path) as f:
-                        content = f.read()
-                        diff += f"--- {file_path} ---\n{content}\n\n"
-                        logger.info(f"Read content for {file_path}")
-                except Exception as read_e:
-                    logger.error(
-                        f"Failed reading file {full_path} for content fallback: "
-                        f"{read_e}"
-                    )
-                    diff += f"--- {file_path} --- (Error reading file)\n\n"
-            else:
-                logger.warning(f"File {full_path} not found during content fallback.")
-                diff += f"--- {file_path} --- (File not found)\n\n"
+        diff = content_fallback(relative_editable_files, working_dir, contents)
     except Exception as e:
         logger.error(f"Unexpected error getting git diff: {str(e)}")
         # Provide error in diff string as fallback
@@ -83,84 +126,44 @@ def _get_changes_diff_or_content(
     return diff
 
 
-def _check_for_meaningful_changes(
-    relative_editable_files: list[str], working_dir: str | None = None
-) -> bool:
-    """
-    Check if the edited files contain meaningful content.
-
-    Args:
-        relative_editable_files: List of files to check
-        working_dir: The working directory where files are located
-    """
-    for file_path in relative_editable_files:
-        # Use the working directory if provided
-        full_path = os.path.join(working_dir, file_path) if working_dir else file_path
-        logger.info(f"Checking for meaningful content in: {full_path}")
-
-        if os.path.exists(full_path):
-            try:
-                with open(full_path) as f:
-                    content = f.read()
-                    # Check if the file has more than just whitespace or a single
-                    # comment line, or contains common code keywords.
-                    # This is a heuristic.
-                    stripped_content = content.strip()
-                    if stripped_content and (
-                        len(stripped_content.split("\n")) > 1
-                        or any(
-                            kw in content
-                            for kw in [
-                                "def ",
-                                "class ",
-                                "import ",
-                                "from ",
-                                "async def",
-                            ]
-                        )
-                    ):
-                        logger.info(f"Meaningful content found in: {file_path}")
-                        return True
-            except Exception as e:
-                logger.error(
-                    f"Failed reading file {full_path} during meaningful "
-                    f"change check: {e}"
-                )
-                # If we can't read it, we can't confirm meaningful change
-                # from this file
-                continue
-        else:
-            logger.info(
-                f"File not found or empty, skipping meaningful check: {full_path}"
-            )
-
-    logger.info("No meaningful changes detected in any editable files.")
-    return False
-
-
 def _process_coder_results(
-    relative_editable_files: list[str], working_dir: str | None = None
+    relative_editable_files: list[str],
+    working_dir: str,
+    before: dict[str, FileSnapshot],
 ) -> ResponseDict:
     """
     Process the results after Aider has run, checking for meaningful changes
     and retrieving the diff or content.
 
+    Each file is read once; its content is compared with the snapshot taken
+    before the run and reused if the diff has to fall back to file contents.
+    Files larger than MAX_COMPARE_BYTES are only hashed, and the fallback
+    reads their excerpt from disk.
+
     Args:
         relative_editable_files: List of files that were edited
         working_dir: The working directory where the git repo is located
+        before: Absolute path -> content of the files before the run
 
     Returns:
-        Dictionary with success status and diff output
+        Dictionary with success status, diff output and the changed files
     """
-    diff_output = _get_changes_diff_or_content(relative_editable_files, working_dir)
-    logger.info("Checking for meaningful changes in edited files...")
-    has_meaningful_content = _check_for_meaningful_changes(
-        relative_editable_files, working_dir
+    abs_files = [os.path.join(working_dir, f) for f in relative_editable_files]
+    after = read_files(dict.fromkeys([*abs_files, *before]), MAX_COMPARE_BYTES)
+    changes = detect_changes(before, after, working_dir)
+    diff_output = _get_changes_diff_or_content(
+        relative_editable_files,
+        working_dir,
+        {
+            path: content
+            for path, content in after.items()
+            if isinstance(content, bytes)
+        },
     )
 
-    if has_meaningful_content:
+    if any(change["meaningful"] for change in changes):
         logger.info("Meaningful changes found. Processing successful.")
-        return {"success": True, "diff": diff_output}
+        return {"success": True, "diff": diff_output, "changes": changes}
     else:
         logger.warning(
             "No meaningful changes detected. Processing marked as unsuccessful."
@@ -170,9 +173,903 @@ def _process_coder_results(
             "success": False,
             "diff": diff_output
             or "No meaningful changes detected and no diff/content available.",
+            "changes": changes,
         }
 
 
+def _process_overlay_results(
+    overlay: dict[str, str], working_dir: str, before: dict[str, FileSnapshot]
+) -> ResponseDict:
+    """
+    Process the results of a dry run, whose edits are held in memory.
+
+    Args:
+        overlay: Absolute path -> content written by the dry run
+        working_dir: The working directory where the git repo is located
+        before: Absolute path -> content of the files before the run
+
+    Returns:
+        Dictionary with success status, the proposed diff and the changed files
+    """
+    diff_output, changed_files = overlay_diff(overlay, working_dir)
+    before = {
+        **read_files((f for f in overlay if f not in before), MAX_COMPARE_BYTES),
+        **before,
+    }
+    after: dict[str, FileSnapshot] = dict(before)
+    after.update((fname, content.encode()) for fname, content in overlay.items())
+    changes = detect_changes(before, after, working_dir)
+    if any(change["meaningful"] for change in changes):
+        logger.info(f"Dry run proposes changes to: {changed_files}")
+        return {"success": True, "diff": diff_output, "changes": changes}
+    logger.warning("Dry run proposed no meaningful changes.")
+    return {
+        "success": False,
+        "diff": diff_output or "No changes proposed.",
+        "changes": changes,
+    }
+
+
+def _verify_and_fix(
+    verifier: Verifier,
+    coder: Coder | None,
+    relative_editable_files: list[str],
+    working_dir: str,
+    before: dict[str, FileSnapshot],
+    model_chain: list[str],
+    max_retries: int,
+    timings: dict[str, float],
+) -> tuple[ResponseDict, dict[str, Any]]:
+    """
+    Produce the diff while the lint and test checks run, then fix failures once.
+
+    When a check fails and a coder is given, its output is sent back to the
+    coder for one more round of edits, after which the diff and the checks
+    are redone.
+
+    Args:
+        verifier: Runs the configured checks
+        coder: The coder to fix failures with, None to only report them
+        relative_editable_files: List of files that were edited
+        working_dir: The working directory where the git repo is located
+        before: Absolute path -> content of the files before the run
+        model_chain: The coder's model followed by its fallbacks
+        max_retries: Retries per model for transient provider errors
+        timings: Mapping of phase name to seconds spent
+
+    Returns:
+        Tuple of (result of _process_coder_results, verification status)
+    """
+    with _timed(timings, "verify"), ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(verifier.verify, working_dir, relative_editable_files)
+        response = _process_coder_results(relative_editable_files, working_dir, before)
+        verification = pending.result()
+    if verification["status"] != "failed" or coder is None:
+        return response, verification
+
+    logger.info("Verification failed, asking the model to fix it")
+    with _timed(timings, "fix"):
+        fix_error = _run_with_retries(
+            coder, failure_report(verification), model_chain, max_retries=max_retries
+        )
+    if fix_error:
+        logger.warning(f"Fix round failed: {fix_error}")
+        verification["fix_error"] = fix_error
+        return response, verification
+
+    first_checks = verification["checks"]
+    with _timed(timings, "verify"), ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(verifier.verify, working_dir, relative_editable_files)
+        response = _process_coder_results(relative_editable_files, working_dir, before)
+        verification = pending.result()
+    verification["fixed"] = verification["status"] != "failed"
+    verification["initial_checks"] = first_checks
+    return response, verification
+
+
+class _ProviderCallFailed(Exception):
+    """Raised inside Aider's send loop so our retry policy runs instead of Aider's."""
+
+
+def _capture_provider_errors(coder: Coder) -> list[BaseException]:
+    """
+    Wrap coder.send so that transient provider errors are recorded, not swallowed.
+
+    Aider catches provider errors inside its own send loop and only reports
+    them through its IO object. Re-raising them as _ProviderCallFailed skips
+    Aider's internal retries and leaves the original error in the returned list.
+
+    Args:
+        coder: The Aider coder whose send method should be wrapped
+
+    Returns:
+        List that receives every recorded provider error
+    """
+    errors: list[BaseException] = []
+    original_send = coder.send
+
+    def send(*args, **kwargs):
+        try:
+            yield from original_send(*args, **kwargs)
+        except Exception as err:
+            # Errors every model would fail on (e.g. a malformed request) are
+            # left to Aider; the rest are retried and then failed over
+            if classify_error(err) not in FAILOVER_ERRORS:
+                raise
+            errors.append(err)
+            raise _ProviderCallFailed(str(err)) from err
+
+    coder.send = send  # type: ignore[method-assign]
+    return errors
+
+
+def _tap_llm_calls(coder: Coder) -> None:
+    """
+    Record or replay the coder's LLM replies when a cassette is in use.
+
+    Replayed replies are handed to litellm as mock_response, so the job runs
+    through Aider and litellm as usual but never reaches the provider. The
+    coder's send must be Aider's own, see _run_with_retries(); a tap around
+    an earlier tap would record or consume every reply twice.
+
+    Args:
+        coder: The Aider coder whose send method should be wrapped
+    """
+    cassette = current_cassette()
+    if cassette is None:
+        return
+    original_send = coder.send
+
+    def send(messages, *args, **kwargs):
+        model = coder.main_model
+        if cassette.mode == REPLAY:
+            content = cassette.next_response(messages)
+            model.extra_params = {
+                **(model.extra_params or {}),
+                "mock_response": STUB_RESPONSE if content is None else content,
+            }
+            weak_model = model.weak_model
+            if weak_model is not None and weak_model is not model:
+                # Chat summaries and the like must not reach the provider either
+                weak_model.extra_params = {
+                    **(weak_model.extra_params or {}),
+                    "mock_response": STUB_RESPONSE,
+                }
+        yield from original_send(messages, *args, **kwargs)
+        if cassette.mode == RECORD:
+            cassette.add_interaction(
+                model.name, messages, coder.partial_response_content or ""
+            )
+
+    coder.send = send  # type: ignore[method-assign]
+
+
+def _new_model(model_name: str, **kwargs: Any) -> Model:
+    """
+    Create an Aider model with the provider profile's settings.
+
+    Args:
+        model_name: Name of the model
+        **kwargs: Further arguments for Aider's Model, e.g. editor_model
+
+    Returns:
+        The model
+    """
+    return get_provider_profile().apply(Model(model_name, **kwargs))
+
+
+def _switch_model(coder: Coder, model_name: str) -> None:
+    """
+    Point an existing coder at a different model, keeping its loaded context.
+
+    Args:
+        coder: The Aider coder to update
+        model_name: Name of the model to switch to
+    """
+    new_model = _new_model(model_name)
+    coder.main_model = new_model
+    if coder.repo_map is not None:
+        coder.repo_map.main_model = new_model
+
+
+def _run_with_retries(
+    coder: Coder,
+    ai_coding_prompt: str,
+    model_chain: list[str],
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_delay: float = DEFAULT_BASE_DELAY,
+) -> str | None:
+    """
+    Run the coder, retrying transient provider errors and failing over models.
+
+    The same coder (files, repo map and chat state) is reused for every
+    attempt; only the messages of the failed attempt are discarded.
+
+    Args:
+        coder: The Aider coder to run
+        ai_coding_prompt: The prompt to send
+        model_chain: The coder's current model followed by its fallbacks
+        max_retries: Retries per model for rate limit, timeout and 5xx errors
+        base_delay: Base delay in seconds for the jittered exponential backoff
+
+    Returns:
+        None on success, otherwise a description of the last provider error
+    """
+    # Wrap Aider's own send, not the wrappers of an earlier run on this coder
+    # (e.g. before a fix round), which would swallow the errors of this one
+    coder.__dict__.pop("send", None)
+    errors = _capture_provider_errors(coder)
+    _tap_llm_calls(coder)
+    done_messages = list(coder.done_messages)
+    cur_messages = list(coder.cur_messages)
+    last_error = None
+
+    for index, model_name in enumerate(model_chain):
+        if index > 0:
+            logger.warning(f"Failing over to model: {model_name}")
+            _switch_model(coder, model_name)
+
+        for attempt in range(max_retries + 1):
+            errors.clear()
+            coder.done_messages = list(done_messages)
+            coder.cur_messages = list(cur_messages)
+
+            coder.run(with_message=ai_coding_prompt)
+            if not errors:
+                return None
+
+            err = errors[-1]
+            kind = classify_error(err)
+            last_error = f"{kind} error from {model_name}: {err}"
+            logger.warning(f"Provider call failed ({last_error})")
+
+            if kind not in RETRYABLE_ERRORS or attempt == max_retries:
+                break
+            delay = backoff_delay(attempt, base_delay)
+            logger.info(f"Retrying {model_name} in {delay:.2f} seconds...")
+            time.sleep(delay)
+
+    return last_error
+
+
+def _open_git_repo(io: InputOutput, working_dir: str, main_model: Model):
+    """
+    Open the git repository rooted at working_dir for Aider.
+
+    Args:
+        io: The Aider IO object
+        working_dir: The working directory where the git repo is located
+        main_model: The model Aider uses, for commit message models
+
+    Returns:
+        The Aider GitRepo, or None if working_dir is not inside a git repository
+    """
+    try:
+        return GitRepo(io, [], working_dir, models=main_model.commit_message_models())
+    except FileNotFoundError:
+        return None
+
+
+def _journal_new_files(coder: Coder) -> None:
+    """
+    Make a coder note the files it creates in its transaction first.
+
+    Aider creates (and git adds) a file the model edits that is not in the
+    chat before writing it, so without this its pre-image would be empty.
+
+    Args:
+        coder: A coder whose IO may be a TransactionalIO
+    """
+    if not isinstance(coder.io, TransactionalIO):
+        return
+    allowed_to_edit = coder.allowed_to_edit
+
+    def journaled(path: str) -> Any:
+        # The transaction changes with each turn of a session
+        coder.io.transaction.track(coder.abs_root_path(path))
+        return allowed_to_edit(path)
+
+    coder.allowed_to_edit = journaled  # type: ignore[method-assign]
+
+
+def _roll_back(transaction: FileTransaction, working_dir: str) -> list[str]:
+    """
+    Roll back a job's edits, and unstage the files it created and git added.
+
+    Args:
+        transaction: The job's transaction
+        working_dir: The repository
+
+    Returns:
+        Absolute paths of the restored or removed files
+    """
+    restored = transaction.rollback()
+    removed = [f for f in restored if not os.path.lexists(f)]
+    if removed:
+        result = subprocess.run(
+            ["git", "-C", working_dir, "reset", "-q", "--", *removed],
+            capture_output=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            # No commit to reset to yet
+            subprocess.run(
+                ["git", "-C", working_dir, "rm", "-q", "--cached"]
+                + ["--ignore-unmatch", "--", *removed],
+                capture_output=True,
+                check=False,
+            )
+    return restored
+
+
+@contextlib.contextmanager
+def _timed(timings: dict[str, float], phase: str) -> Iterator[None]:
+    """
+    Add the wall-clock duration of the enclosed block to timings[phase].
+
+    Args:
+        timings: Mapping of phase name to seconds spent
+        phase: Name of the phase being timed
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[phase] = round(timings.get(phase, 0.0) + elapsed, 3)
+
+
+def _track_usage(coder: Coder) -> dict[str, float]:
+    """
+    Accumulate the token usage reported by every LLM response of a coder.
+
+    Args:
+        coder: The Aider coder to observe
+
+    Returns:
+        Mapping that is updated in place with token counts and LLM call count
+    """
+    usage: dict[str, float] = {
+        "llm_calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cache_hit_tokens": 0,
+        "cache_write_tokens": 0,
+    }
+    original_calculate = coder.calculate_and_show_tokens_and_cost
+
+    def calculate_and_show_tokens_and_cost(messages, completion=None):
+        original_calculate(messages, completion)
+        report = getattr(completion, "usage", None)
+        usage["llm_calls"] += 1
+        if report is None:
+            return
+        usage["prompt_tokens"] += getattr(report, "prompt_tokens", 0) or 0
+        usage["completion_tokens"] += getattr(report, "completion_tokens", 0) or 0
+        usage["cache_hit_tokens"] += (
+            getattr(report, "prompt_cache_hit_tokens", 0)
+            or getattr(report, "cache_read_input_tokens", 0)
+            or 0
+        )
+        usage["cache_write_tokens"] += (
+            getattr(report, "cache_creation_input_tokens", 0) or 0
+        )
+
+    coder.calculate_and_show_tokens_and_cost = calculate_and_show_tokens_and_cost  # type: ignore[method-assign]
+    return usage
+
+
+class _SortedSet(set):
+    """Set that iterates in sorted order, so Aider lists files deterministically."""
+
+    def __iter__(self):
+        return iter(sorted(set.__iter__(self)))
+
+
+def _track_prompt_prefix(coder: Coder) -> list[Any]:
+    """
+    Make a coder's prompt prefix stable across jobs and record it.
+
+    Aider lists files in set iteration order, which differs between processes
+    and insertion orders, so equal context could produce a different prompt
+    prefix and miss the provider's prompt cache. Files are listed sorted
+    instead, and the formatted prompt of every request is recorded in place of
+    Aider's own cache warming.
+
+    Args:
+        coder: The Aider coder to observe
+
+    Returns:
+        List that receives the ChatChunks of every request
+    """
+    coder.abs_fnames = _SortedSet(coder.abs_fnames)
+    coder.abs_read_only_fnames = _SortedSet(coder.abs_read_only_fnames)
+
+    chunks_seen: list[Any] = []
+
+    def warm_cache(chunks):
+        chunks_seen.append(chunks)
+        # Aider's own warming thread outlives the coder, the shared
+        # CacheWarmer keeps caches warm instead
+        return None
+
+    coder.warm_cache = warm_cache  # type: ignore[method-assign]
+    return chunks_seen
+
+
+def _keep_cache_warm(coder: Coder, chunks_seen: list[Any], working_dir: str) -> None:
+    """
+    Hand the latest prompt prefix of a coder to the shared cache warmer.
+
+    Args:
+        coder: The Aider coder that ran the job
+        chunks_seen: ChatChunks recorded by _track_prompt_prefix
+        working_dir: The repository the job ran against
+    """
+    warmer = get_cache_warmer()
+    if warmer is None or not chunks_seen or not coder.cache_prompts:
+        return
+    warmer.register(
+        coder.main_model.name,
+        working_dir,
+        stable_prefix(chunks_seen[-1]),
+        coder.main_model.extra_params,
+    )
+
+
+def _measure_repo_map(
+    coder: Coder, timings: dict[str, float], usage: dict[str, float]
+) -> None:
+    """
+    Record how long a coder spends building its repo map and how big it is.
+
+    Args:
+        coder: The Aider coder to observe
+        timings: Mapping that receives the "repo_map" phase duration
+        usage: Mapping that receives the repo map size as "map_tokens"
+    """
+    original_get_repo_map = coder.get_repo_map
+
+    def get_repo_map(*args, **kwargs):
+        with _timed(timings, "repo_map"):
+            repo_map = original_get_repo_map(*args, **kwargs)
+        map_tokens = coder.main_model.token_count(repo_map) if repo_map else 0
+        usage["map_tokens"] = max(usage.get("map_tokens", 0), map_tokens)
+        return repo_map
+
+    coder.get_repo_map = get_repo_map  # type: ignore[method-assign]
+
+
+def _add_cache_hit_rate(usage: dict[str, float]) -> None:
+    """
+    Report which share of the prompt tokens were served from the prompt cache.
+
+    Args:
+        usage: Usage mapping as returned by _track_usage, updated in place
+    """
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    if prompt_tokens:
+        usage["cache_hit_rate"] = round(
+            usage.get("cache_hit_tokens", 0) / prompt_tokens, 3
+        )
+
+
+def _merge_usage(usages: list[dict[str, float]]) -> dict[str, float]:
+    """
+    Add up the usage reported by several coders.
+
+    Args:
+        usages: Usage mappings as returned by _track_usage, plus "cost"
+
+    Returns:
+        Mapping with every counter summed
+    """
+    merged: dict[str, float] = {}
+    for usage in usages:
+        for key, value in usage.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _group_files(
+    relative_editable_files: list[str], file_groups: list[list[str]] | None
+) -> list[list[str]]:
+    """
+    Split the editable files into the groups that are edited together.
+
+    Args:
+        relative_editable_files: Files that can be edited
+        file_groups: Requested groups, or None. Editable files not in any
+            group get a group of their own.
+
+    Returns:
+        Disjoint, non-empty groups covering every editable file
+
+    Raises:
+        ValueError: If a group names a file that is not editable, or a file is
+            in more than one group
+    """
+    groups: list[list[str]] = []
+    grouped: set[str] = set()
+    for group in file_groups or []:
+        for fname in group:
+            if fname not in relative_editable_files:
+                raise ValueError(f"File group entry '{fname}' is not an editable file")
+            if fname in grouped:
+                raise ValueError(f"File '{fname}' is in more than one file group")
+            grouped.add(fname)
+        if group:
+            groups.append(list(group))
+    groups += [[fname] for fname in relative_editable_files if fname not in grouped]
+    return groups
+
+
+def _new_io(
+    overlay: dict[str, str] | None = None,
+    transaction: FileTransaction | None = None,
+) -> InputOutput:
+    """
+    Create the Aider IO for a coder.
+
+    Args:
+        overlay: In-memory overlay for dry runs
+        transaction: Transaction that journals the job's writes to disk
+
+    Returns:
+        An IO that auto-accepts changes and writes to the overlay, through the
+        transaction, or straight to disk when neither is given
+    """
+    if overlay is not None:
+        return OverlayIO(overlay)
+    if transaction is not None:
+        return TransactionalIO(transaction)
+    return InputOutput(yes=True)  # Use yes=True to auto-accept changes
+
+
+def _run_editor(
+    plan: str,
+    fnames: list[str],
+    model_chain: list[str],
+    edit_format: str | None,
+    working_dir: str,
+    abs_readonly_files: list[str],
+    max_retries: int,
+    coder_options: dict[str, Any] | None = None,
+    make_io: Callable[[], InputOutput] = _new_io,
+) -> tuple[dict[str, float], str | None]:
+    """
+    Apply the part of a plan that belongs to one group of files.
+
+    The editor only sees its own files and the read-only context, and runs
+    without a repo map, so that editors for different groups can run in
+    parallel.
+
+    Args:
+        plan: The description of the changes
+        fnames: Paths of the files to edit, relative to working_dir
+        model_chain: The model that applies the edits followed by its fallbacks
+        edit_format: Edit format for the editor, or None for the model's default
+        working_dir: The working directory where the git repo is located
+        abs_readonly_files: Absolute paths of the read-only context files
+        max_retries: Retries for rate limit, timeout and server errors
+        coder_options: Per-request Aider settings, see _coder_options()
+        make_io: Creates the editor's Aider IO, see _new_io()
+
+    Returns:
+        Tuple of (usage, error description or None)
+    """
+    options = dict(coder_options or {})
+    max_reflections = options.pop("max_reflections", None)
+    # Editors work from the plan, not from the repo map
+    options["map_tokens"] = 0
+    options.pop("map_refresh", None)
+    options.setdefault("edit_format", edit_format)
+
+    io = make_io()
+    model = _new_model(model_chain[0])
+    coder = Coder.create(
+        main_model=model,
+        io=io,
+        repo=_open_git_repo(io, working_dir, model),
+        fnames=[os.path.join(working_dir, f) for f in fnames],
+        read_only_fnames=abs_readonly_files,
+        auto_commits=False,
+        use_git=True,
+        show_diffs=False,
+        suggest_shell_commands=False,
+        **options,
+    )
+    if max_reflections is not None:
+        coder.max_reflections = max_reflections
+    _journal_new_files(coder)
+    _track_prompt_prefix(coder)
+    usage = _track_usage(coder)
+    error = _run_with_retries(
+        coder,
+        EDITOR_PROMPT.format(plan=plan, fnames=", ".join(fnames)),
+        model_chain,
+        max_retries=max_retries,
+    )
+    usage["cost"] = coder.total_cost
+    return usage, error
+
+
+def _run_fan_out(
+    ai_coding_prompt: str,
+    file_groups: list[list[str]],
+    abs_readonly_files: list[str],
+    model_chain: list[str],
+    editor_chain: list[str],
+    working_dir: str,
+    max_retries: int,
+    timings: dict[str, float],
+    coder_options: dict[str, Any] | None = None,
+    make_io: Callable[[], InputOutput] = _new_io,
+) -> tuple[dict[str, float], list[dict[str, Any]], str | None]:
+    """
+    Plan the change once, then edit each group of files in parallel.
+
+    The planner sees every file and the repo map but only describes the
+    change, using Aider's architect prompts. One editor per file group then
+    applies its part of the plan.
+
+    Args:
+        ai_coding_prompt: The prompt for the planner
+        file_groups: Disjoint groups of editable files, one editor each
+        abs_readonly_files: Absolute paths of the read-only context files
+        model_chain: The planner model followed by its fallbacks
+        editor_chain: The editor model followed by its fallbacks
+        working_dir: The working directory where the git repo is located
+        max_retries: Retries per model for transient provider errors
+        timings: Mapping that receives the "plan" and "edit" phase durations
+        coder_options: Per-request Aider settings, see _coder_options(). The
+            edit format and reflection limit only apply to the editors.
+        make_io: Creates the Aider IO of the planner and editors, see _new_io()
+
+    Returns:
+        Tuple of (merged usage, one result per file group, error or None)
+    """
+    planner_options = {
+        key: value
+        for key, value in (coder_options or {}).items()
+        if key not in ("edit_format", "max_reflections")
+    }
+    with _timed(timings, "coder_setup"):
+        main_model = _new_model(model_chain[0], editor_model=editor_chain[0])
+        io = make_io()
+        planner = Coder.create(
+            main_model=main_model,
+            edit_format="architect",
+            io=io,
+            repo=_open_git_repo(io, working_dir, main_model),
+            fnames=[
+                os.path.join(working_dir, f) for group in file_groups for f in group
+            ],
+            read_only_fnames=abs_readonly_files,
+            auto_commits=False,
+            use_git=True,
+            show_diffs=False,
+            **planner_options,
+        )
+        # Keep the plan instead of letting the architect run a single editor
+        # over all files
+        planner.reply_completed = lambda: None  # type: ignore[method-assign]
+        _journal_new_files(planner)
+    chunks_seen = _track_prompt_prefix(planner)
+    usage = _track_usage(planner)
+    _measure_repo_map(planner, timings, usage)
+
+    logger.info(f"Planning with model: {model_chain[0]}")
+    with _timed(timings, "plan"):
+        error = _run_with_retries(
+            planner, ai_coding_prompt, model_chain, max_retries=max_retries
+        )
+    usage["cost"] = planner.total_cost
+    _keep_cache_warm(planner, chunks_seen, working_dir)
+    plan = planner.partial_response_content
+    if error or not plan or not plan.strip():
+        return usage, [], error or "Planner returned an empty plan"
+
+    edit_format = main_model.editor_edit_format
+    logger.info(
+        f"Applying plan to {len(file_groups)} file groups with model: {editor_chain[0]}"
+    )
+    with _timed(timings, "edit"):
+        workers = min(DEFAULT_MAX_EDITORS, len(file_groups)) or 1
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="aider-editor"
+        ) as executor:
+            # Each editor runs in a copy of this context, e.g. to see the cassette
+            contexts = [contextvars.copy_context() for _ in file_groups]
+            results = list(
+                executor.map(
+                    lambda context, group: context.run(
+                        _run_editor,
+                        plan,
+                        group,
+                        editor_chain,
+                        edit_format,
+                        working_dir,
+                        abs_readonly_files,
+                        max_retries,
+                        coder_options,
+                        make_io,
+                    ),
+                    contexts,
+                    file_groups,
+                )
+            )
+
+    sub_jobs = [
+        {"files": group, "success": error is None, "error": error}
+        for group, (_, error) in zip(file_groups, results)
+    ]
+    errors = [f"{job['files']}: {job['error']}" for job in sub_jobs if job["error"]]
+    merged = _merge_usage([usage] + [editor_usage for editor_usage, _ in results])
+    return merged, sub_jobs, "; ".join(errors) or None
+
+
+def _reset_instrumentation(coder: Coder) -> None:
+    """
+    Remove the per-job wrappers of a coder, so the next job can add its own.
+
+    Args:
+        coder: The Aider coder kept alive by a session
+    """
+    for name in (
+        "send",
+        "calculate_and_show_tokens_and_cost",
+        "warm_cache",
+        "get_repo_map",
+    ):
+        coder.__dict__.pop(name, None)
+
+
+def _add_session_files(
+    coder: Coder, abs_editable_files: list[str], abs_readonly_files: list[str]
+) -> None:
+    """
+    Add the files of a follow-up turn to a session's coder.
+
+    Args:
+        coder: The Aider coder kept alive by the session
+        abs_editable_files: Absolute paths of the turn's editable files
+        abs_readonly_files: Absolute paths of the turn's read-only files
+    """
+    for fname in abs_editable_files:
+        if not os.path.exists(fname):
+            # Aider creates missing editable files when the coder is created
+            Path(fname).parent.mkdir(parents=True, exist_ok=True)
+            Path(fname).touch()
+        coder.abs_read_only_fnames.discard(fname)
+        coder.abs_fnames.add(fname)
+    for fname in abs_readonly_files:
+        if fname not in coder.abs_fnames and os.path.exists(fname):
+            coder.abs_read_only_fnames.add(fname)
+
+
+def _restore_session(
+    session: Session | None,
+    abs_editable_files: list[str],
+    abs_readonly_files: list[str],
+) -> tuple[list[str], list[str], list[dict[str, Any]]]:
+    """
+    Combine the state of an evicted session with the files of a new turn.
+
+    Args:
+        session: The session of the turn, or None outside of a session
+        abs_editable_files: Absolute paths of the turn's editable files
+        abs_readonly_files: Absolute paths of the turn's read-only files
+
+    Returns:
+        The editable files, read-only files and chat history to create the
+        coder with
+    """
+    if session is None or not session.saved:
+        return abs_editable_files, abs_readonly_files, []
+
+    saved = session.saved
+    logger.info(f"Restoring saved session {session.session_id}")
+    fnames = list(abs_editable_files)
+    for fname in saved.get("editable_files", []):
+        if fname not in fnames and os.path.exists(fname):
+            fnames.append(fname)
+    read_only_fnames = [
+        fname
+        for fname in abs_readonly_files + saved.get("readonly_files", [])
+        if fname not in fnames and os.path.exists(fname)
+    ]
+    return fnames, list(dict.fromkeys(read_only_fnames)), saved.get("done_messages", [])
+
+
+def _coder_options(
+    map_tokens: int | None = None,
+    map_refresh: str | None = None,
+    edit_format: str | None = None,
+    cache_prompts: bool | None = None,
+    max_reflections: int | None = None,
+    stream: bool | None = None,
+) -> dict[str, Any]:
+    """
+    Collect the per-request Aider settings that were actually given.
+
+    Args:
+        map_tokens: Repo map token budget, 0 disables the repo map
+        map_refresh: Repo map refresh policy
+        edit_format: Edit format the model should answer in
+        cache_prompts: Enable provider prompt caching
+        max_reflections: Maximum rounds of fixing failed edits
+        stream: Stream responses from the provider
+
+    Returns:
+        Mapping of setting name to value, without the settings left as None
+    """
+    options = {
+        "map_tokens": map_tokens,
+        "map_refresh": map_refresh,
+        "edit_format": edit_format,
+        "cache_prompts": cache_prompts,
+        "max_reflections": max_reflections,
+        "stream": stream,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _model_chain(model: str, failover_models: list[str] | None) -> list[str]:
+    """
+    Build the models a job tries in order, mapped by the provider profile.
+
+    Fallbacks are mapped like the primary model, so a profile that moves every
+    model to one provider also moves them; fallbacks that map to a model
+    already in the chain or that Aider does not recognize are skipped.
+
+    Args:
+        model: The primary model, already mapped by the provider profile
+        failover_models: Explicit fallbacks, None for the equivalent providers
+
+    Returns:
+        The primary model followed by its fallbacks
+    """
+    profile = get_provider_profile()
+    chain = [model]
+    for fallback in failover_chain(model, failover_models)[1:]:
+        fallback = profile.model_name(fallback)
+        if fallback in chain:
+            continue
+        if _validate_model(fallback)[0]:
+            chain.append(fallback)
+        else:
+            logger.warning(f"Skipping unrecognized failover model: {fallback}")
+    return chain
+
+
+def _validate_model(model_name: str) -> tuple[bool, list[str]]:
+    """
+    Check whether Aider recognizes a model name.
+
+    Args:
+        model_name: The model name to validate
+
+    Returns:
+        Tuple of (is_valid, fuzzy matches for the name)
+    """
+    # Allow the specific experimental model suggested by the API error message,
+    # even if fuzzy_match_models doesn't list it.
+    allowed_experimental = [
+        "gemini/gemini-2.5-pro-exp-03-25",
+        "vertex_ai/gemini-2.5-pro-exp-03-25",
+    ]
+    if model_name in allowed_experimental:
+        logger.warning(
+            f"Allowing potentially unlisted experimental model: {model_name}"
+        )
+        return True, []
+
+    valid_models = fuzzy_match_models(model_name)
+    # Check if the *exact* model name provided is in the list of valid fuzzy matches.
+    return model_name in valid_models, valid_models
+
+
 def _format_response(response: ResponseDict) -> str:
     """
     Format the response dictionary as a JSON string.
@@ -192,6 +1089,22 @@ def code_with_aider(
     relative_readonly_files: list[str] | None = None,
     model: str = "gemini/gemini-2.5-pro-exp-03-25",
     working_dir: str | None = None,
+    failover_models: list[str] | None = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    architect: bool = False,
+    editor_model: str | None = None,
+    fan_out: bool = False,
+    file_groups: list[list[str]] | None = None,
+    map_tokens: int | None = None,
+    map_refresh: str | None = None,
+    edit_format: str | None = None,
+    cache_prompts: bool | None = None,
+    max_reflections: int | None = None,
+    stream: bool | None = None,
+    auto_context: bool = False,
+    session_id: str | None = None,
+    dry_run: bool = False,
+    verify: bool = False,
 ) -> str:
     """
     Run Aider to perform AI coding tasks based on the provided prompt and files.
@@ -205,10 +1118,66 @@ def code_with_aider(
             Defaults to "gemini/gemini-2.5-pro-exp-03-25".
         working_dir (str, required): The working directory where git repository
             is located and files are stored.
+        failover_models (list[str] | None, optional): Ordered models to fall back
+            to when the primary model keeps failing. Defaults to None, which uses
+            the same model on equivalent providers (e.g. gemini -> vertex_ai).
+        max_retries (int, optional): Retries per model for rate limit, timeout
+            and server errors. Defaults to DEFAULT_MAX_RETRIES.
+        architect (bool, optional): Let `model` plan the change once and have
+            `editor_model` apply it to each editable file in parallel.
+            Defaults to False.
+        editor_model (str | None, optional): The model that applies the
+            architect's plan. Defaults to None, which uses `model`.
+        fan_out (bool, optional): Let `model` plan the change once, then edit
+            each file group in parallel with `model` itself. Defaults to False.
+        file_groups (list[list[str]] | None, optional): Editable files that an
+            architect or fan-out editor should edit together. Files not in any
+            group are edited on their own. Defaults to None.
+        map_tokens (int | None, optional): Repo map token budget, 0 disables the
+            repo map. Defaults to None, which uses the adaptive budget when it is
+            configured and Aider's default otherwise.
+        map_refresh (str | None, optional): Repo map refresh policy ("auto",
+            "always", "files" or "manual"). Defaults to None (Aider's default).
+        edit_format (str | None, optional): Edit format for the model.
+            Defaults to None (the model's default).
+        cache_prompts (bool | None, optional): Enable provider prompt caching.
+            Defaults to None (DEFAULT_CACHE_PROMPTS).
+        max_reflections (int | None, optional): Maximum rounds of fixing failed
+            edits. Defaults to None (Aider's default).
+        stream (bool | None, optional): Stream responses from the provider.
+            Defaults to None (Aider's default).
+        auto_context (bool, optional): Add the fewest files that define the
+            symbols referenced by the editable files as read-only context,
+            looked up in the repository's symbol index. Defaults to False.
+        session_id (str | None, optional): Continue the conversation of an
+            earlier job with the same id, keeping its chat history, files and
+            repo map; each turn runs on its own model. A failed turn is left
+            out of the history. Not supported with architect or fan-out mode.
+            Defaults to None, which starts a new conversation.
+        dry_run (bool, optional): Write the edits to an in-memory overlay and
+            return the proposed diff without touching the working tree. The
+            editable files must already exist. Defaults to False.
+        verify (bool, optional): Run the server's lint and test commands on
+            the changed files and the tests affected by them, and give the
+            model one round to fix failures. Defaults to False.
 
     Returns:
-        str: JSON string containing success status and diff output.
+        str: JSON string containing success status and diff output. Jobs that
+            reach Aider also report per-phase "timings" (seconds) and token
+            "usage", architect or fan-out jobs the result of each file group as
+            "sub_jobs", session jobs their "session_id" and "session_turn"
+            (with a diff of every change made in the session), dry runs
+            "dry_run" with the proposed diff, failed jobs whose edits were
+            undone the restored files as "rolled_back_files", auto_context
+            jobs the files they added as "auto_readonly_files", verified jobs
+            the outcome of their checks as "verification", and jobs whose
+            read-only files did not fit the model's context the dropped files
+            as "trimmed_readonly_files".
     """
+    job_started = time.perf_counter()
+    timings: dict[str, float] = {}
+    usage: dict[str, float] = {}
+
     # Fix for B006: Use None as default and initialize inside
     if relative_readonly_files is None:
         relative_readonly_files = []
@@ -219,41 +1188,16 @@ def code_with_aider(
             {"success": False, "diff": "Error: working_dir not provided"}
         )
 
-    # --- Start: Conditional configuration for CI (Vertex AI/ADC) vs Local (API Key) ---
-    is_ci_environment = os.getenv("GITHUB_ACTIONS") == "true"
-    effective_model = model
-
-    if is_ci_environment:
-        logger.info("CI environment detected. Configuring for Vertex AI with ADC.")
-        # Prepend prefix for Vertex AI models
-        if not model.startswith("vertex_ai/"):
-            effective_model = f"vertex_ai/{model.split('/')[-1]}"  # Use base model name
-            logger.info(f"Adjusted model name for Vertex AI: {effective_model}")
-        else:
-            logger.info("Model name already has vertex_ai/ prefix.")
-
-        # Set environment variables for litellm/Vertex AI ADC
-        vertex_project = "github-actions-457316"
-        vertex_location = "us-central1"  # Or your desired region
-        os.environ["VERTEX_PROJECT"] = vertex_project
-        os.environ["VERTEX_LOCATION"] = vertex_location
-        logger.info(f"Set VERTEX_PROJECT={vertex_project}")
-        logger.info(f"Set VERTEX_LOCATION={vertex_location}")
-        # Ensure API key is not interfering (though ADC should take precedence)
-        if "GOOGLE_API_KEY" in os.environ:
-            logger.warning(
-                "GOOGLE_API_KEY found in environment, ADC should still be used"
-                " for Vertex."
-            )
-            # Consider unsetting if issues persist: del os.environ["GOOGLE_API_KEY"]
-    else:
+    # Model mapping and provider settings (e.g. Vertex AI in CI) were resolved
+    # once at startup and are never written to the process environment
+    profile = get_provider_profile()
+    effective_model = profile.model_name(model)
+    if effective_model != model:
         logger.info(
-            "Local environment detected. Assuming API key "
-            "(e.g., GEMINI_API_KEY) is available."
+            f"Provider profile '{profile.name}' maps {model} to {effective_model}"
         )
-        # Use the model name directly, litellm should handle API key auth
-        logger.info(f"Using model name for API key auth: {effective_model}")
-    # --- End: Conditional configuration ---
+    if editor_model:
+        editor_model = profile.model_name(editor_model)
 
     # Log inputs
     logger.info("Received Aider AI Code request:")
@@ -276,24 +1220,7 @@ def code_with_aider(
     # --- Start: Add Model Validation ---
     logger.info(f"Validating model: {effective_model}")
 
-    # Allow the specific experimental model suggested by the API error message,
-    # even if fuzzy_match_models doesn't list it.
-    allowed_experimental = [
-        "gemini/gemini-2.5-pro-exp-03-25",
-        "vertex_ai/gemini-2.5-pro-exp-03-25",
-    ]
-    if effective_model in allowed_experimental:
-        logger.warning(
-            f"Allowing potentially unlisted experimental model: {effective_model}"
-        )
-        is_model_valid = True
-    else:
-        valid_models = fuzzy_match_models(
-            effective_model
-        )  # Validate adjusted model name
-        # Check if the *exact* model name provided is in the list
-        # of valid fuzzy matches.
-        is_model_valid = effective_model in valid_models  # Check adjusted model name
+    is_model_valid, valid_models = _validate_model(effective_model)
 
     if not is_model_valid:
         error_msg = f"Error: Model '{effective_model}' is not recognized or available."
@@ -312,6 +1239,44 @@ def code_with_aider(
         )
     # --- End: Add Model Validation ---
 
+    if architect and editor_model and not _validate_model(editor_model)[0]:
+        error_msg = f"Error: Editor model '{editor_model}' is not recognized."
+        logger.error(error_msg)
+        return _format_response({"success": False, "diff": error_msg})
+
+    if session_id and (architect or fan_out or dry_run):
+        error_msg = (
+            "Error: session_id cannot be combined with architect, fan_out or dry_run."
+        )
+        logger.error(error_msg)
+        return _format_response({"success": False, "diff": error_msg})
+
+    if verify and dry_run:
+        error_msg = "Error: verify cannot be combined with dry_run."
+        logger.error(error_msg)
+        return _format_response({"success": False, "diff": error_msg})
+
+    if dry_run:
+        # Aider creates missing editable files on disk before any edit
+        missing = [
+            f
+            for f in relative_editable_files
+            if not os.path.exists(os.path.join(working_dir, f))
+        ]
+        if missing:
+            error_msg = f"Error: dry_run cannot create new files: {missing}"
+            logger.error(error_msg)
+            return _format_response({"success": False, "diff": error_msg})
+
+    try:
+        groups = _group_files(relative_editable_files, file_groups)
+    except ValueError as e:
+        logger.error(f"Invalid file groups: {e}")
+        return _format_response({"success": False, "diff": f"Error: {e}"})
+
+    model_chain = _model_chain(effective_model, failover_models)
+    logger.info(f"Model failover chain: {model_chain}")
+
     # Check if the working directory is a git repository
     # Aider usually requires this
     is_git_repo = os.path.isdir(os.path.join(working_dir, ".git"))
@@ -328,53 +1293,301 @@ def code_with_aider(
         #     "diff": f"Error: working_dir '{working_dir}' is not a git repository."
         # })
 
-    # Adjust file paths to be relative to the current process working directory
-    # if aider is run from a different CWD than the server
+    auto_readonly_files: list[str] = []
+    if auto_context:
+        with _timed(timings, "auto_context"):
+            try:
+                index = get_symbol_index(working_dir)
+                index.update()
+                auto_readonly_files = [
+                    f
+                    for f in index.select_context_files(relative_editable_files)
+                    if f not in relative_readonly_files
+                ]
+            except Exception as e:
+                logger.warning(f"Automatic context selection failed: {e}")
+        if auto_readonly_files:
+            logger.info(f"Adding read-only context files: {auto_readonly_files}")
+            relative_readonly_files = relative_readonly_files + auto_readonly_files
+
+    # Resolve file paths against working_dir so that Aider never depends on the
+    # process CWD, which is shared by all concurrently running jobs
     abs_editable_files = [os.path.join(working_dir, f) for f in relative_editable_files]
     abs_readonly_files = [os.path.join(working_dir, f) for f in relative_readonly_files]
 
     logger.info(f"Absolute Editable Files: {abs_editable_files}")
     logger.info(f"Absolute Readonly Files: {abs_readonly_files}")
 
-    try:
-        # Change to the target working directory before initializing Aider
-        original_cwd = os.getcwd()
-        os.chdir(working_dir)
-        logger.info(f"Changed directory to: {working_dir}")
-
-        # Create coder
-        main_model = Model(effective_model)  # Use the potentially adjusted model name
-        io = InputOutput(yes=True)  # Use yes=True to auto-accept changes
-
-        # Aider's Coder.create expects paths relative to its CWD,
-        # which is now working_dir
-        coder = Coder.create(
-            main_model=main_model,
-            io=io,
-            fnames=relative_editable_files,  # Pass relative paths here
-            read_only_fnames=relative_readonly_files,  # Pass relative paths here
-            auto_commits=False,  # Don't commit changes
-            use_git=True,  # Allow Aider to use git diff if available
-            show_diffs=False,
+    if cache_prompts is None:
+        cache_prompts = DEFAULT_CACHE_PROMPTS
+    map_budget = get_map_budget()
+    if map_tokens is None and map_budget is not None:
+        map_tokens = map_budget.choose(working_dir)
+        if map_tokens is not None:
+            logger.info(f"Adaptive repo map budget: {map_tokens} tokens")
+    coder_options = _coder_options(
+        map_tokens, map_refresh, edit_format, cache_prompts, max_reflections, stream
+    )
+    overlay: dict[str, str] | None = None
+    if dry_run:
+        overlay = {}
+        # Aider's linter reads files from disk, which a dry run leaves untouched
+        coder_options["auto_lint"] = False
+        # OverlayIO keeps the edits in memory, but Aider itself still creates
+        # and git adds the files the model edits outside the chat unless told
+        coder_options["dry_run"] = True
+    if coder_options:
+        logger.info(f"Aider settings: {coder_options}")
+
+    # Preflight: make sure the request fits the model's context window before
+    # any network call, dropping the largest read-only files if needed
+    with _timed(timings, "preflight"):
+        estimate = estimate_context(
+            relative_editable_files,
+            relative_readonly_files,
+            effective_model,
+            working_dir,
+            ai_coding_prompt=ai_coding_prompt,
+            map_tokens=map_tokens,
+        )
+        trimmed_files = trim_readonly_files(estimate)
+    if estimate["fits"] is False:
+        error_msg = (
+            f"Error: Request needs about {estimate['total_tokens']} input tokens, "
+            f"more than the {estimate['max_input_tokens']} token context of "
+            f"'{effective_model}' even without read-only files."
+        )
+        logger.error(error_msg)
+        return _format_response(
+            {"success": False, "diff": error_msg, "timings": timings}
         )
+    if trimmed_files:
+        logger.warning(f"Dropped read-only files to fit the context: {trimmed_files}")
+        abs_readonly_files = [
+            os.path.join(working_dir, f)
+            for f in relative_readonly_files
+            if f not in trimmed_files
+        ]
+    logger.info(f"Estimated input tokens: {estimate['total_tokens']}")
+
+    transaction: FileTransaction | None = None
+    if not dry_run:
+        # Note the missing files before Aider creates them, so a failed job
+        # can be rolled back in one step; the others are journaled on write
+        transaction = begin_transaction()
+        for fname in abs_editable_files:
+            transaction.track(fname)
+    make_io = functools.partial(_new_io, overlay, transaction)
+    # Snapshot for change detection; a session turn adds its earlier files
+    before = read_files(abs_editable_files, MAX_COMPARE_BYTES)
 
-        logger.info(f"Running Aider with prompt: {ai_coding_prompt}")
-        coder.run(with_message=ai_coding_prompt)
+    verifier = get_verifier() if verify else None
+    if verify and verifier is None:
+        logger.warning("Verification requested but no lint or test command is set")
+
+    sub_jobs = None
+    session_turn = None
+    diff_files = relative_editable_files
+    verified: tuple[ResponseDict, dict[str, Any]] | None = None
+    job_failed = False
+    try:
+        if architect or fan_out:
+            usage, sub_jobs, provider_error = _run_fan_out(
+                ai_coding_prompt,
+                groups,
+                abs_readonly_files,
+                model_chain,
+                [editor_model or effective_model] if architect else model_chain,
+                working_dir,
+                max_retries,
+                timings,
+                coder_options,
+                make_io,
+            )
+        else:
+            options = dict(coder_options)
+            max_reflections = options.pop("max_reflections", None)
+            session_context = (
+                get_session_table().checkout(session_id, working_dir)
+                if session_id
+                else contextlib.nullcontext()
+            )
+            with session_context as session:
+                with _timed(timings, "coder_setup"):
+                    coder = session.coder if session is not None else None
+                    if coder is not None:
+                        logger.info(f"Continuing session {session_id}")
+                        if transaction and isinstance(coder.io, TransactionalIO):
+                            # Journal this turn's writes in its own transaction
+                            coder.io.transaction = transaction
+                        _add_session_files(
+                            coder, abs_editable_files, abs_readonly_files
+                        )
+                        if coder.main_model.name != effective_model:
+                            # Also undoes a failover of an earlier turn
+                            _switch_model(coder, effective_model)
+                    else:
+                        fnames, read_only_fnames, history = _restore_session(
+                            session, abs_editable_files, abs_readonly_files
+                        )
+                        # Create coder
+                        # Use the potentially adjusted model
+                        main_model = _new_model(effective_model)
+                        io = make_io()
+
+                        coder = Coder.create(
+                            main_model=main_model,
+                            io=io,
+                            repo=_open_git_repo(io, working_dir, main_model),
+                            fnames=fnames,
+                            read_only_fnames=read_only_fnames,
+                            auto_commits=False,  # Don't commit changes
+                            use_git=True,  # Allow Aider to use git diff if available
+                            show_diffs=False,
+                            **options,
+                        )
+                        coder.done_messages = history
+                        _journal_new_files(coder)
+                    if max_reflections is not None:
+                        coder.max_reflections = max_reflections
+                    before.update(
+                        read_files(
+                            (f for f in coder.abs_fnames if f not in before),
+                            MAX_COMPARE_BYTES,
+                        )
+                    )
+                # Snapshot to undo this turn's part of a session's conversation
+                # along with its edits
+                turn_history = (list(coder.done_messages), list(coder.cur_messages))
+                try:
+                    # A session's coder keeps counting the cost of earlier turns
+                    cost_before = coder.total_cost
+                    chunks_seen = _track_prompt_prefix(coder)
+                    usage = _track_usage(coder)
+                    _measure_repo_map(coder, timings, usage)
+
+                    logger.info(f"Running Aider with prompt: {ai_coding_prompt}")
+                    with _timed(timings, "llm"):
+                        provider_error = _run_with_retries(
+                            coder,
+                            ai_coding_prompt,
+                            model_chain,
+                            max_retries=max_retries,
+                        )
+                    if session is not None:
+                        # Report every change made in the session, not just this turn
+                        diff_files = sorted(
+                            os.path.relpath(f, working_dir) for f in coder.abs_fnames
+                        )
+                    if verifier is not None and not provider_error:
+                        verified = _verify_and_fix(
+                            verifier,
+                            coder,
+                            diff_files,
+                            working_dir,
+                            before,
+                            model_chain,
+                            max_retries,
+                            timings,
+                        )
+                    usage["cost"] = coder.total_cost - cost_before
+                    _keep_cache_warm(coder, chunks_seen, working_dir)
+                except BaseException:
+                    coder.done_messages, coder.cur_messages = turn_history
+                    raise
+
+                if session is not None:
+                    if provider_error:
+                        coder.done_messages, coder.cur_messages = turn_history
+                    _reset_instrumentation(coder)
+                    session.coder = coder
+                    session_turn = session.turns + 1
+        _add_cache_hit_rate(usage)
         logger.info("Aider run completed.")
 
-        # Process results after Aider run
-        response = _process_coder_results(
-            relative_editable_files, working_dir=None
-        )  # Check diff relative to CWD
+        if map_budget is not None and not provider_error:
+            map_budget.record(
+                working_dir,
+                map_tokens=int(usage.get("map_tokens", 0)),
+                build_time=timings.get("repo_map", 0.0),
+                input_tokens=int(usage.get("prompt_tokens", 0)),
+                latency=time.perf_counter() - job_started,
+            )
+
+        response: ResponseDict
+        if provider_error:
+            logger.error(f"All models failed. Last error: {provider_error}")
+            job_failed = True
+            response = {
+                "success": False,
+                "diff": f"Error during Aider execution: {provider_error}",
+            }
+        elif verifier is not None:
+            if verified is None:
+                # Fan-out editors are gone by now, so failures are only reported
+                verified = _verify_and_fix(
+                    verifier,
+                    None,
+                    diff_files,
+                    working_dir,
+                    before,
+                    model_chain,
+                    max_retries,
+                    timings,
+                )
+            response = verified[0]
+            response["verification"] = verified[1]
+        else:
+            # Process results after Aider run
+            with _timed(timings, "diff"):
+                if overlay is not None:
+                    response = _process_overlay_results(overlay, working_dir, before)
+                else:
+                    response = _process_coder_results(diff_files, working_dir, before)
 
     except Exception as e:
         logger.error(f"Error during Aider execution: {str(e)}", exc_info=True)
+        job_failed = True
         response = {"success": False, "diff": f"Error during Aider execution: {str(e)}"}
-    finally:
-        # Ensure we change back to the original directory
-        os.chdir(original_cwd)
-        logger.info(f"Changed directory back to: {original_cwd}")
+    except BaseException:
+        # Cancelled: leave the tree as it was before the job
+        if transaction is not None:
+            _roll_back(transaction, working_dir)
+        raise
 
+    if transaction is not None:
+        if job_failed:
+            rolled_back = _roll_back(transaction, working_dir)
+            if rolled_back:
+                response["rolled_back_files"] = sorted(
+                    os.path.relpath(f, working_dir) for f in rolled_back
+                )
+        else:
+            transaction.commit()
+        # Queries see the job's edits without waiting for the index to expire
+        invalidate_symbol_index(working_dir)
+
+    timings["total"] = round(time.perf_counter() - job_started, 3)
+    response["timings"] = timings
+    response["usage"] = usage
+    if sub_jobs is not None:
+        response["sub_jobs"] = sub_jobs
+    if dry_run:
+        response["dry_run"] = True
+    if verify and verifier is None:
+        response["verification"] = {
+            "status": "skipped",
+            "reason": "No lint or test command is configured",
+        }
+    if session_turn is not None:
+        response["session_id"] = session_id
+        response["session_turn"] = session_turn
+    if auto_readonly_files:
+        response["auto_readonly_files"] = [
+            f for f in auto_readonly_files if f not in trimmed_files
+        ]
+    if trimmed_files:
+        response["trimmed_readonly_files"] = trimmed_files
     formatted_response = _format_response(response)
     logger.info(f"Aider AI Code Response: {formatted_response}")
     return formatted_response
@@ -0,0 +1,223 @@
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from aider.models import Model
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.providers import get_provider_profile
+
+# Configure logging for this module
+logger = get_logger(__name__)
+
+# Tokens of Aider's system prompt and edit format examples, sent with every job
+PROMPT_OVERHEAD_TOKENS = 2500
+
+# Larger files are estimated from their size instead of being tokenized
+MAX_TOKENIZED_BYTES = 1024 * 1024
+BYTES_PER_TOKEN = 4
+
+# Token counts memoized by (model, file hash), least recently used dropped first
+MAX_CACHED_COUNTS = 4096
+_token_counts: OrderedDict[tuple[str, str], int] = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=64)
+def _model(model_name: str) -> Model:
+    """Get a shared Aider model, whose tokenizer and limits are reused per name."""
+    # Mapped and configured like the models code_with_aider runs
+    profile = get_provider_profile()
+    return profile.apply(Model(profile.model_name(model_name)))
+
+
+def count_tokens(model_name: str, content: bytes) -> int:
+    """
+    Count the tokens of file content, memoized by content hash.
+
+    Content above MAX_TOKENIZED_BYTES is estimated from its size.
+
+    Args:
+        model_name: The model whose tokenizer to use
+        content: The raw file content
+
+    Returns:
+        Number of tokens, 0 if the content cannot be tokenized
+    """
+    if len(content) > MAX_TOKENIZED_BYTES:
+        return len(content) // BYTES_PER_TOKEN
+
+    key = (model_name, hashlib.sha256(content).hexdigest())
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+
+    text = content.decode("utf-8", errors="replace")
+    tokens = _model(model_name).token_count(text) or 0
+
+    with _token_counts_lock:
+        _token_counts[key] = tokens
+        while len(_token_counts) > MAX_CACHED_COUNTS:
+            _token_counts.popitem(last=False)
+    return tokens
+
+
+def export_token_counts() -> list[list[Any]]:
+    """
+    Export the memoized token counts, e.g. to restore them after a restart.
+
+    Returns:
+        [model, content hash, tokens] entries, least recently used first
+    """
+    with _token_counts_lock:
+        return [
+            [model, digest, tokens] for (model, digest), tokens in _token_counts.items()
+        ]
+
+
+def restore_token_counts(entries: list[list[Any]]) -> int:
+    """
+    Add exported token counts to the memo.
+
+    Counts are keyed by content hash, so they stay valid whatever changed
+    in the repository since they were exported.
+
+    Args:
+        entries: Entries returned by export_token_counts()
+
+    Returns:
+        Number of restored counts
+    """
+    global _token_counts
+    with _token_counts_lock:
+        # Restored counts are older than any count made since startup
+        counts: OrderedDict[tuple[str, str], int] = OrderedDict(
+            ((model, digest), tokens)
+            for model, digest, tokens in entries[-MAX_CACHED_COUNTS:]
+        )
+        for key in _token_counts:
+            counts.pop(key, None)
+        restored = len(counts)
+        counts.update(_token_counts)
+        while len(counts) > MAX_CACHED_COUNTS:
+            counts.popitem(last=False)
+        _token_counts = counts
+    return restored
+
+
+def warm_tokenizers(model_names: list[str]) -> None:
+    """
+    Load the tokenizers of models before the first request needs them.
+
+    Args:
+        model_names: The models to load
+    """
+    for model_name in model_names:
+        try:
+            _model(model_name).token_count("")
+        except Exception as e:
+            logger.warning(f"Cannot load the tokenizer of {model_name}: {e}")
+
+
+def estimate_context(
+    relative_editable_files: list[str],
+    relative_readonly_files: list[str],
+    model: str,
+    working_dir: str,
+    ai_coding_prompt: str = "",
+    map_tokens: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Estimate the input tokens of an aider_ai_code request without calling a model.
+
+    Args:
+        relative_editable_files: Files that can be edited
+        relative_readonly_files: Files given as read-only context
+        model: The model the request would use
+        working_dir: The working directory the file paths are relative to
+        ai_coding_prompt: The prompt of the request
+        map_tokens: Repo map budget, None for the model's default
+
+    Returns:
+        Dictionary with per-file token counts, the estimated total, the model's
+        input limit and whether the request fits ("fits" is None when the limit
+        is unknown)
+    """
+    main_model = _model(model)
+    if map_tokens is None:
+        map_tokens = main_model.get_repo_map_tokens()
+
+    files: dict[str, dict[str, Any]] = {}
+    missing: list[str] = []
+    for fname, editable in [(f, True) for f in relative_editable_files] + [
+        (f, False) for f in relative_readonly_files
+    ]:
+        try:
+            with open(os.path.join(working_dir, fname), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            if not editable:
+                missing.append(fname)
+            # Editable files that do not exist yet are created empty
+            content = b""
+        files[fname] = {
+            "tokens": count_tokens(model, content),
+            "editable": editable,
+        }
+
+    prompt_tokens = main_model.token_count(ai_coding_prompt) if ai_coding_prompt else 0
+    total = (
+        PROMPT_OVERHEAD_TOKENS
+        + (prompt_tokens or 0)
+        + map_tokens
+        + sum(f["tokens"] for f in files.values())
+    )
+    max_input_tokens = main_model.info.get("max_input_tokens")
+    return {
+        "model": model,
+        "max_input_tokens": max_input_tokens,
+        "overhead_tokens": PROMPT_OVERHEAD_TOKENS,
+        "prompt_tokens": prompt_tokens or 0,
+        "map_tokens": map_tokens,
+        "files": files,
+        "missing_files": missing,
+        "total_tokens": total,
+        "fits": total <= max_input_tokens if max_input_tokens else None,
+        "remaining_tokens": max_input_tokens - total if max_input_tokens else None,
+    }
+
+
+def trim_readonly_files(estimate: dict[str, Any]) -> list[str]:
+    """
+    Drop the largest read-only files from an estimate until the request fits.
+
+    Args:
+        estimate: Result of estimate_context(), updated in place
+
+    Returns:
+        The dropped read-only files. The estimate's "fits" stays False if the
+        request does not fit even without read-only files.
+    """
+    if estimate["fits"] is not False:
+        return []
+
+    limit = estimate["max_input_tokens"]
+    readonly = sorted(
+        (fname for fname, info in estimate["files"].items() if not info["editable"]),
+        key=lambda fname: estimate["files"][fname]["tokens"],
+        reverse=True,
+    )
+    dropped = []
+    for fname in readonly:
+        if estimate["total_tokens"] <= limit:
+            break
+        estimate["total_tokens"] -= estimate["files"].pop(fname)["tokens"]
+        dropped.append(fname)
+
+    estimate["fits"] = estimate["total_tokens"] <= limit
+    estimate["remaining_tokens"] = limit - estimate["total_tokens"]
+    return dropped
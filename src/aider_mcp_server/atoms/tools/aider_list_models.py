@@ -1,9 +1,10 @@
-# from typing import List # Removed unnecessary import
+from typing import Any, Optional
 
-from aider.models import fuzzy_match_models
+from aider_mcp_server.atoms.model_catalog import get_model_catalog
+from aider_mcp_server.atoms.utils import DEFAULT_PAGE_SIZE
 
 
-def list_models(substring: str) -> list[str]:  # Changed List to list
+def list_models(substring: str) -> list[str]:
     """
     List available models that match the provided substring.
 
@@ -12,6 +13,49 @@ def list_models(substring: str) -> list[str]:  # Changed List to list
 
     Returns:
         list[str]: List of model names matching the substring.
-            # Changed List to list in docstring - NOTE: Line break added
     """
-    return fuzzy_match_models(substring)
+    return get_model_catalog().names(substring)
+
+
+def search_models(
+    substring: str = "",
+    provider: Optional[str] = None,
+    edit_format: Optional[str] = None,
+    capabilities: Optional[list[str]] = None,
+    min_context: Optional[int] = None,
+    max_input_price: Optional[float] = None,
+    sort: str = "relevance",
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict[str, Any]:
+    """
+    List models with their metadata, filtered, ranked and paginated.
+
+    Args:
+        substring: Case-insensitive part of the model name
+        provider: Only models of this provider, e.g. "gemini"
+        edit_format: Only models Aider edits with this format by default
+        capabilities: Only models supporting all of these, e.g. "vision"
+        min_context: Only models with at least this many input tokens
+        max_input_price: Only models costing at most this per million input tokens
+        sort: "relevance", "name", "context" (largest first) or "price"
+            (cheapest first)
+        offset: Number of matching models to skip
+        limit: Maximum number of models to return
+
+    Returns:
+        Dictionary with the page of models (name, provider, context window,
+        prices per million tokens, edit formats and capabilities), the number
+        of matching models and the offset of the next page
+    """
+    return get_model_catalog().search(
+        substring=substring,
+        provider=provider,
+        edit_format=edit_format,
+        capabilities=capabilities,
+        min_context=min_context,
+        max_input_price=max_input_price,
+        sort=sort,
+        offset=offset,
+        limit=limit,
+    )
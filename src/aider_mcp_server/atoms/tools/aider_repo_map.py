@@ -0,0 +1,87 @@
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.symbol_index import DEFAULT_MAX_AGE, get_symbol_index
+from aider_mcp_server.atoms.utils import DEFAULT_MAX_MAP_FILES, DEFAULT_SEARCH_LIMIT
+
+# Configure logging for this module
+logger = get_logger(__name__)
+
+
+def repo_map(
+    working_dir: str,
+    path_prefix: str = "",
+    focus_files: Optional[list[str]] = None,
+    max_files: int = DEFAULT_MAX_MAP_FILES,
+) -> dict[str, Any]:
+    """
+    Outline the definitions of a repository's source files.
+
+    Args:
+        working_dir: The repository root
+        path_prefix: Only include files whose relative path starts with this
+        focus_files: Files of interest; when given, only the files defining
+            symbols they use are listed, most relevant first
+        max_files: Maximum number of files to list
+
+    Returns:
+        Dictionary with the files (each with its definitions and 1-based
+        lines), the number of matching files and whether the list was cut
+    """
+    index = get_symbol_index(working_dir)
+    index.update(max_age=DEFAULT_MAX_AGE)
+    outline = index.outline(path_prefix)
+
+    if focus_files:
+        scores = index.rank_files(focus_files)
+        fnames = sorted(
+            (f for f in outline if f in scores), key=lambda f: (-scores[f], f)
+        )
+    else:
+        fnames = list(outline)
+
+    files = [
+        {
+            "path": fname,
+            "definitions": [
+                {"name": name, "line": line + 1} for name, line in outline[fname]
+            ],
+        }
+        for fname in fnames[:max_files]
+    ]
+    return {
+        "files": files,
+        "total_files": len(fnames),
+        "truncated": len(fnames) > max_files,
+    }
+
+
+def symbol_search(
+    working_dir: str,
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    include_references: bool = False,
+) -> dict[str, Any]:
+    """
+    Find where symbols matching a query are defined.
+
+    Args:
+        working_dir: The repository root
+        query: Part of the symbol name, matched case-insensitively
+        limit: Maximum number of definitions to return
+        include_references: Also list the files that use each symbol
+
+    Returns:
+        Dictionary with the matching definitions (name, path, 1-based line)
+    """
+    index = get_symbol_index(working_dir)
+    index.update(max_age=DEFAULT_MAX_AGE)
+
+    matches = []
+    for name, fname, line in index.search(query, limit):
+        match: dict[str, Any] = {"name": name, "path": fname, "line": line + 1}
+        if include_references:
+            match["referenced_by"] = index.references(name)
+        matches.append(match)
+    logger.info(f"Symbol search '{query}' found {len(matches)} definitions")
+    return {"matches": matches}
@@ -0,0 +1,293 @@
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+from aider.io import InputOutput
+
+from aider_mcp_server.atoms.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Relative to the state directory, see utils.state_path()
+DEFAULT_JOURNAL_DIR = "journal"
+_MANIFEST = "manifest.json"
+
+
+def _fsync_dir(directory: str) -> None:
+    """Make the entries of a directory (e.g. a rename into it) durable."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows, where renames are durable
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path: str, data: bytes, mode: Optional[int] = None) -> None:
+    """
+    Replace a file in one step, so readers see either old or new content.
+
+    The content is flushed to disk before the rename and the rename before
+    returning, so after a crash the file holds the old or the new content.
+    A symlink is kept, and the file it points to is replaced.
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+class FileTransaction:
+    """Journaled file writes of one job that can be rolled back in one step.
+
+    The first time a file is written its pre-image is saved to the journal
+    directory, and every write goes to a temporary file that is renamed over
+    the original. Files that do not exist yet are tracked before anything
+    creates them. Rolling back restores the pre-images the same way and
+    removes files the job created; a journal left behind by a crash is
+    rolled back by recover_journals().
+    """
+
+    def __init__(self, journal_dir: Optional[str] = None):
+        """
+        Start a transaction.
+
+        Args:
+            journal_dir: Directory the pre-images are saved under, or None to
+                keep them in memory only
+        """
+        self.txn_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        # Absolute path -> pre-image bytes, None if the file did not exist
+        self._preimages: dict[str, Optional[bytes]] = {}
+        self._dir = Path(journal_dir) / self.txn_id if journal_dir else None
+        self._closed = False
+
+    def _save_manifest(self) -> None:
+        if self._dir is None:
+            return
+        entries = [
+            {"path": path, "blob": None if data is None else f"{index}.pre"}
+            for index, (path, data) in enumerate(self._preimages.items())
+        ]
+        _atomic_write(str(self._dir / _MANIFEST), json.dumps(entries).encode())
+
+    def _record(self, path: str, data: Optional[bytes]) -> None:
+        """Journal a file's pre-image; the caller holds the lock."""
+        if self._closed:
+            raise RuntimeError("Transaction is already finished")
+        if self._dir is not None:
+            if not self._dir.is_dir():
+                self._dir.mkdir(parents=True)
+                _fsync_dir(str(self._dir.parent))
+            if data is not None:
+                # Durable before the manifest refers to it
+                blob = self._dir / f"{len(self._preimages)}.pre"
+                _atomic_write(str(blob), data)
+        self._preimages[path] = data
+        self._save_manifest()
+
+    def track(self, path: str) -> None:
+        """
+        Note that a file does not exist yet, before something creates it.
+
+        Aider creates missing files empty before it writes them; without this
+        their pre-image would be that empty file, which a rollback would keep.
+        The pre-image of an existing file is saved by its first write().
+
+        Args:
+            path: The file
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._preimages and not os.path.lexists(path):
+                self._record(path, None)
+
+    def write(self, path: str, data: bytes) -> None:
+        """
+        Write a file atomically, journaling its pre-image first.
+
+        Args:
+            path: The file to write
+            data: The new content
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path not in self._preimages:
+                try:
+                    with open(path, "rb") as f:
+                        preimage: Optional[bytes] = f.read()
+                except FileNotFoundError:
+                    preimage = None
+                self._record(path, preimage)
+            elif self._closed:
+                raise RuntimeError("Transaction is already finished")
+        try:
+            mode: Optional[int] = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = None
+        _atomic_write(path, data, mode)
+
+    def commit(self) -> None:
+        """Keep the changes and drop the journal."""
+        with self._lock:
+            self._closed = True
+            self._preimages.clear()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def rollback(self) -> list[str]:
+        """
+        Restore every touched file to its pre-image.
+
+        Returns:
+            Absolute paths of the restored or removed files
+        """
+        with self._lock:
+            self._closed = True
+            preimages = dict(self._preimages)
+            self._preimages.clear()
+        restored = _restore(preimages)
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        if restored:
+            logger.info(f"Rolled back {len(restored)} files: {restored}")
+        return restored
+
+
+def _restore(preimages: dict[str, Optional[bytes]]) -> list[str]:
+    """Put files back to their pre-images, removing those that did not exist."""
+    restored = []
+    for path, data in preimages.items():
+        try:
+            if data is None:
+                if os.path.exists(path):
+                    os.unlink(path)
+                    restored.append(path)
+                continue
+            try:
+                with open(path, "rb") as f:
+                    if f.read() == data:
+                        continue
+            except FileNotFoundError:
+                pass
+            _atomic_write(path, data)
+            restored.append(path)
+        except OSError as e:
+            logger.error(f"Could not roll back {path}: {e}")
+    return restored
+
+
+def recover_journals(journal_dir: str) -> list[str]:
+    """
+    Roll back the transactions of jobs that did not finish, e.g. after a crash.
+
+    Args:
+        journal_dir: Directory the transactions saved their journals under
+
+    Returns:
+        Absolute paths of the restored or removed files
+    """
+    root = Path(journal_dir)
+    if not root.is_dir():
+        return []
+    restored: list[str] = []
+    for txn_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        try:
+            entries: list[dict[str, Any]] = json.loads(
+                (txn_dir / _MANIFEST).read_text()
+            )
+            preimages = {
+                entry["path"]: (
+                    None
+                    if entry["blob"] is None
+                    else (txn_dir / entry["blob"]).read_bytes()
+                )
+                for entry in entries
+            }
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping unreadable journal {txn_dir}: {e}")
+            continue
+        logger.warning(f"Rolling back unfinished transaction {txn_dir.name}")
+        restored.extend(_restore(preimages))
+        shutil.rmtree(txn_dir, ignore_errors=True)
+    return restored
+
+
+class TransactionalIO(InputOutput):
+    """Aider IO that writes files through a FileTransaction."""
+
+    def __init__(self, transaction: FileTransaction, **kwargs: Any):
+        """
+        Initialize the IO.
+
+        Args:
+            transaction: The job's transaction, shared with its other IO objects
+            **kwargs: Arguments for Aider's InputOutput, yes=True by default
+        """
+        kwargs.setdefault("yes", True)
+        super().__init__(**kwargs)
+        self.transaction = transaction
+
+    def write_text(self, filename, content, max_retries=5, initial_delay=0.1):
+        if self.dry_run:
+            return
+        # Translate line endings like a file opened in text mode would
+        newline = os.linesep if self.newline is None else self.newline
+        if newline != "\n":
+            content = content.replace("\n", newline)
+        try:
+            self.transaction.write(str(filename), content.encode(self.encoding))
+        except OSError as err:
+            self.tool_error(f"Unable to write file {filename}: {err}")
+            raise
+
+
+# Journals stay in memory until the server configures a directory
+_journal_dir: Optional[str] = None
+
+
+def configure_journal_dir(journal_dir: Optional[str]) -> None:
+    """
+    Set where transactions save their journals.
+
+    Args:
+        journal_dir: Directory for the journals, or None to keep them in memory
+    """
+    global _journal_dir
+    _journal_dir = journal_dir
+
+
+def begin_transaction() -> FileTransaction:
+    """
+    Start a transaction journaled in the configured directory.
+
+    Returns:
+        A new FileTransaction
+    """
+    return FileTransaction(_journal_dir)
@@ -1 +1,63 @@
+import os
+from typing import Optional
+
 DEFAULT_EDITOR_MODEL = "gemini/gemini-2.5-pro-exp-03-25"
+
+# Server-side caps for the per-request Aider settings of aider_ai_code
+MAX_MAP_TOKENS = 16384
+MAX_REFLECTIONS = 5
+
+# Mark the stable prompt prefix (system prompt, read-only files, repo map) as
+# cacheable unless a request opts out
+DEFAULT_CACHE_PROMPTS = True
+
+# Aider edit formats a request may choose; "ask"-style formats never edit
+EDIT_FORMATS = ("diff", "diff-fenced", "udiff", "whole", "editor-diff", "editor-whole")
+MAP_REFRESH_POLICIES = ("auto", "always", "files", "manual")
+
+# Session ids name the files evicted sessions are saved to
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,128}$"
+
+# Defaults and caps of the read-only tools, shared with their parameter models
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_MAX_MAP_FILES = 50
+DEFAULT_SEARCH_LIMIT = 20
+# Seconds between stack samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Directory the server keeps its logs, journals, job store and caches in
+STATE_DIR_ENV = "AIDER_MCP_STATE_DIR"
+STATE_DIR_NAME = "aider-mcp-server"
+
+
+def default_state_dir() -> str:
+    """
+    Get the directory the server keeps its state in when none is given.
+
+    Returns:
+        Absolute path: $AIDER_MCP_STATE_DIR if set, otherwise
+        "aider-mcp-server" in the user's state directory ($XDG_STATE_HOME,
+        by default ~/.local/state)
+    """
+    state_dir = os.environ.get(STATE_DIR_ENV)
+    if not state_dir:
+        base = os.environ.get("XDG_STATE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".local", "state"
+        )
+        state_dir = os.path.join(base, STATE_DIR_NAME)
+    return os.path.abspath(os.path.expanduser(state_dir))
+
+
+def state_path(path: str, state_dir: Optional[str] = None) -> str:
+    """
+    Resolve a path against the state directory.
+
+    Args:
+        path: A path relative to the state directory, or an absolute path
+        state_dir: The state directory, defaults to default_state_dir()
+
+    Returns:
+        The absolute path
+    """
+    return os.path.join(state_dir or default_state_dir(), os.path.expanduser(path))
@@ -0,0 +1,500 @@
+import ast
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.symbol_index import list_source_files
+
+logger = get_logger(__name__)
+
+# Replaced by the files a check should look at, e.g. "ruff check {files}"
+FILES_PLACEHOLDER = "{files}"
+DEFAULT_CHECK_TIMEOUT = 300.0
+# Results of checks on identical files that are kept for reuse
+MAX_CACHED_RESULTS = 256
+# Characters of a check's output that are reported and fed back to the model
+MAX_OUTPUT_CHARS = 4000
+
+# Files pytest runs before the tests below their directory
+CONFTEST_FILE = "conftest.py"
+
+_TEST_FILE_RE = re.compile(r"(^|/)(test_[^/]*|[^/]*_test)\.py$")
+
+
+def is_test_file(rel_fname: str) -> bool:
+    """Check whether a file looks like a pytest test module."""
+    return bool(_TEST_FILE_RE.search(rel_fname))
+
+
+def _file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _imported_modules(rel_fname: str, source: bytes) -> list[str]:
+    """List the dotted module names a Python file imports, relative ones resolved."""
+    try:
+        tree = ast.parse(source, filename=rel_fname)
+    except (SyntaxError, ValueError):
+        return []
+    package = os.path.dirname(rel_fname).replace(os.sep, ".").split(".")
+    modules: list[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = package[: len(package) - node.level + 1]
+                base = ".".join([p for p in parent if p] + ([base] if base else []))
+            if base:
+                modules.append(base)
+            # "from pkg import module" imports a module, not just a name
+            modules.extend(
+                f"{base}.{alias.name}" if base else alias.name for alias in node.names
+            )
+    return modules
+
+
+class ImportGraph:
+    """Import graph of a repository's Python files, used to select tests.
+
+    Files are re-parsed only when their content hash changes. Module names
+    are matched against file paths by suffix, so "pkg.mod" resolves to
+    "src/pkg/mod.py" without knowing the source roots; an ambiguous name
+    resolves to every candidate, which selects more tests rather than fewer.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        # Relative path -> (content hash, imported module names)
+        self._files: dict[str, tuple[str, list[str]]] = {}
+        # Dotted path suffix -> relative paths of the matching files
+        self._modules: dict[str, set[str]] = {}
+        # Relative path -> files that import it
+        self._importers: dict[str, set[str]] = {}
+
+    def update(self) -> int:
+        """
+        Re-parse the files that changed since the last update.
+
+        Returns:
+            Number of files parsed
+        """
+        with self._lock:
+            parsed = 0
+            files: dict[str, tuple[str, list[str]]] = {}
+            for rel_fname in list_source_files(self.root):
+                if not rel_fname.endswith(".py"):
+                    continue
+                try:
+                    with open(os.path.join(self.root, rel_fname), "rb") as f:
+                        source = f.read()
+                except OSError:
+                    continue
+                digest = hashlib.sha256(source).hexdigest()
+                cached = self._files.get(rel_fname)
+                if cached is not None and cached[0] == digest:
+                    files[rel_fname] = cached
+                    continue
+                files[rel_fname] = (digest, _imported_modules(rel_fname, source))
+                parsed += 1
+            if parsed or files.keys() != self._files.keys():
+                self._files = files
+                self._rebuild()
+            return parsed
+
+    def export_state(self) -> dict[str, list[Any]]:
+        """
+        Export the parsed files, e.g. to restore them after a restart.
+
+        Returns:
+            Relative path -> [content hash, imported module names]
+        """
+        with self._lock:
+            return {
+                rel: [digest, list(imported)]
+                for rel, (digest, imported) in self._files.items()
+            }
+
+    def restore_state(self, files: dict[str, list[Any]]) -> None:
+        """
+        Restore exported files, before the first update.
+
+        Entries are kept by content hash, so update() still re-parses the
+        files that changed since they were exported.
+
+        Args:
+            files: Files returned by export_state()
+        """
+        with self._lock:
+            if self._files:
+                return
+            self._files = {
+                rel: (digest, list(imported))
+                for rel, (digest, imported) in files.items()
+            }
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        modules: dict[str, set[str]] = {}
+        for rel_fname in self._files:
+            parts = rel_fname[: -len(".py")].split("/")
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            for start in range(len(parts)):
+                modules.setdefault(".".join(parts[start:]), set()).add(rel_fname)
+        importers: dict[str, set[str]] = {}
+        for rel_fname, (_, imported) in self._files.items():
+            for name in imported:
+                for target in modules.get(name, ()):
+                    if target != rel_fname:
+                        importers.setdefault(target, set()).add(rel_fname)
+        self._modules = modules
+        self._importers = importers
+
+    def affected_tests(self, rel_fnames: list[str]) -> list[str]:
+        """
+        Find the test files that import any of the files, directly or not.
+
+        Args:
+            rel_fnames: Changed files, relative to the repository root
+
+        Returns:
+            Sorted test files, including changed files that are tests
+        """
+        with self._lock:
+            seen = set(rel_fnames)
+            queue = deque(rel_fnames)
+            while queue:
+                for importer in self._importers.get(queue.popleft(), ()):
+                    if importer not in seen:
+                        seen.add(importer)
+                        queue.append(importer)
+        return sorted(
+            f
+            for f in seen
+            if is_test_file(f) and os.path.exists(os.path.join(self.root, f))
+        )
+
+    def import_closure(self, rel_fnames: list[str]) -> Optional[list[str]]:
+        """
+        Find the files that running the given files may execute.
+
+        These are the files themselves, the conftest.py files above them, the
+        files they import, directly or not, and the __init__.py files of the
+        packages on the way.
+
+        Args:
+            rel_fnames: Python files, relative to the repository root
+
+        Returns:
+            Sorted files, None if one of them is not in the graph (e.g. it is
+            not tracked by git), so what it imports is unknown
+        """
+        with self._lock:
+            queue = deque(rel_fnames)
+            for rel_fname in rel_fnames:
+                queue.extend(self._files_above(rel_fname, CONFTEST_FILE))
+            seen: set[str] = set()
+            while queue:
+                rel_fname = queue.popleft()
+                if rel_fname in seen:
+                    continue
+                if rel_fname not in self._files:
+                    return None
+                seen.add(rel_fname)
+                queue.extend(self._files_above(rel_fname, "__init__.py"))
+                for name in self._files[rel_fname][1]:
+                    queue.extend(self._modules.get(name, ()))
+        return sorted(seen)
+
+    def _files_above(self, rel_fname: str, basename: str) -> list[str]:
+        """List the files with this name in the directories containing a file."""
+        parts = rel_fname.split("/")[:-1]
+        candidates = (
+            "/".join([*parts[:depth], basename]) for depth in range(len(parts) + 1)
+        )
+        return [
+            f
+            for f in candidates
+            if f != rel_fname
+            and (f in self._files or os.path.isfile(os.path.join(self.root, f)))
+        ]
+
+
+class Verifier:
+    """Runs the configured lint and test commands on the files a job changed.
+
+    Commands containing FILES_PLACEHOLDER run on the changed files (lint) or
+    on the tests affected by them (test), and their results are cached by
+    the content hash of those files and, for tests, of every file they
+    import. Commands without it run as given on every verification and are
+    not cached.
+    """
+
+    def __init__(
+        self,
+        lint_cmd: Optional[str] = None,
+        test_cmd: Optional[str] = None,
+        timeout: float = DEFAULT_CHECK_TIMEOUT,
+    ):
+        """
+        Initialize the verifier.
+
+        Args:
+            lint_cmd: Lint command, e.g. "ruff check {files}"
+            test_cmd: Test command, e.g. "python -m pytest -q {files}"
+            timeout: Seconds a command may run before it counts as failed
+        """
+        self.lint_cmd = lint_cmd
+        self.test_cmd = test_cmd
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._graphs: dict[str, ImportGraph] = {}
+        self._results: OrderedDict[tuple[Any, ...], dict[str, Any]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def import_graph(self, root: str) -> ImportGraph:
+        """
+        Get the import graph of a repository, creating it on first use.
+
+        Args:
+            root: The repository
+
+        Returns:
+            The repository's ImportGraph
+        """
+        with self._lock:
+            graph = self._graphs.get(root)
+            if graph is None:
+                graph = self._graphs[root] = ImportGraph(root)
+            return graph
+
+    def import_graphs(self) -> dict[str, ImportGraph]:
+        """
+        Get the import graphs created so far.
+
+        Returns:
+            Repository -> its ImportGraph
+        """
+        with self._lock:
+            return dict(self._graphs)
+
+    def run_check(
+        self,
+        name: str,
+        command: str,
+        rel_fnames: list[str],
+        root: str,
+        depends_on: Optional[list[str]] = None,
+        cache: bool = True,
+    ) -> dict[str, Any]:
+        """
+        Run one command, or reuse its result for identical files.
+
+        Args:
+            name: Name of the check, "lint" or "test"
+            command: The command line, optionally with FILES_PLACEHOLDER
+            rel_fnames: Files substituted for FILES_PLACEHOLDER
+            root: Directory the command runs in
+            depends_on: Other files whose content the result depends on, e.g.
+                the files a selected test imports
+            cache: Whether the result may be reused, False when the files it
+                depends on are not known
+
+        Returns:
+            Dictionary with the check's "name", "command", "status" (passed,
+            failed or skipped), "output", "duration" and whether it was "cached"
+        """
+        argv = shlex.split(command)
+        key = None
+        if FILES_PLACEHOLDER in argv:
+            if not rel_fnames:
+                return {"name": name, "command": command, "status": "skipped"}
+            index = argv.index(FILES_PLACEHOLDER)
+            argv[index : index + 1] = rel_fnames
+            if cache:
+                key = (
+                    root,
+                    command,
+                    tuple(
+                        (f, _file_hash(os.path.join(root, f)))
+                        for f in sorted({*rel_fnames, *(depends_on or [])})
+                    ),
+                )
+                with self._lock:
+                    cached = self._results.get(key)
+                    if cached is not None:
+                        self._results.move_to_end(key)
+                        self._hits += 1
+                        return dict(cached, cached=True)
+                    self._misses += 1
+
+        started = time.perf_counter()
+        try:
+            proc = subprocess.run(
+                argv,
+                cwd=root,
+                capture_output=True,
+                text=True,
+                errors="replace",
+                timeout=self.timeout,
+            )
+            passed = proc.returncode == 0
+            output = proc.stdout + proc.stderr
+        except subprocess.TimeoutExpired:
+            passed = False
+            output = f"Timed out after {self.timeout} seconds"
+        except OSError as e:
+            passed = False
+            output = f"Could not run {argv[0]}: {e}"
+        result = {
+            "name": name,
+            "command": shlex.join(argv),
+            "status": "passed" if passed else "failed",
+            "output": output[-MAX_OUTPUT_CHARS:],
+            "duration": round(time.perf_counter() - started, 3),
+            "cached": False,
+        }
+        if key is not None:
+            with self._lock:
+                self._results[key] = result
+                while len(self._results) > MAX_CACHED_RESULTS:
+                    self._results.popitem(last=False)
+        return result
+
+    def verify(self, root: str, rel_fnames: list[str]) -> dict[str, Any]:
+        """
+        Lint the files and run the tests affected by them, in parallel.
+
+        Args:
+            root: The repository
+            rel_fnames: The changed files, relative to root
+
+        Returns:
+            Dictionary with the overall "status" (passed, failed or skipped),
+            the "checks" that ran and the "selected_tests"
+        """
+        existing = [f for f in rel_fnames if os.path.exists(os.path.join(root, f))]
+        selected: list[str] = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = []
+            if self.lint_cmd:
+                futures.append(
+                    executor.submit(
+                        self.run_check, "lint", self.lint_cmd, existing, root
+                    )
+                )
+            if self.test_cmd:
+                graph = self.import_graph(root)
+                graph.update()
+                selected = graph.affected_tests(existing)
+                # A test's result depends on everything it imports, not only
+                # on the changed files
+                closure = graph.import_closure(selected)
+                futures.append(
+                    executor.submit(
+                        self.run_check,
+                        "test",
+                        self.test_cmd,
+                        selected,
+                        root,
+                        [*existing, *(closure or [])],
+                        closure is not None,
+                    )
+                )
+            checks = [future.result() for future in futures]
+
+        statuses = {check["status"] for check in checks}
+        status = (
+            "failed"
+            if "failed" in statuses
+            else "passed"
+            if "passed" in statuses
+            else "skipped"
+        )
+        logger.info(f"Verification {status}: {[c['name'] for c in checks]}")
+        return {"status": status, "checks": checks, "selected_tests": selected}
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the result cache.
+
+        Returns:
+            Dictionary with the cached results and hit/miss counters
+        """
+        with self._lock:
+            return {
+                "cached_results": len(self._results),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+def failure_report(verification: dict[str, Any]) -> str:
+    """
+    Describe the failed checks for a follow-up prompt.
+
+    Args:
+        verification: Result of Verifier.verify()
+
+    Returns:
+        A prompt asking the model to fix the failures
+    """
+    sections = [
+        f"$ {check['command']}\n{check['output']}"
+        for check in verification["checks"]
+        if check["status"] == "failed"
+    ]
+    return (
+        "These checks failed after your changes. Fix the problems they report:\n\n"
+        + "\n\n".join(sections)
+    )
+
+
+_verifier: Optional[Verifier] = None
+
+
+def configure_verifier(
+    lint_cmd: Optional[str] = None,
+    test_cmd: Optional[str] = None,
+    timeout: float = DEFAULT_CHECK_TIMEOUT,
+) -> Optional[Verifier]:
+    """
+    Set the process-wide lint and test commands.
+
+    Args:
+        lint_cmd: Lint command, optionally with FILES_PLACEHOLDER
+        test_cmd: Test command, optionally with FILES_PLACEHOLDER
+        timeout: Seconds a command may run
+
+    Returns:
+        The shared Verifier, or None if neither command is given
+    """
+    global _verifier
+    _verifier = Verifier(lint_cmd, test_cmd, timeout) if lint_cmd or test_cmd else None
+    return _verifier
+
+
+def get_verifier() -> Optional[Verifier]:
+    """
+    Get the process-wide verifier.
+
+    Returns:
+        The shared Verifier, or None if no command is configured
+    """
+    return _verifier
@@ -0,0 +1,287 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Optional
+
+from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.map_budget import get_map_budget
+from aider_mcp_server.atoms.model_catalog import (
+    ModelCatalog,
+    configure_model_catalog,
+    get_model_catalog,
+)
+from aider_mcp_server.atoms.tools.aider_estimate import (
+    export_token_counts,
+    restore_token_counts,
+    warm_tokenizers,
+)
+from aider_mcp_server.atoms.verify import get_verifier
+
+logger = get_logger(__name__)
+
+WARM_STATE_VERSION = 1
+# Relative to the state directory, see utils.state_path()
+DEFAULT_WARM_STATE_PATH = "warm_state.json"
+# Seconds between periodic snapshots, so a crash loses little warm state
+DEFAULT_SAVE_INTERVAL = 300.0
+# Tokenizers loaded on restore, for the most recently used models
+MAX_WARM_TOKENIZERS = 4
+
+# Packages whose metadata the model catalog is built from
+_CATALOG_PACKAGES = ("aider-chat", "litellm")
+
+
+def _versions() -> dict[str, str]:
+    """Get the installed versions of the packages the model catalog depends on."""
+    versions = {}
+    for package in _CATALOG_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = "unknown"
+    return versions
+
+
+def _git_head(root: str) -> Optional[str]:
+    """Get the commit a repository is at, None if it is not a git repository."""
+    try:
+        result = subprocess.run(
+            ["git", "-C", root, "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+class WarmStateStore:
+    """Snapshots the server's warm caches to disk and restores them at startup.
+
+    A snapshot holds the model catalog, the memoized token counts and, per
+    repository, the repo map budget measurements and the import graph used to
+    select tests. On restore the catalog is only reused if Aider and litellm
+    are the versions it was built from, and the map budget measurements only
+    if the repository is still at the commit they were taken at. Token counts
+    and import graph entries are keyed by content hash, so they are reused
+    whatever changed; files that changed are counted and parsed again.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_SAVE_INTERVAL):
+        """
+        Initialize the store.
+
+        Args:
+            path: The snapshot file
+            interval: Seconds between periodic snapshots, 0 to only save on
+                close()
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last_saved: Optional[str] = None
+        self._saves = 0
+        self._restored: dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def capture(self) -> dict[str, Any]:
+        """
+        Collect the current warm state.
+
+        Returns:
+            JSON-serializable snapshot
+        """
+        repos: dict[str, dict[str, Any]] = {}
+        map_budget = get_map_budget()
+        if map_budget is not None:
+            for repo, samples in map_budget.export_state().items():
+                repos.setdefault(repo, {})["map_budget"] = samples
+        verifier = get_verifier()
+        if verifier is not None:
+            for root, graph in verifier.import_graphs().items():
+                files = graph.export_state()
+                if files:
+                    repos.setdefault(root, {})["import_graph"] = files
+        for root, state in repos.items():
+            state["head"] = _git_head(root)
+
+        return {
+            "version": WARM_STATE_VERSION,
+            "packages": _versions(),
+            "model_catalog": get_model_catalog().export_state(),
+            "token_counts": export_token_counts(),
+            "repos": repos,
+        }
+
+    def save(self) -> bool:
+        """
+        Write a snapshot, replacing the previous one in one step.
+
+        Returns:
+            True if a snapshot was written, False if nothing changed since the
+            last one or it could not be written
+        """
+        try:
+            encoded = json.dumps(self.capture())
+        except Exception as e:
+            logger.warning(f"Cannot capture the warm state: {e}")
+            return False
+        with self._lock:
+            if encoded == self._last_saved:
+                return False
+            tmp_path = self.path.with_suffix(".tmp")
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_text(encoded, encoding="utf-8")
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Cannot save the warm state to {self.path}: {e}")
+                return False
+            self._last_saved = encoded
+            self._saves += 1
+        logger.debug(f"Saved the warm state to {self.path}")
+        return True
+
+    def restore(self) -> dict[str, int]:
+        """
+        Restore the last snapshot into the process-wide caches.
+
+        Run it after the map budget controller and verifier are configured,
+        since their state is restored into them.
+
+        Returns:
+            What was restored: "model_catalog" (1 if reused), "token_counts",
+            "map_budget" and "import_graphs" (repositories), and
+            "stale_repos" (repositories no longer at the snapshot's commit)
+        """
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot read the warm state {self.path}: {e}")
+            return {}
+        if not isinstance(data, dict) or data.get("version") != WARM_STATE_VERSION:
+            logger.info(f"Ignoring warm state {self.path} of another version")
+            return {}
+
+        started = time.perf_counter()
+        restored = {
+            "model_catalog": 0,
+            "token_counts": 0,
+            "map_budget": 0,
+            "import_graphs": 0,
+            "stale_repos": 0,
+        }
+        catalog = data.get("model_catalog")
+        if catalog and data.get("packages") == _versions():
+            configure_model_catalog(ModelCatalog.from_state(catalog))
+            restored["model_catalog"] = 1
+
+        token_counts = data.get("token_counts") or []
+        restored["token_counts"] = restore_token_counts(token_counts)
+        # The most recently used models come last
+        models = list(dict.fromkeys(model for model, _, _ in reversed(token_counts)))
+        warm_tokenizers(models[:MAX_WARM_TOKENIZERS])
+
+        map_budget = get_map_budget()
+        verifier = get_verifier()
+        for root, state in (data.get("repos") or {}).items():
+            if not os.path.isdir(root):
+                continue
+            if state.get("head") != _git_head(root):
+                restored["stale_repos"] += 1
+            elif map_budget is not None and "map_budget" in state:
+                restored["map_budget"] += map_budget.restore_state(
+                    {root: state["map_budget"]}
+                )
+            if verifier is not None and "import_graph" in state:
+                verifier.import_graph(root).restore_state(state["import_graph"])
+                restored["import_graphs"] += 1
+
+        with self._lock:
+            self._restored = restored
+        logger.info(
+            f"Restored warm state from {self.path} in "
+            f"{time.perf_counter() - started:.3f}s: {restored}"
+        )
+        return restored
+
+    def start(self) -> None:
+        """Save a snapshot every interval seconds in a background thread."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._save_loop, name="warm-state-saver", daemon=True
+        )
+        self._thread.start()
+
+    def _save_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Report the snapshots.
+
+        Returns:
+            Dictionary with the snapshot file, the save interval, the number of
+            snapshots written and what was restored at startup
+        """
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "interval": self.interval,
+                "saves": self._saves,
+                "restored": dict(self._restored),
+            }
+
+    def close(self) -> None:
+        """Stop the periodic snapshots and save a last one."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.save()
+
+
+_store: Optional[WarmStateStore] = None
+_store_lock = threading.Lock()
+
+
+def configure_warm_state(
+    path: Optional[str] = None,
+    interval: float = DEFAULT_SAVE_INTERVAL,
+) -> Optional[WarmStateStore]:
+    """
+    Set up the process-wide warm state snapshots.
+
+    Args:
+        path: The snapshot file, None to not keep warm state across restarts.
+            The server passes DEFAULT_WARM_STATE_PATH in its state directory
+        interval: Seconds between periodic snapshots, 0 to only save on close
+
+    Returns:
+        The shared WarmStateStore, None when disabled
+    """
+    global _store
+    with _store_lock:
+        _store = WarmStateStore(path, interval) if path else None
+        return _store
+
+
+def get_warm_state() -> Optional[WarmStateStore]:
+    """
+    Get the process-wide warm state store.
+
+    Returns:
+        The shared WarmStateStore, None when disabled
+    """
+    return _store
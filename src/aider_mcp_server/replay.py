@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from aider_mcp_server.atoms.cassette import Cassette
+from aider_mcp_server.atoms.replay import replay_report
+
+
+def _cassette_paths(paths: list[str]) -> list[Path]:
+    """Expand directories into the cassette files they contain."""
+    found: list[Path] = []
+    for path in map(Path, paths):
+        found.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+    return found
+
+
+def _print_report(report: dict) -> None:
+    """Print the per-phase timings of every replayed job as a table."""
+    print(
+        f"aider-mcp-server {report['server_version']}, aider {report['aider_version']}"
+    )
+    for job in report["jobs"]:
+        status = "ok" if job["success"] else "FAILED"
+        same = "same diff" if job["diff_matches"] else "DIFFERENT DIFF"
+        print(f"\nJob {job['job_id']} ({status}, {same}, {job['runs']} runs)")
+        print(f"  {'phase':<14}{'baseline':>10}{'current':>10}{'delta':>10}")
+        for phase, delta in job["deltas"].items():
+            cells = [
+                "-" if delta[key] is None else f"{delta[key]:.3f}"
+                for key in ("baseline", "current", "delta")
+            ]
+            print(f"  {phase:<14}{cells[0]:>10}{cells[1]:>10}{cells[2]:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Replay recorded aider_ai_code jobs offline and report per-phase "
+            "timing deltas"
+        )
+    )
+    parser.add_argument(
+        "cassettes", nargs="+", help="Cassette files or directories of cassettes"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Runs per cassette; the median of each phase is reported (default: 1)",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help=(
+            "Report of an earlier replay, e.g. of another server version, to "
+            "compare with (default: the timings recorded with the cassette)"
+        ),
+    )
+    parser.add_argument(
+        "--output", default=None, help="Write the report as JSON to this file"
+    )
+    args = parser.parse_args()
+
+    try:
+        cassettes = [Cassette.load(path) for path in _cassette_paths(args.cassettes)]
+        baseline = None
+        if args.baseline:
+            baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
+    report = replay_report(cassettes, repeat=args.repeat, baseline=baseline)
+    _print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,250 @@
+import asyncio
+import contextlib
 import json
 import os
+import signal
 import subprocess
-from typing import Any, Union
+import time
+import uuid
+from collections.abc import Awaitable
+from typing import Any, Callable, Optional, Union
 
+import uvicorn
 from mcp.server import Server
+from mcp.server.sse import SseServerTransport
 from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
 
+from aider_mcp_server.atoms.admission import (
+    DEFAULT_QUEUE_TIMEOUT,
+    MB,
+    AdmissionController,
+    AdmissionRejected,
+    estimate_job_cost,
+)
+from aider_mcp_server.atoms.cache_warmer import (
+    DEFAULT_WARMING_PINGS,
+    configure_cache_warmer,
+    get_cache_warmer,
+)
+from aider_mcp_server.atoms.cassette import configure_recorder, get_recorder
+from aider_mcp_server.atoms.data_types import (
+    AICodeParams,
+    EstimateParams,
+    GetJobResultParams,
+    ListJobsParams,
+    ListModelsParams,
+    ProfileNextParams,
+    RepoMapParams,
+    ServerStatsParams,
+    SymbolSearchParams,
+    input_schema,
+)
+from aider_mcp_server.atoms.http_client import (
+    DEFAULT_MAX_CONNECTIONS,
+    configure_http_clients,
+    get_http_clients,
+    install_litellm_clients,
+    uninstall_litellm_clients,
+)
+from aider_mcp_server.atoms.job_pool import (
+    DEFAULT_MAX_INFLIGHT_PER_CLIENT,
+    DEFAULT_MAX_WORKERS,
+    JobPool,
+)
+from aider_mcp_server.atoms.job_store import (
+    DEFAULT_JOB_STORE_PATH,
+    configure_job_store,
+    get_job_store,
+    job_fingerprint,
+)
 from aider_mcp_server.atoms.logging import get_logger
+from aider_mcp_server.atoms.map_budget import configure_map_budget, get_map_budget
+from aider_mcp_server.atoms.model_catalog import (
+    configure_model_catalog,
+    get_model_catalog,
+)
+from aider_mcp_server.atoms.profiler import (
+    DEFAULT_PROFILE_DIR,
+    configure_profiler,
+    get_profiler,
+)
+from aider_mcp_server.atoms.providers import (
+    configure_provider_profile,
+    load_provider_profile,
+)
+from aider_mcp_server.atoms.sessions import (
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_SESSIONS,
+    DEFAULT_SESSION_DIR,
+    configure_session_table,
+    get_session_table,
+)
+from aider_mcp_server.atoms.symbol_index import (
+    DEFAULT_INDEX_DIR,
+    configure_symbol_index,
+    get_symbol_index,
+)
 from aider_mcp_server.atoms.tools.aider_ai_code import code_with_aider
-from aider_mcp_server.atoms.tools.aider_list_models import list_models
-from aider_mcp_server.atoms.utils import DEFAULT_EDITOR_MODEL
+from aider_mcp_server.atoms.tools.aider_estimate import estimate_context
+from aider_mcp_server.atoms.tools.aider_list_models import search_models
+from aider_mcp_server.atoms.tools.aider_repo_map import repo_map, symbol_search
+from aider_mcp_server.atoms.transaction import (
+    DEFAULT_JOURNAL_DIR,
+    configure_journal_dir,
+    recover_journals,
+)
+from aider_mcp_server.atoms.utils import (
+    DEFAULT_EDITOR_MODEL,
+    default_state_dir,
+    state_path,
+)
+from aider_mcp_server.atoms.verify import (
+    DEFAULT_CHECK_TIMEOUT,
+    configure_verifier,
+    get_verifier,
+)
+from aider_mcp_server.atoms.warm_state import (
+    DEFAULT_SAVE_INTERVAL,
+    DEFAULT_WARM_STATE_PATH,
+    WarmStateStore,
+    configure_warm_state,
+    get_warm_state,
+)
 
 # Configure logging
 logger = get_logger(__name__)
 
+# Supported client transports
+TRANSPORTS = ("stdio", "sse")
+DEFAULT_SSE_HOST = "127.0.0.1"
+DEFAULT_SSE_PORT = 8765
+
+# Parameter model of each tool. The models generate the tools' inputSchema
+# and validate their arguments through adapters built once at import time
+TOOL_PARAMS: dict[str, type[BaseModel]] = {
+    "aider_ai_code": AICodeParams,
+    "list_models": ListModelsParams,
+    "aider_estimate": EstimateParams,
+    "get_job_result": GetJobResultParams,
+    "list_jobs": ListJobsParams,
+    "repo_map": RepoMapParams,
+    "symbol_search": SymbolSearchParams,
+    "server_stats": ServerStatsParams,
+    "profile_next": ProfileNextParams,
+}
+TOOL_ADAPTERS: dict[str, TypeAdapter[Any]] = {
+    name: TypeAdapter(model) for name, model in TOOL_PARAMS.items()
+}
+
 # Define MCP tools
 AIDER_AI_CODE_TOOL = Tool(
     name="aider_ai_code",
     description=(
         "Run Aider to perform AI coding tasks based on the provided prompt and files"
     ),
-    inputSchema={
-        "type": "object",
-        "properties": {
-            "ai_coding_prompt": {
-                "type": "string",
-                "description": "The prompt for the AI to execute",
-            },
-            "relative_editable_files": {
-                "type": "array",
-                "description": "LIST of relative paths to files that can be edited",
-                "items": {"type": "string"},
-            },
-            "relative_readonly_files": {
-                "type": "array",
-                "description": (
-                    "LIST of relative paths to files that can be read but not "
-                    "edited, add files that are not editable but useful for context"
-                ),
-                "items": {"type": "string"},
-            },
-            "model": {
-                "type": "string",
-                "description": (
-                    "The primary AI model Aider should use for generating code, "
-                    "leave blank unless model is specified in the request"
-                ),
-            },
-        },
-        "required": ["ai_coding_prompt", "relative_editable_files"],
-    },
+    inputSchema=input_schema(AICodeParams),
 )
 
 LIST_MODELS_TOOL = Tool(
     name="list_models",
-    description="List available models that match the provided substring",
-    inputSchema={
-        "type": "object",
-        "properties": {
-            "substring": {
-                "type": "string",
-                "description": "Substring to match against available models",
-            }
-        },
-    },
+    description=(
+        "List available models with their context window, prices, edit formats "
+        "and capabilities, filtered by name, provider or capability and paginated"
+    ),
+    inputSchema=input_schema(ListModelsParams),
+)
+
+AIDER_ESTIMATE_TOOL = Tool(
+    name="aider_estimate",
+    description=(
+        "Estimate the input tokens an aider_ai_code request would send and check "
+        "them against the model's context window, without calling the model"
+    ),
+    inputSchema=input_schema(EstimateParams),
+)
+
+GET_JOB_RESULT_TOOL = Tool(
+    name="get_job_result",
+    description=(
+        "Fetch the stored result (diff, per-file diffs, timings and token usage) "
+        "of a previous aider_ai_code job, e.g. after reconnecting"
+    ),
+    inputSchema=input_schema(GetJobResultParams),
+)
+
+LIST_JOBS_TOOL = Tool(
+    name="list_jobs",
+    description="List recent aider_ai_code jobs with their timings and token usage",
+    inputSchema=input_schema(ListJobsParams),
+)
+
+REPO_MAP_TOOL = Tool(
+    name="repo_map",
+    description=(
+        "Outline the classes and functions defined in the repository's source "
+        "files, from a cached index, to choose files for aider_ai_code"
+    ),
+    inputSchema=input_schema(RepoMapParams),
+)
+
+SYMBOL_SEARCH_TOOL = Tool(
+    name="symbol_search",
+    description=(
+        "Find the files and lines where classes and functions matching a name "
+        "are defined, from a cached index"
+    ),
+    inputSchema=input_schema(SymbolSearchParams),
+)
+
+SERVER_STATS_TOOL = Tool(
+    name="server_stats",
+    description="Report runtime statistics of the server, such as HTTP pool usage",
+    inputSchema=input_schema(ServerStatsParams),
+)
+
+PROFILE_NEXT_TOOL = Tool(
+    name="profile_next",
+    description=(
+        "Profile the next aider_ai_code jobs and write the profiles to the "
+        "server's logs directory"
+    ),
+    inputSchema=input_schema(ProfileNextParams),
 )
 
 
+def validate_tool_input(
+    name: str, arguments: Any, working_dir: str | None = None
+) -> Any:
+    """
+    Validate and normalize the arguments of a tool call in one pass.
+
+    File paths are normalized, deduplicated and checked against the
+    repository's boundary (and, for editable files, its ignore files) before
+    any expensive setup. Already validated parameters are returned as is.
+
+    Args:
+        name: The tool name
+        arguments: The raw arguments, or the tool's parameter model
+        working_dir: The repository the file paths are relative to
+
+    Returns:
+        The tool's parameter model
+
+    Raises:
+        ValidationError: If the arguments are invalid
+    """
+    return TOOL_ADAPTERS[name].validate_python(
+        {} if arguments is None else arguments,
+        context={"working_dir": working_dir},
+    )
+
+
 def is_git_repository(directory: str) -> tuple[bool, Union[str, None]]:
     """
     Check if the specified directory is a git repository.
@@ -105,7 +282,7 @@ def is_git_repository(directory: str) -> tuple[bool, Union[str, None]]:
 
 
 def process_aider_ai_code_request(
-    params: dict[str, Any],
+    params: dict[str, Any] | AICodeParams,
     editor_model: str,
     current_working_dir: str,
 ) -> dict[str, Any]:
@@ -113,7 +290,8 @@ def process_aider_ai_code_request(
     Process an aider_ai_code request.
 
     Args:
-        params (Dict[str, Any]): The request parameters.
+        params (Dict[str, Any] | AICodeParams): The request parameters, raw or
+            already validated.
         editor_model (str): The editor model to use.
         current_working_dir (str): The current working directory where git repo
             is located.
@@ -121,26 +299,18 @@ def process_aider_ai_code_request(
     Returns:
         Dict[str, Any]: The response data.
     """
-    ai_coding_prompt = params.get("ai_coding_prompt", "")
-    relative_editable_files = params.get("relative_editable_files", [])
-    relative_readonly_files = params.get("relative_readonly_files", [])
+    try:
+        request = validate_tool_input("aider_ai_code", params, current_working_dir)
+    except ValidationError as e:
+        logger.error(f"Invalid aider_ai_code parameters: {e}")
+        return {"success": False, "diff": f"Error: Invalid parameters: {e}"}
 
-    # Ensure relative_editable_files is a list
-    if isinstance(relative_editable_files, str):
-        logger.info(
-            f"Converting single editable file string to list: {relative_editable_files}"
-        )
-        relative_editable_files = [relative_editable_files]
-
-    # Ensure relative_readonly_files is a list
-    if isinstance(relative_readonly_files, str):
-        logger.info(
-            f"Converting single readonly file string to list: {relative_readonly_files}"
-        )
-        relative_readonly_files = [relative_readonly_files]
+    ai_coding_prompt = request.ai_coding_prompt
+    relative_editable_files = request.relative_editable_files
+    relative_readonly_files = request.relative_readonly_files
 
     # Get the model from request parameters if provided
-    request_model = params.get("model")
+    request_model = request.model
 
     # Log the request details
     logger.info(f"AI Coding Request: Prompt: '{ai_coding_prompt}'")
@@ -156,13 +326,49 @@ def process_aider_ai_code_request(
     # Use the passed-in current_working_dir parameter
     logger.info(f"Using working directory for code_with_aider: {current_working_dir}")
 
-    result_json = code_with_aider(
-        ai_coding_prompt=ai_coding_prompt,
-        relative_editable_files=relative_editable_files,
-        relative_readonly_files=relative_readonly_files,
-        model=model_to_use,
-        working_dir=current_working_dir,
-    )
+    job_id = uuid.uuid4().hex
+    created_at = time.time()
+    # Arguments of the job, as recorded for offline replay
+    job_args: dict[str, Any] = {
+        "ai_coding_prompt": ai_coding_prompt,
+        "relative_editable_files": relative_editable_files,
+        "relative_readonly_files": relative_readonly_files,
+        "model": model_to_use,
+        "failover_models": request.failover_models,
+        "architect": request.architect,
+        "editor_model": request.editor_model or editor_model,
+        "fan_out": request.fan_out,
+        "file_groups": request.file_groups,
+        "map_tokens": request.map_tokens,
+        "map_refresh": request.map_refresh,
+        "edit_format": request.edit_format,
+        "cache_prompts": request.cache_prompts,
+        "max_reflections": request.max_reflections,
+        "stream": request.stream,
+        "auto_context": request.auto_context,
+        "session_id": request.session_id,
+        "dry_run": request.dry_run,
+        "verify": request.verify,
+    }
+    recorder = get_recorder()
+    with contextlib.ExitStack() as stack:
+        profile_path = stack.enter_context(get_profiler().profile(job_id))
+        cassette = None
+        if recorder is not None:
+            cassette = stack.enter_context(
+                recorder.record(
+                    job_id, request.model_dump(), job_args, current_working_dir
+                )
+            )
+        result_json = code_with_aider(working_dir=current_working_dir, **job_args)
+        if cassette is not None:
+            with contextlib.suppress(json.JSONDecodeError):
+                cassette.data["result"] = json.loads(result_json)
+            # Context files chosen by the job itself are needed for replay too
+            cassette.snapshot_files(
+                current_working_dir,
+                cassette.data["result"].get("auto_readonly_files", []),
+            )
 
     # Parse the JSON string result
     try:
@@ -175,10 +381,48 @@ def process_aider_ai_code_request(
     logger.info(
         f"AI Coding Request Completed. Success: {result_dict.get('success', False)}"
     )
-    return {
+    response = {
+        "job_id": job_id,
         "success": result_dict.get("success", False),
         "diff": result_dict.get("diff", "Error retrieving diff"),
     }
+    if profile_path:
+        response["profile"] = profile_path
+    for key in (
+        "dry_run",
+        "sub_jobs",
+        "session_id",
+        "session_turn",
+        "auto_readonly_files",
+        "trimmed_readonly_files",
+        "rolled_back_files",
+        "verification",
+    ):
+        if key in result_dict:
+            response[key] = result_dict[key]
+
+    # Keep the result so the client can re-fetch it after a disconnect
+    job_store = get_job_store()
+    if job_store is not None:
+        job_store.record(
+            {
+                **response,
+                "repo": current_working_dir,
+                "fingerprint": job_fingerprint(
+                    ai_coding_prompt,
+                    relative_editable_files,
+                    relative_readonly_files,
+                    model_to_use,
+                ),
+                "model": model_to_use,
+                "prompt": ai_coding_prompt,
+                "created_at": created_at,
+                "duration": time.time() - created_at,
+                "timings": result_dict.get("timings"),
+                "usage": result_dict.get("usage"),
+            }
+        )
+    return response
 
 
 def process_list_models_request(params: dict[str, Any]) -> dict[str, Any]:
@@ -191,15 +435,221 @@ def process_list_models_request(params: dict[str, Any]) -> dict[str, Any]:
     Returns:
         Dict[str, Any]: The response data.
     """
-    substring = params.get("substring", "")
-
+    try:
+        request = validate_tool_input("list_models", params)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
     # Log the request details
-    logger.info(f"List Models Request: Substring: '{substring}'")
+    logger.info(
+        f"List Models Request: Substring: '{request.substring}', "
+        f"Provider: {request.provider}, Sort: {request.sort}, "
+        f"Offset: {request.offset}"
+    )
 
-    models = list_models(substring)
-    logger.info(f"Found {len(models)} models matching '{substring}'")
+    response = search_models(
+        substring=request.substring,
+        provider=request.provider,
+        edit_format=request.edit_format,
+        capabilities=request.capabilities,
+        min_context=request.min_context,
+        max_input_price=request.max_input_price,
+        sort=request.sort,
+        offset=request.offset,
+        limit=request.limit,
+    )
+    logger.info(
+        f"Found {response['total']} models matching '{request.substring}', "
+        f"returning {len(response['models'])}"
+    )
+    return response
 
-    return {"models": models}
+
+def process_aider_estimate_request(
+    params: dict[str, Any],
+    editor_model: str,
+    current_working_dir: str,
+) -> dict[str, Any]:
+    """
+    Process an aider_estimate request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+        editor_model (str): The model to estimate for when none is requested.
+        current_working_dir (str): The directory the file paths are relative to.
+
+    Returns:
+        Dict[str, Any]: The token estimate.
+    """
+    try:
+        request = validate_tool_input("aider_estimate", params, current_working_dir)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    model = request.model or editor_model
+
+    logger.info(f"Estimate Request: Model: '{model}'")
+    return estimate_context(
+        request.relative_editable_files,
+        request.relative_readonly_files,
+        model,
+        current_working_dir,
+        ai_coding_prompt=request.ai_coding_prompt,
+        map_tokens=request.map_tokens,
+    )
+
+
+def process_repo_map_request(
+    params: dict[str, Any], current_working_dir: str
+) -> dict[str, Any]:
+    """
+    Process a repo_map request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+        current_working_dir (str): The repository to outline.
+
+    Returns:
+        Dict[str, Any]: The outline of the repository's files.
+    """
+    try:
+        request = validate_tool_input("repo_map", params, current_working_dir)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    return repo_map(
+        current_working_dir,
+        path_prefix=request.path_prefix,
+        focus_files=request.focus_files,
+        max_files=request.max_files,
+    )
+
+
+def process_symbol_search_request(
+    params: dict[str, Any], current_working_dir: str
+) -> dict[str, Any]:
+    """
+    Process a symbol_search request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+        current_working_dir (str): The repository to search.
+
+    Returns:
+        Dict[str, Any]: The matching definitions, or an error.
+    """
+    try:
+        request = validate_tool_input("symbol_search", params)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    return symbol_search(
+        current_working_dir,
+        request.query,
+        limit=request.limit,
+        include_references=request.include_references,
+    )
+
+
+def process_get_job_result_request(params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Process a get_job_result request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+
+    Returns:
+        Dict[str, Any]: The stored job, or an error.
+    """
+    try:
+        request = validate_tool_input("get_job_result", params)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    job_id = request.job_id
+    job_store = get_job_store()
+    if job_store is None:
+        return {"error": "Job store is not enabled"}
+
+    job = job_store.get(job_id)
+    if job is None:
+        return {"error": f"Unknown job id: {job_id}"}
+    return job
+
+
+def process_list_jobs_request(
+    params: dict[str, Any], current_working_dir: str
+) -> dict[str, Any]:
+    """
+    Process a list_jobs request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+        current_working_dir (str): Repository used when no repo filter is given.
+
+    Returns:
+        Dict[str, Any]: The response data.
+    """
+    try:
+        request = validate_tool_input("list_jobs", params)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    job_store = get_job_store()
+    if job_store is None:
+        return {"error": "Job store is not enabled"}
+
+    jobs = job_store.list_jobs(
+        repo=request.repo or current_working_dir,
+        fingerprint=request.fingerprint,
+        limit=request.limit,
+    )
+    return {"jobs": jobs}
+
+
+def process_server_stats_request(params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Process a server_stats request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters (unused).
+
+    Returns:
+        Dict[str, Any]: The response data.
+    """
+    stats: dict[str, Any] = {
+        "http_pool": get_http_clients().stats(),
+        "model_catalog": get_model_catalog().stats(),
+        "profiler": get_profiler().stats(),
+    }
+    recorder = get_recorder()
+    if recorder is not None:
+        stats["recorder"] = recorder.stats()
+    warm_state = get_warm_state()
+    if warm_state is not None:
+        stats["warm_state"] = warm_state.stats()
+    cache_warmer = get_cache_warmer()
+    if cache_warmer is not None:
+        stats["cache_warmer"] = cache_warmer.stats()
+    map_budget = get_map_budget()
+    if map_budget is not None:
+        stats["map_budget"] = map_budget.stats()
+    stats["sessions"] = get_session_table().stats()
+    verifier = get_verifier()
+    if verifier is not None:
+        stats["verification"] = verifier.stats()
+    return stats
+
+
+def process_profile_next_request(params: dict[str, Any]) -> dict[str, Any]:
+    """
+    Process a profile_next request.
+
+    Args:
+        params (Dict[str, Any]): The request parameters.
+
+    Returns:
+        Dict[str, Any]: The response data.
+    """
+    try:
+        request = validate_tool_input("profile_next", params)
+    except ValidationError as e:
+        return {"error": f"Invalid parameters: {e}"}
+    return get_profiler().arm(request.count, request.mode, request.interval)
 
 
 def handle_request(
@@ -265,6 +715,29 @@ def handle_request(
         elif request_type == "list_models":
             return process_list_models_request(params)
 
+        elif request_type == "aider_estimate":
+            return process_aider_estimate_request(
+                params, editor_model, current_working_dir
+            )
+
+        elif request_type == "repo_map":
+            return process_repo_map_request(params, current_working_dir)
+
+        elif request_type == "symbol_search":
+            return process_symbol_search_request(params, current_working_dir)
+
+        elif request_type == "get_job_result":
+            return process_get_job_result_request(params)
+
+        elif request_type == "list_jobs":
+            return process_list_jobs_request(params, current_working_dir)
+
+        elif request_type == "server_stats":
+            return process_server_stats_request(params)
+
+        elif request_type == "profile_next":
+            return process_profile_next_request(params)
+
         else:
             # Unknown request type
             logger.warning(f"Warning: Unknown request type received: {request_type}")
@@ -278,70 +751,75 @@ def handle_request(
         return {"error": f"Internal server error: {str(e)}"}
 
 
-async def serve(
-    editor_model: str = DEFAULT_EDITOR_MODEL,
-    current_working_dir: str | None = None,
-) -> None:
+async def _run_admitted(
+    admission: Optional[AdmissionController],
+    current_working_dir: str,
+    request: AICodeParams,
+    run_job: Callable[[], Awaitable[Any]],
+) -> Any:
     """
-    Start the MCP server following the Model Context Protocol.
-
-    The server reads JSON requests from stdin and writes JSON responses to stdout.
-    Each request should contain a 'name' field indicating the tool to invoke, and
-    a 'parameters' field with the tool-specific parameters.
+    Await a job once its estimated memory fits in the admission budget.
 
     Args:
-        editor_model (str, optional): The editor model to use.
-            Defaults to DEFAULT_EDITOR_MODEL.
-        current_working_dir (str | None, required): The current working directory.
-            Must be a valid git repository.
+        admission (Optional[AdmissionController]): The budget, or None for no limit.
+        current_working_dir (str): The repository the job runs in.
+        request (AICodeParams): The validated aider_ai_code request.
+        run_job (Callable): Starts the job once it has been admitted.
+
+    Returns:
+        Any: The result of the job.
 
     Raises:
-        ValueError: If current_working_dir is not provided or is not a git repository.
+        AdmissionRejected: If the job did not fit in the budget in time.
     """
-    logger.info("Starting Aider MCP Server")
-    logger.info(f"Editor Model: {editor_model}")
+    if admission is None:
+        return await run_job()
 
-    # Validate current_working_dir is provided
-    if not current_working_dir:
-        error_msg = (
-            "Error: current_working_dir is required. Please provide a valid git "
-            "repository path."
-        )
-        logger.error(error_msg)
-        raise ValueError(error_msg)
+    files = request.relative_editable_files + request.relative_readonly_files
+    estimate = await asyncio.to_thread(estimate_job_cost, current_working_dir, files)
+    async with admission.admit(estimate):
+        return await run_job()
 
-    logger.info(f"Initial Working Directory: {current_working_dir}")
 
-    # Validate that the current_working_dir is a git repository
-    is_git_repo, error_message = is_git_repository(current_working_dir)
-    if not is_git_repo:
-        error_msg = (
-            f"Error: The specified directory '{current_working_dir}' is not a "
-            f"valid git repository: {error_message}"
-        )
-        logger.error(error_msg)
-        raise ValueError(error_msg)
+def create_server(
+    editor_model: str,
+    current_working_dir: str,
+    job_pool: JobPool,
+    admission: Optional[AdmissionController] = None,
+) -> Server:
+    """
+    Create the MCP server instance and register its tools.
 
-    logger.info(f"Validated git repository at: {current_working_dir}")
+    The same instance can serve any number of client connections; aider jobs
+    from all of them run on the shared job pool.
 
-    # Set working directory (validated above)
-    if current_working_dir:
-        logger.info(f"Setting working directory to: {current_working_dir}")
-        os.chdir(current_working_dir)
-    else:
-        # This case should ideally be prevented by earlier validation
-        # but added for robustness if validation logic changes.
-        error_msg = "Critical: current_working_dir became None before chdir."
-        logger.error(error_msg)
-        raise ValueError(error_msg)
+    Args:
+        editor_model (str): The editor model to use.
+        current_working_dir (str): The validated git repository to work in.
+        job_pool (JobPool): Worker pool that runs the blocking aider jobs.
+        admission (Optional[AdmissionController]): Memory budget that aider jobs
+            must fit in before they are started. Defaults to no limit.
 
+    Returns:
+        Server: The configured MCP server.
+    """
     # Create the MCP server instance with type annotation and name
     server: Server = Server(name="aider-mcp-server")
 
     @server.list_tools()
     async def list_tools() -> list[Tool]:
         """Register all available tools with the MCP server."""
-        return [AIDER_AI_CODE_TOOL, LIST_MODELS_TOOL]
+        return [
+            AIDER_AI_CODE_TOOL,
+            AIDER_ESTIMATE_TOOL,
+            LIST_MODELS_TOOL,
+            GET_JOB_RESULT_TOOL,
+            LIST_JOBS_TOOL,
+            REPO_MAP_TOOL,
+            SYMBOL_SEARCH_TOOL,
+            SERVER_STATS_TOOL,
+            PROFILE_NEXT_TOOL,
+        ]
 
     @server.call_tool()
     async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
@@ -352,17 +830,75 @@ async def serve(
         # Handle based on tool name
         if name == "aider_ai_code":
             try:
-                response_data = process_aider_ai_code_request(
-                    arguments,
-                    editor_model=editor_model,
-                    current_working_dir=current_working_dir,
-                )
+                try:
+                    # Reject bad requests before they wait for memory or a worker
+                    request = validate_tool_input(name, arguments, current_working_dir)
+                except ValidationError as e:
+                    logger.error(f"Invalid aider_ai_code parameters: {e}")
+                    response_data: dict[str, Any] = {
+                        "success": False,
+                        "diff": f"Error: Invalid parameters: {e}",
+                    }
+                else:
+                    response_data = await _run_admitted(
+                        admission,
+                        current_working_dir,
+                        request,
+                        lambda: job_pool.run(
+                            process_aider_ai_code_request,
+                            request,
+                            editor_model=editor_model,
+                            current_working_dir=current_working_dir,
+                        ),
+                    )
                 diff_content = response_data.get(
                     "diff", "No diff information provided."
                 )
                 status_msg = "Success" if response_data.get("success") else "Failure"
-                full_content = f"{status_msg}\n\nDiff:\n```diff\n{diff_content}\n```"
+                full_content = (
+                    f"{status_msg}\n\nJob ID: {response_data.get('job_id')}\n\n"
+                )
+                if response_data.get("dry_run"):
+                    full_content += "Dry run: no files were changed.\n\n"
+                if "session_id" in response_data:
+                    full_content += (
+                        f"Session: {response_data['session_id']} "
+                        f"(turn {response_data.get('session_turn')})\n\n"
+                    )
+                if "sub_jobs" in response_data:
+                    sub_jobs = json.dumps(response_data["sub_jobs"], indent=2)
+                    full_content += f"Sub-jobs:\n{sub_jobs}\n\n"
+                if response_data.get("auto_readonly_files"):
+                    added = ", ".join(response_data["auto_readonly_files"])
+                    full_content += f"Read-only files added as context: {added}\n\n"
+                if "trimmed_readonly_files" in response_data:
+                    trimmed = ", ".join(response_data["trimmed_readonly_files"])
+                    full_content += (
+                        f"Read-only files dropped to fit the context: {trimmed}\n\n"
+                    )
+                if "rolled_back_files" in response_data:
+                    restored = ", ".join(response_data["rolled_back_files"])
+                    full_content += f"Edits rolled back in: {restored}\n\n"
+                if "verification" in response_data:
+                    verification = json.dumps(response_data["verification"], indent=2)
+                    full_content += f"Verification:\n{verification}\n\n"
+                if "profile" in response_data:
+                    full_content += f"Profile: {response_data['profile']}\n\n"
+                full_content += f"Diff:\n```diff\n{diff_content}\n```"
                 return [TextContent(type="text", text=full_content)]
+            except AdmissionRejected as e:
+                return [
+                    TextContent(
+                        type="text",
+                        text=json.dumps(
+                            {
+                                "success": False,
+                                "error": f"Server busy: {e}",
+                                "retry_after": e.retry_after,
+                            }
+                        ),
+                    )
+                ]
             except Exception as e:
                 logger.error(f"Error processing tool '{name}': {str(e)}", exc_info=True)
                 return [
@@ -373,13 +909,45 @@ async def serve(
         elif name == "list_models":
             try:
                 response_data = process_list_models_request(arguments)
-                models_list = response_data.get("models", [])
+                return [TextContent(type="text", text=json.dumps(response_data))]
+            except Exception as e:
+                logger.error(f"Error processing tool '{name}': {str(e)}", exc_info=True)
                 return [
                     TextContent(
-                        type="text",
-                        text=f"Available models:\n{json.dumps(models_list, indent=2)}",
+                        type="text", text=f"Error processing tool '{name}': {str(e)}"
+                    )
+                ]
+        elif name == "aider_estimate":
+            try:
+                response_data = await asyncio.to_thread(
+                    process_aider_estimate_request,
+                    arguments,
+                    editor_model,
+                    current_working_dir,
+                )
+                return [
+                    TextContent(type="text", text=json.dumps(response_data, indent=2))
+                ]
+            except Exception as e:
+                logger.error(f"Error processing tool '{name}': {str(e)}", exc_info=True)
+                return [
+                    TextContent(
+                        type="text", text=f"Error processing tool '{name}': {str(e)}"
                     )
                 ]
+        elif name in ("repo_map", "symbol_search"):
+            try:
+                process = (
+                    process_repo_map_request
+                    if name == "repo_map"
+                    else process_symbol_search_request
+                )
+                response_data = await asyncio.to_thread(
+                    process, arguments, current_working_dir
+                )
+                return [
+                    TextContent(type="text", text=json.dumps(response_data, indent=2))
+                ]
             except Exception as e:
                 logger.error(f"Error processing tool '{name}': {str(e)}", exc_info=True)
                 return [
@@ -387,24 +955,349 @@ async def serve(
                         type="text", text=f"Error processing tool '{name}': {str(e)}"
                     )
                 ]
+        elif name in ("get_job_result", "list_jobs"):
+            try:
+                # The job store reads sqlite, which must not block the event loop
+                if name == "get_job_result":
+                    response_data = await asyncio.to_thread(
+                        process_get_job_result_request, arguments
+                    )
+                else:
+                    response_data = await asyncio.to_thread(
+                        process_list_jobs_request, arguments, current_working_dir
+                    )
+                return [
+                    TextContent(type="text", text=json.dumps(response_data, indent=2))
+                ]
+            except Exception as e:
+                logger.error(f"Error processing tool '{name}': {str(e)}", exc_info=True)
+                return [
+                    TextContent(
+                        type="text", text=f"Error processing tool '{name}': {str(e)}"
+                    )
+                ]
+        elif name == "profile_next":
+            response_data = process_profile_next_request(arguments)
+            return [TextContent(type="text", text=json.dumps(response_data, indent=2))]
+        elif name == "server_stats":
+            response_data = process_server_stats_request(arguments)
+            response_data["job_pool"] = job_pool.stats()
+            if admission is not None:
+                response_data["admission"] = admission.stats()
+            return [TextContent(type="text", text=json.dumps(response_data, indent=2))]
         else:
             logger.warning(f"Received call for unknown tool: {name}")
             return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
-    # Start the server using stdio with async with
-    logger.info(
-        f"Starting server listener with editor_model='{editor_model}' and "
-        f"cwd='{current_working_dir}'"
-    )
+    return server
+
+
+def _build_symbol_index(root: str) -> None:
+    """Bring the symbol index of a repository up to date, logging failures."""
     try:
-        # Create initialization options (needed for server.run)
-        options = server.create_initialization_options()
+        get_symbol_index(root).update()
+    except Exception as e:
+        logger.warning(f"Could not build the symbol index of {root}: {e}")
+
+
+def _restore_warm_state(store: WarmStateStore | None) -> None:
+    """Restore the last snapshot, building what it cannot provide, logging failures."""
+    try:
+        restored = store.restore() if store is not None else {}
+        if not restored.get("model_catalog"):
+            configure_model_catalog()
+    except Exception as e:
+        logger.warning(f"Could not restore the warm state: {e}")
+    if store is not None:
+        store.start()
+
+
+def _install_profile_signals() -> None:
+    """Profile the next job on SIGUSR1 (cProfile) or SIGUSR2 (stack sampling)."""
+    loop = asyncio.get_running_loop()
+    for name, mode in (("SIGUSR1", "deterministic"), ("SIGUSR2", "sampling")):
+        signum = getattr(signal, name, None)
+        if signum is None:
+            continue
+        try:
+            loop.add_signal_handler(signum, get_profiler().arm, 1, mode)
+        except (NotImplementedError, RuntimeError) as e:
+            logger.warning(f"Cannot profile jobs on {name}: {e}")
+
+
+async def _run_stdio(server: Server, job_pool: JobPool) -> None:
+    """Serve a single client over stdin/stdout."""
+    # Create initialization options (needed for server.run)
+    options = server.create_initialization_options()
+    with job_pool.client_connection():
         async with stdio_server() as (reader, writer):
             logger.info("Server connection established. Waiting for requests...")
             # Pass options to server.run
             await server.run(reader, writer, initialization_options=options)
             logger.info("Server run loop finished.")
+
+
+async def _run_sse(
+    server: Server,
+    job_pool: JobPool,
+    host: str,
+    port: int,
+    unix_socket: str | None,
+) -> None:
+    """Serve any number of clients over HTTP with Server-Sent Events."""
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request: Request) -> Response:
+        logger.info(f"SSE client connected: {request.client}")
+        with job_pool.client_connection():
+            # The MCP SSE transport needs the raw ASGI send callable
+            async with sse.connect_sse(
+                request.scope, request.receive, request._send
+            ) as (reader, writer):
+                await server.run(
+                    reader,
+                    writer,
+                    initialization_options=server.create_initialization_options(),
+                )
+        logger.info(f"SSE client disconnected: {request.client}")
+        return Response()
+
+    app = Starlette(
+        routes=[
+            Route("/sse", endpoint=handle_sse),
+            Mount("/messages/", app=sse.handle_post_message),
+        ]
+    )
+    config = uvicorn.Config(app, host=host, port=port, uds=unix_socket)
+    where = f"unix:{unix_socket}" if unix_socket else f"http://{host}:{port}"
+    logger.info(f"Listening for SSE clients on {where}/sse")
+    await uvicorn.Server(config).serve()
+
+
+async def serve(
+    editor_model: str = DEFAULT_EDITOR_MODEL,
+    current_working_dir: str | None = None,
+    http_pool_size: int = DEFAULT_MAX_CONNECTIONS,
+    transport: str = "stdio",
+    host: str = DEFAULT_SSE_HOST,
+    port: int = DEFAULT_SSE_PORT,
+    unix_socket: str | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    max_inflight_per_client: int = DEFAULT_MAX_INFLIGHT_PER_CLIENT,
+    job_store_path: str | None = DEFAULT_JOB_STORE_PATH,
+    memory_budget_mb: int | None = None,
+    admission_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+    cache_warming_pings: int = DEFAULT_WARMING_PINGS,
+    map_latency_target: float | None = None,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    session_idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    lint_cmd: str | None = None,
+    test_cmd: str | None = None,
+    check_timeout: float = DEFAULT_CHECK_TIMEOUT,
+    provider_config: str | None = None,
+    record_dir: str | None = None,
+    warm_state_path: str | None = DEFAULT_WARM_STATE_PATH,
+    warm_state_interval: float = DEFAULT_SAVE_INTERVAL,
+    state_dir: str | None = None,
+) -> None:
+    """
+    Start the MCP server following the Model Context Protocol.
+
+    With the default "stdio" transport the server reads JSON requests from stdin
+    and writes JSON responses to stdout for a single client. With the "sse"
+    transport it listens on a local TCP port or Unix socket and serves many
+    clients from one warm process that shares its caches and worker pool.
+
+    Args:
+        editor_model (str, optional): The editor model to use.
+            Defaults to DEFAULT_EDITOR_MODEL.
+        current_working_dir (str | None, required): The current working directory.
+            Must be a valid git repository.
+        http_pool_size (int, optional): Maximum pooled connections shared by all
+            LLM requests. Defaults to DEFAULT_MAX_CONNECTIONS.
+        transport (str, optional): "stdio" or "sse". Defaults to "stdio".
+        host (str, optional): Host to bind the SSE transport to.
+            Defaults to DEFAULT_SSE_HOST.
+        port (int, optional): Port for the SSE transport. Defaults to DEFAULT_SSE_PORT.
+        unix_socket (str | None, optional): Unix socket path for the SSE transport,
+            used instead of host and port when given.
+        max_workers (int, optional): Aider jobs that may run at the same time.
+            Defaults to DEFAULT_MAX_WORKERS.
+        max_inflight_per_client (int, optional): Aider jobs one client connection
+            may have running before further calls wait.
+            Defaults to DEFAULT_MAX_INFLIGHT_PER_CLIENT.
+        job_store_path (str | None, optional): Sqlite file that keeps job results,
+            relative to state_dir, or None to disable the store.
+            Defaults to DEFAULT_JOB_STORE_PATH.
+        memory_budget_mb (int | None, optional): Memory the server may use for
+            aider jobs, 0 to disable admission control. Defaults to a share of
+            the machine's memory.
+        admission_timeout (float, optional): Seconds an aider job waits for
+            memory before it is rejected. Defaults to DEFAULT_QUEUE_TIMEOUT.
+        cache_warming_pings (int, optional): Keepalive pings that keep the prompt
+            cache of each model and repository warm after its last job, 0
+            disables them. Defaults to DEFAULT_WARMING_PINGS.
+        map_latency_target (float | None, optional): Seconds a job should take;
+            when set, the repo map budget of jobs that do not choose one is
+            adapted per repository to meet it. Defaults to None (Aider's default).
+        max_sessions (int, optional): Multi-turn sessions kept alive at once.
+            Defaults to DEFAULT_MAX_SESSIONS.
+        session_idle_timeout (float, optional): Seconds after which an unused
+            session is saved to disk and dropped. Defaults to DEFAULT_IDLE_TIMEOUT.
+        lint_cmd (str | None, optional): Lint command run by jobs that ask for
+            verification; "{files}" is replaced by the changed files.
+            Defaults to None.
+        test_cmd (str | None, optional): Test command run by jobs that ask for
+            verification; "{files}" is replaced by the tests affected by the
+            changed files. Defaults to None.
+        check_timeout (float, optional): Seconds a lint or test command may run.
+            Defaults to DEFAULT_CHECK_TIMEOUT.
+        provider_config (str | None, optional): JSON file with the provider
+            profile (model provider and per-provider litellm settings).
+            Defaults to None, which derives the profile from the environment.
+        record_dir (str | None, optional): Directory to record every
+            aider_ai_code job into, as a cassette for offline replay, relative
+            to state_dir. Defaults to None (no recording).
+        warm_state_path (str | None, optional): File the warm caches (model
+            catalog, token counts, map budgets, import graphs) are saved to
+            and restored from, relative to state_dir, or None to start cold
+            every time. Defaults to DEFAULT_WARM_STATE_PATH.
+        warm_state_interval (float, optional): Seconds between snapshots of
+            the warm caches, 0 to only save on shutdown.
+            Defaults to DEFAULT_SAVE_INTERVAL.
+        state_dir (str | None, optional): Directory the journals, job store,
+            sessions, symbol indexes, profiles, cassettes and warm state are
+            kept in. Defaults to None, see default_state_dir().
+
+    Raises:
+        ValueError: If current_working_dir is not provided or is not a git
+            repository, or if the transport is unknown.
+    """
+    logger.info("Starting Aider MCP Server")
+    logger.info(f"Editor Model: {editor_model}")
+
+    if transport not in TRANSPORTS:
+        error_msg = f"Error: Unknown transport '{transport}'. Choose from {TRANSPORTS}."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    # Validate current_working_dir is provided
+    if not current_working_dir:
+        error_msg = (
+            "Error: current_working_dir is required. Please provide a valid git "
+            "repository path."
+        )
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    logger.info(f"Initial Working Directory: {current_working_dir}")
+
+    # Validate that the current_working_dir is a git repository
+    is_git_repo, error_message = is_git_repository(current_working_dir)
+    if not is_git_repo:
+        error_msg = (
+            f"Error: The specified directory '{current_working_dir}' is not a "
+            f"valid git repository: {error_message}"
+        )
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    logger.info(f"Validated git repository at: {current_working_dir}")
+
+    # Resolve the provider settings once; jobs only read them
+    configure_provider_profile(load_provider_profile(provider_config))
+
+    # Keep the server's state out of the repositories it edits; a relative
+    # state_dir resolves against the directory the server was started from
+    state_dir = os.path.abspath(state_dir) if state_dir else default_state_dir()
+    logger.info(f"State directory: {state_dir}")
+    job_store = (
+        configure_job_store(state_path(job_store_path, state_dir))
+        if job_store_path
+        else None
+    )
+    configure_symbol_index(state_path(DEFAULT_INDEX_DIR, state_dir))
+    # Undo the edits of jobs that were interrupted by a crash
+    journal_dir = state_path(DEFAULT_JOURNAL_DIR, state_dir)
+    configure_journal_dir(journal_dir)
+    rolled_back = recover_journals(journal_dir)
+    if rolled_back:
+        logger.warning(f"Rolled back unfinished edits to: {rolled_back}")
+    configure_profiler(state_path(DEFAULT_PROFILE_DIR, state_dir))
+    configure_recorder(state_path(record_dir, state_dir) if record_dir else None)
+    warm_state = configure_warm_state(
+        state_path(warm_state_path, state_dir) if warm_state_path else None,
+        warm_state_interval,
+    )
+    sessions = configure_session_table(
+        persist_dir=state_path(DEFAULT_SESSION_DIR, state_dir),
+        max_sessions=max_sessions,
+        idle_timeout=session_idle_timeout,
+    )
+
+    # Set working directory (validated above)
+    if current_working_dir:
+        logger.info(f"Setting working directory to: {current_working_dir}")
+        os.chdir(current_working_dir)
+    else:
+        # This case should ideally be prevented by earlier validation
+        # but added for robustness if validation logic changes.
+        error_msg = "Critical: current_working_dir became None before chdir."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    # Share one keep-alive connection pool across all LLM calls
+    configure_http_clients(max_connections=http_pool_size)
+    install_litellm_clients()
+    cache_warmer = configure_cache_warmer(pings=cache_warming_pings)
+    configure_map_budget(map_latency_target)
+    configure_verifier(lint_cmd, test_cmd, check_timeout)
+
+    job_pool = JobPool(
+        max_workers=max_workers, max_inflight_per_client=max_inflight_per_client
+    )
+    admission = None
+    if memory_budget_mb != 0:
+        admission = AdmissionController(
+            memory_budget=memory_budget_mb * MB if memory_budget_mb else None,
+            queue_timeout=admission_timeout,
+        )
+        logger.info(
+            f"Admission control memory budget: {admission.memory_budget // MB} MB"
+        )
+    server = create_server(editor_model, current_working_dir, job_pool, admission)
+    _install_profile_signals()
+
+    # Build the symbol index in the background so the first repo_map and
+    # symbol_search calls do not have to parse the whole repository
+    index_task = asyncio.create_task(
+        asyncio.to_thread(_build_symbol_index, current_working_dir)
+    )
+    # Restore the caches of the last run (or read the model metadata once, so
+    # list_models only filters it) without delaying the first request
+    warm_task = asyncio.create_task(asyncio.to_thread(_restore_warm_state, warm_state))
+
+    # Start the server listener for the selected transport
+    logger.info(
+        f"Starting {transport} server listener with editor_model='{editor_model}' "
+        f"and cwd='{current_working_dir}'"
+    )
+    try:
+        if transport == "sse":
+            await _run_sse(server, job_pool, host, port, unix_socket)
+        else:
+            await _run_stdio(server, job_pool)
     except Exception as e:
         logger.exception(f"Server stopped due to exception: {e}")
     finally:
+        index_task.cancel()
+        warm_task.cancel()
+        job_pool.shutdown()
+        if warm_state is not None:
+            warm_state.close()
+        cache_warmer.close()
+        sessions.close()
+        if job_store is not None:
+            job_store.close()
+        uninstall_litellm_clients()
         logger.info("Aider MCP Server shutting down.")
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from aider_mcp_server.atoms.admission import (
+    BASE_JOB_BYTES,
+    FILE_BYTES_MULTIPLIER,
+    MB,
+    AdmissionController,
+    AdmissionRejected,
+    estimate_job_cost,
+)
+
+
+def test_estimate_grows_with_file_size(tmp_path):
+    """Test that the estimate accounts for the job's files."""
+    (tmp_path / "small.py").write_text("x = 1\n")
+    (tmp_path / "big.py").write_text("x = 1\n" * 10_000)
+
+    small = estimate_job_cost(str(tmp_path), ["small.py", "missing.py"])
+    big = estimate_job_cost(str(tmp_path), ["big.py"])
+    assert small == BASE_JOB_BYTES + 6 * FILE_BYTES_MULTIPLIER
+    assert big > small
+
+
+def test_job_larger_than_budget_is_rejected():
+    """Test that a job that can never fit is rejected right away."""
+    controller = AdmissionController(memory_budget=100 * MB, queue_timeout=5)
+
+    async def admit():
+        async with controller.admit(200 * MB):
+            pass
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        asyncio.run(admit())
+    assert excinfo.value.retry_after > 0
+    assert controller.stats()["rejected"] == 1
+
+
+def test_jobs_queue_then_reject_when_budget_is_exhausted():
+    """Test that jobs wait for running ones and are rejected after the timeout."""
+    # Any RSS exceeds a 1 MB budget, so only a lone job is ever admitted
+    controller = AdmissionController(memory_budget=1 * MB, queue_timeout=0.2)
+    order = []
+
+    async def job(name, hold):
+        async with controller.admit(1024):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def burst():
+        first = asyncio.create_task(job("first", 0.05))
+        await asyncio.sleep(0.01)
+        # Admitted once "first" finishes within the queue timeout
+        await job("second", 0)
+
+        blocker = asyncio.create_task(job("blocker", 1.0))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected):
+            await job("rejected", 0)
+        await asyncio.gather(first, blocker)
+
+    asyncio.run(burst())
+    assert order == ["first", "second", "blocker"]
+    stats = controller.stats()
+    assert stats["admitted"] == 3
+    assert stats["rejected"] == 1
+    assert stats["inflight"] == 0
+    assert stats["reserved_mb"] == 0
@@ -0,0 +1,58 @@
+import time
+from types import SimpleNamespace
+
+import litellm
+from aider.coders.chat_chunks import ChatChunks
+
+from aider_mcp_server.atoms.cache_warmer import CacheWarmer, stable_prefix
+
+
+def test_stable_prefix_leaves_out_chat_files_and_prompt():
+    """Test that only the context shared between jobs is warmed."""
+    chunks = ChatChunks(
+        system=[{"role": "system", "content": "sys"}],
+        readonly_files=[{"role": "user", "content": "docs"}],
+        repo=[{"role": "user", "content": "map"}],
+        chat_files=[{"role": "user", "content": "edited file"}],
+        cur=[{"role": "user", "content": "prompt"}],
+    )
+    assert [m["content"] for m in stable_prefix(chunks)] == ["sys", "docs", "map"]
+
+
+def test_warmer_pings_registered_prefix(monkeypatch):
+    """Test that a registered prefix is pinged the configured number of times."""
+    calls = []
+
+    def completion(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(usage=SimpleNamespace(cache_read_input_tokens=100))
+
+    monkeypatch.setattr(litellm, "completion", completion)
+    warmer = CacheWarmer(pings=2, interval=0.05)
+    try:
+        prefix = [{"role": "system", "content": "sys"}]
+        warmer.register("model-a", "/repo", prefix, {"temperature": 0})
+
+        deadline = time.monotonic() + 5
+        while warmer.stats()["pings_sent"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+    finally:
+        warmer.close()
+
+    assert len(calls) == 2
+    assert calls[0]["model"] == "model-a"
+    assert calls[0]["max_tokens"] == 1
+    assert calls[0]["temperature"] == 0
+    assert calls[0]["messages"][0] == prefix[0]
+    stats = warmer.stats()
+    assert stats["cache_hit_tokens"] == 200
+    assert stats["warm_prefixes"] == 0
+
+
+def test_warmer_disabled_without_pings(monkeypatch):
+    """Test that nothing is tracked when warming is disabled."""
+    warmer = CacheWarmer(pings=0)
+    warmer.register("model-a", "/repo", [{"role": "system", "content": "sys"}])
+    assert warmer.stats()["warm_prefixes"] == 0
+    warmer.close()
@@ -0,0 +1,62 @@
+import pytest
+
+from aider_mcp_server.atoms.cassette import (
+    CASSETTE_VERSION,
+    REPLAY,
+    Cassette,
+    CassetteRecorder,
+    current_cassette,
+    use_cassette,
+)
+
+MESSAGES = [{"role": "user", "content": "Add a function"}]
+OTHER = [{"role": "user", "content": "Rename it"}]
+
+
+def test_replay_matches_messages_then_call_order():
+    """Test that replies are found by their messages, else in recorded order."""
+    cassette = Cassette()
+    cassette.add_interaction("m", OTHER, "second")
+    cassette.add_interaction("m", MESSAGES, "first")
+
+    assert cassette.next_response(MESSAGES) == "first"
+    assert cassette.next_response([{"role": "user", "content": "?"}]) == "second"
+    assert cassette.next_response(MESSAGES) is None
+
+
+def test_cassette_is_only_active_in_its_context():
+    """Test that use_cassette sets and restores the current cassette."""
+    cassette = Cassette()
+    assert current_cassette() is None
+    with use_cassette(cassette, REPLAY):
+        assert current_cassette() is cassette
+        assert cassette.mode == REPLAY
+    assert current_cassette() is None
+
+
+def test_recorder_saves_request_files_and_replies(tmp_path):
+    """Test that a recorded job is written with its file snapshot."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("A = 1\n")
+    recorder = CassetteRecorder(str(tmp_path / "cassettes"))
+    job = {"relative_editable_files": ["a.py", "new.py"], "relative_readonly_files": []}
+
+    with recorder.record("job1", {"ai_coding_prompt": "p"}, job, str(repo)) as tape:
+        current_cassette().add_interaction("m", MESSAGES, "reply")
+        (repo / "a.py").write_text("A = 2\n")
+        tape.data["result"] = {"success": True}
+
+    loaded = Cassette.load(tmp_path / "cassettes" / "job1.json")
+    assert loaded.data["files"] == {"a.py": "A = 1\n", "new.py": None}
+    assert loaded.data["request"] == {"ai_coding_prompt": "p"}
+    assert loaded.next_response(MESSAGES) == "reply"
+    assert recorder.stats()["recorded"] == 1
+
+
+def test_load_rejects_other_versions(tmp_path):
+    """Test that cassettes of another format version are refused."""
+    path = tmp_path / "old.json"
+    path.write_text(f'{{"version": {CASSETTE_VERSION + 1}}}')
+    with pytest.raises(ValueError):
+        Cassette.load(path)
@@ -0,0 +1,92 @@
+from aider_mcp_server.atoms import changes
+from aider_mcp_server.atoms.changes import (
+    LargeFile,
+    content_hash,
+    describe_change,
+    detect_changes,
+    read_files,
+)
+
+SOURCE = b"def add(a, b):\n    return a + b\n"
+
+
+def test_identical_content_is_not_a_change():
+    """Test that unchanged files are skipped."""
+    assert describe_change("calc.py", SOURCE, SOURCE) is None
+
+
+def test_comment_and_whitespace_edits_are_not_meaningful():
+    """Test that the structural check ignores comments and formatting."""
+    edited = b"# Adds numbers\ndef add(a,   b):\n\n    return a + b  # sum\n"
+    change = describe_change("calc.py", SOURCE, edited)
+    assert change is not None
+    assert change["status"] == "modified"
+    assert change["meaningful"] is False
+    assert change["parses"] is True
+    assert change["sha256"] == content_hash(edited)
+
+
+def test_code_edits_are_meaningful():
+    """Test that a token-level difference counts as a meaningful change."""
+    change = describe_change("calc.py", SOURCE, SOURCE.replace(b"+", b"-"))
+    assert change is not None
+    assert change["meaningful"] is True
+    assert change["parses"] is True
+
+
+def test_syntax_errors_are_reported():
+    """Test that content that no longer parses is flagged."""
+    change = describe_change("calc.py", SOURCE, b"def add(a, b:\n    return\n")
+    assert change is not None
+    assert change["meaningful"] is True
+    assert change["parses"] is False
+
+
+def test_unknown_languages_compare_words():
+    """Test the whitespace-insensitive fallback for unsupported files."""
+    assert describe_change("notes.txt", b"a b\n", b"a  b\n\n")["meaningful"] is False
+    assert describe_change("notes.txt", b"a b\n", b"a c\n")["meaningful"] is True
+    assert describe_change("notes.txt", b"a b\n", b"a c\n")["parses"] is None
+
+
+def test_detect_changes_reports_created_and_deleted_files(tmp_path):
+    """Test the comparison of before and after snapshots."""
+    kept = tmp_path / "kept.py"
+    created = tmp_path / "new.py"
+    empty = tmp_path / "empty.py"
+    kept.write_bytes(SOURCE)
+    before = read_files([str(kept), str(created), str(empty)])
+    assert before[str(created)] is None
+
+    created.write_text("x = 1\n")
+    empty.write_text("")
+    kept.unlink()
+    after = read_files(before)
+
+    changes = detect_changes(before, after, str(tmp_path))
+    assert [(c["path"], c["status"], c["meaningful"]) for c in changes] == [
+        ("empty.py", "created", False),
+        ("kept.py", "deleted", True),
+        ("new.py", "created", True),
+    ]
+    assert changes[1]["sha256"] is None
+
+
+def test_large_files_are_hashed_not_kept(tmp_path, monkeypatch):
+    """Test that files above the cap are compared by hash without parsing."""
+    path = tmp_path / "bundle.js"
+    path.write_bytes(b"x = 1;\n" * 100)
+    before = read_files([str(path)], max_bytes=100)
+    assert isinstance(before[str(path)], LargeFile)
+    assert detect_changes(before, read_files([str(path)], 100), str(tmp_path)) == []
+
+    def no_parsing(fname, content):
+        raise AssertionError("large files must not be parsed")
+
+    monkeypatch.setattr(changes, "_syntax_tokens", no_parsing)
+    path.write_bytes(b"x = 1;  \n" * 100)
+    after = read_files([str(path)], max_bytes=100)
+    [change] = detect_changes(before, after, str(tmp_path))
+    assert change["meaningful"] is True
+    assert change["parses"] is None
+    assert change["sha256"] == content_hash(path.read_bytes())
@@ -0,0 +1,113 @@
+import subprocess
+
+import pytest
+from pydantic import ValidationError
+
+from aider_mcp_server.atoms.data_types import (
+    AICodeParams,
+    ServerStatsParams,
+    input_schema,
+)
+from aider_mcp_server.atoms.utils import (
+    MAP_REFRESH_POLICIES,
+    MAX_MAP_TOKENS,
+    MAX_REFLECTIONS,
+)
+
+
+def test_ai_code_params_defaults_keep_aider_settings():
+    """Test that omitted Aider settings stay None so Aider's defaults apply."""
+    params = AICodeParams(ai_coding_prompt="p", relative_editable_files="a.py")
+    assert params.relative_editable_files == ["a.py"]
+    assert params.relative_readonly_files == []
+    assert params.map_tokens is None
+    assert params.edit_format is None
+    assert params.stream is None
+
+
+def test_ai_code_params_caps_settings():
+    """Test that expensive settings are capped at the server limits."""
+    params = AICodeParams(
+        ai_coding_prompt="p",
+        relative_editable_files=["a.py"],
+        map_tokens=10 * MAX_MAP_TOKENS,
+        max_reflections=100,
+    )
+    assert params.map_tokens == MAX_MAP_TOKENS
+    assert params.max_reflections == MAX_REFLECTIONS
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"map_tokens": -1},
+        {"max_reflections": -1},
+        {"map_refresh": "sometimes"},
+        {"edit_format": "ask"},
+    ],
+)
+def test_ai_code_params_rejects_invalid_settings(settings):
+    """Test that invalid Aider settings are rejected."""
+    with pytest.raises(ValidationError):
+        AICodeParams(ai_coding_prompt="p", relative_editable_files=["a.py"], **settings)
+
+
+def test_map_refresh_policies_come_from_one_list():
+    """Test that the schema advertises exactly the policies the model accepts."""
+    schema = input_schema(AICodeParams)["properties"]["map_refresh"]
+    assert schema["enum"] == list(MAP_REFRESH_POLICIES)
+    for policy in MAP_REFRESH_POLICIES:
+        params = AICodeParams(
+            ai_coding_prompt="p", relative_editable_files=["a.py"], map_refresh=policy
+        )
+        assert params.map_refresh == policy
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A git repository that ignores build output."""
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / ".gitignore").write_text("build/\n")
+    return tmp_path
+
+
+def test_ai_code_params_normalize_files_against_the_repository(repo):
+    """Test that file paths are normalized and deduplicated in one pass."""
+    params = AICodeParams.model_validate(
+        {
+            "ai_coding_prompt": "p",
+            "relative_editable_files": ["./a.py", "src/../a.py", str(repo / "b.py")],
+            "relative_readonly_files": "docs//notes.md",
+            "file_groups": [["./a.py", "b.py"]],
+        },
+        context={"working_dir": str(repo)},
+    )
+    assert params.relative_editable_files == ["a.py", "b.py"]
+    assert params.relative_readonly_files == ["docs/notes.md"]
+    assert params.file_groups == [["a.py", "b.py"]]
+
+
+@pytest.mark.parametrize(
+    "files", [["../outside.py"], ["/etc/passwd"], [""], ["build/out.py"]]
+)
+def test_ai_code_params_reject_files_outside_or_ignored(repo, files):
+    """Test the repository boundary and ignore checks of editable files."""
+    with pytest.raises(ValidationError):
+        AICodeParams.model_validate(
+            {"ai_coding_prompt": "p", "relative_editable_files": files},
+            context={"working_dir": str(repo)},
+        )
+
+
+def test_input_schema_matches_the_params_model():
+    """Test that the generated MCP schema lists the model's fields plainly."""
+    schema = input_schema(AICodeParams)
+    assert schema["required"] == ["ai_coding_prompt", "relative_editable_files"]
+    assert schema["properties"]["map_tokens"] == {
+        "description": schema["properties"]["map_tokens"]["description"],
+        "minimum": 0,
+        "type": "integer",
+    }
+    assert schema["properties"]["dry_run"]["default"] is False
+    assert "title" not in schema
+    assert input_schema(ServerStatsParams) == {"properties": {}, "type": "object"}
@@ -0,0 +1,59 @@
+from aider_mcp_server.atoms import excerpt
+from aider_mcp_server.atoms.excerpt import content_fallback, file_excerpt
+
+
+def test_small_files_are_shown_whole(tmp_path):
+    """Test that files within the caps are not cut."""
+    path = tmp_path / "small.py"
+    path.write_text("x = 1\n")
+    assert file_excerpt(str(path)) == "x = 1\n"
+    assert file_excerpt(str(path), content=b"y = 2\n") == "y = 2\n"
+
+
+def test_binary_files_are_summarized(tmp_path):
+    """Test that binary content is not dumped into the response."""
+    path = tmp_path / "image.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n\0\0\0")
+    assert file_excerpt(str(path)) == "(Binary file, 11 bytes)"
+    assert file_excerpt(str(path), content=b"GIF89a\0\0") == "(Binary file, 8 bytes)"
+
+
+def test_content_fallback_summarizes_known_binary_content(tmp_path):
+    """Test that binary content read earlier is summarized, not dumped."""
+    output = content_fallback(
+        ["logo.png"], str(tmp_path), {str(tmp_path / "logo.png"): b"\x89PNG\0\0"}
+    )
+    assert "--- logo.png ---\n(Binary file, 6 bytes)" in output
+
+
+def test_large_files_are_mapped_and_cut(tmp_path, monkeypatch):
+    """Test the head and tail excerpt of a file read through mmap."""
+    monkeypatch.setattr(excerpt, "MMAP_THRESHOLD", 100)
+    path = tmp_path / "generated.js"
+    path.write_bytes(b"H" * 50 + b"M" * 1000 + b"T" * 20)
+    text = file_excerpt(str(path), head_bytes=50, tail_bytes=20)
+    assert text == "H" * 50 + "\n... [1000 bytes omitted] ...\n" + "T" * 20
+
+
+def test_content_fallback_is_bounded(tmp_path):
+    """Test that the fallback shares a byte budget between the files."""
+    (tmp_path / "a.txt").write_text("a" * 10_000)
+    (tmp_path / "b.txt").write_text("b" * 10_000)
+    output = content_fallback(
+        ["a.txt", "b.txt", "missing.txt"], str(tmp_path), total_bytes=3000
+    )
+    assert output.startswith("Git diff failed. Current file contents:\n\n")
+    assert "--- a.txt ---\n" in output
+    assert "--- b.txt ---\n" in output
+    assert "--- missing.txt --- (File not found)" in output
+    assert output.count("a") + output.count("b") < 3100
+
+
+def test_content_fallback_reuses_known_content(tmp_path):
+    """Test that content read earlier is used instead of the file."""
+    (tmp_path / "a.txt").write_text("on disk")
+    output = content_fallback(
+        ["a.txt"], str(tmp_path), {str(tmp_path / "a.txt"): b"in memory"}
+    )
+    assert "in memory" in output
+    assert "on disk" not in output
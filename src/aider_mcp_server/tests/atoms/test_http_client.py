@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from aider_mcp_server.atoms import http_client
+from aider_mcp_server.atoms.http_client import (
+    PooledHTTPClients,
+    configure_http_clients,
+    install_litellm_clients,
+    uninstall_litellm_clients,
+)
+
+# Reply of Anthropic's messages API, one of the providers litellm sends through
+# a per-call HTTPHandler
+ANTHROPIC_REPLY = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-3-5-haiku-20241022",
+    "content": [{"type": "text", "text": "pong"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 3, "output_tokens": 1},
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Keep-alive HTTP/1.1 handler that answers every POST with a fixed body."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.path.endswith("/messages"):
+            body = json.dumps(ANTHROPIC_REPLY).encode()
+        else:
+            body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """Start a local stub HTTP server and yield its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_client_reuses_connections(stub_server):
+    """Test that sequential requests share one keep-alive connection."""
+    clients = PooledHTTPClients(max_connections=4, http2=False)
+    try:
+        for _ in range(5):
+            response = clients.client.post(f"{stub_server}/v1/chat", json={"n": 1})
+            assert response.json() == {"ok": True}
+
+        stats = clients.stats()
+        assert stats["requests"] == 5
+        assert stats["connections_opened"] == 1
+        assert stats["reused_connection_requests"] == 4
+        assert stats["open_connections"] == 1
+        assert stats["idle_connections"] == 1
+    finally:
+        clients.close()
+
+
+def test_async_client_reuses_connections(stub_server):
+    """Test that the async client also keeps connections alive between requests."""
+    clients = PooledHTTPClients(max_connections=4, http2=False)
+
+    async def send_requests():
+        for _ in range(3):
+            response = await clients.async_client.post(f"{stub_server}/v1/chat")
+            assert response.status_code == 200
+        await clients.aclose()
+
+    asyncio.run(send_requests())
+
+    stats = clients.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+
+
+def test_litellm_handler_providers_use_the_pool(stub_server, monkeypatch):
+    """Test that litellm completions for Anthropic reuse a pooled connection."""
+    import litellm
+
+    monkeypatch.setattr(http_client, "_clients", None)
+    original = litellm.completion
+    clients = configure_http_clients(max_connections=4, http2=False)
+    install_litellm_clients()
+    try:
+        for _ in range(3):
+            response = litellm.completion(
+                model="anthropic/claude-3-5-haiku-20241022",
+                messages=[{"role": "user", "content": "ping"}],
+                api_base=f"{stub_server}/v1/messages",
+                api_key="test",
+            )
+            assert response.choices[0].message.content == "pong"
+    finally:
+        uninstall_litellm_clients()
+        clients.close()
+
+    stats = clients.stats()
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert litellm.completion is original
+    assert litellm.client_session is None and litellm.aclient_session is None
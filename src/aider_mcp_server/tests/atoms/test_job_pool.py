@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+from aider_mcp_server.atoms.job_pool import JobPool
+
+
+def _track_concurrency(counter, lock, peaks):
+    """Return a blocking job that records how many jobs overlap with it."""
+
+    def job():
+        with lock:
+            counter[0] += 1
+            peaks.append(counter[0])
+        time.sleep(0.05)
+        with lock:
+            counter[0] -= 1
+        return True
+
+    return job
+
+
+def test_client_connection_limits_inflight_jobs():
+    """Test that one connection never has more than its allowed jobs running."""
+    pool = JobPool(max_workers=4, max_inflight_per_client=1)
+    counter, lock, peaks = [0], threading.Lock(), []
+    job = _track_concurrency(counter, lock, peaks)
+
+    async def one_client():
+        with pool.client_connection():
+            return await asyncio.gather(*(pool.run(job) for _ in range(3)))
+
+    try:
+        assert asyncio.run(one_client()) == [True, True, True]
+    finally:
+        pool.shutdown()
+    assert max(peaks) == 1
+    assert pool.stats()["completed"] == 3
+
+
+def test_separate_clients_share_the_worker_pool():
+    """Test that jobs from different connections run in parallel on the pool."""
+    pool = JobPool(max_workers=4, max_inflight_per_client=1)
+    counter, lock, peaks = [0], threading.Lock(), []
+    job = _track_concurrency(counter, lock, peaks)
+
+    async def client():
+        with pool.client_connection():
+            return await pool.run(job)
+
+    async def many_clients():
+        return await asyncio.gather(*(client() for _ in range(3)))
+
+    try:
+        assert asyncio.run(many_clients()) == [True, True, True]
+    finally:
+        pool.shutdown()
+    assert max(peaks) > 1
+    assert pool.stats()["clients"] == 0
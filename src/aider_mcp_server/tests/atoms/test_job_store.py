@@ -0,0 +1,131 @@
+import threading
+import time
+
+from aider_mcp_server.atoms.job_store import (
+    JobStore,
+    job_fingerprint,
+    split_diff_by_file,
+)
+
+SAMPLE_DIFF = (
+    "diff --git a/a.py b/a.py\n"
+    "--- a/a.py\n"
+    "+++ b/a.py\n"
+    "@@ -0,0 +1 @@\n"
+    "+x = 1\n"
+    "diff --git a/pkg/b.py b/pkg/b.py\n"
+    "--- a/pkg/b.py\n"
+    "+++ b/pkg/b.py\n"
+    "@@ -0,0 +1 @@\n"
+    "+y = 2\n"
+)
+
+
+def _job(job_id, repo="/repo", fingerprint="fp", created_at=1.0, diff=SAMPLE_DIFF):
+    return {
+        "job_id": job_id,
+        "repo": repo,
+        "fingerprint": fingerprint,
+        "model": "gpt-4o",
+        "prompt": "add x",
+        "success": True,
+        "created_at": created_at,
+        "duration": 2.5,
+        "timings": {"llm": 2.0},
+        "usage": {"prompt_tokens": 10},
+        "diff": diff,
+    }
+
+
+def test_split_diff_by_file():
+    """Test that a multi-file diff is split into one entry per file."""
+    files = split_diff_by_file(SAMPLE_DIFF)
+    assert list(files) == ["a.py", "pkg/b.py"]
+    assert files["pkg/b.py"].startswith("diff --git a/pkg/b.py")
+    assert "+y = 2" in files["pkg/b.py"]
+    assert split_diff_by_file("Error: no diff") == {}
+
+
+def test_job_fingerprint_ignores_file_order():
+    """Test that equivalent requests get the same fingerprint."""
+    first = job_fingerprint("p", ["a.py", "b.py"], [], "gpt-4o")
+    assert first == job_fingerprint("p", ["b.py", "a.py"], [], "gpt-4o")
+    assert first != job_fingerprint("p", ["a.py", "b.py"], [], "gpt-4o-mini")
+
+
+def test_get_returns_job_before_and_after_write(tmp_path):
+    """Test that a recorded job is readable while queued and once persisted."""
+    store = JobStore(tmp_path / "jobs.sqlite")
+    try:
+        store.record(_job("job-1"))
+        job = store.get("job-1")
+        assert job is not None and job["success"] is True
+
+        store.flush()
+        job = store.get("job-1")
+        assert job is not None
+        assert job["timings"] == {"llm": 2.0}
+        assert job["usage"] == {"prompt_tokens": 10}
+        assert sorted(job["files"]) == ["a.py", "pkg/b.py"]
+        assert store.get("missing") is None
+    finally:
+        store.close()
+
+
+def test_jobs_survive_reopening(tmp_path):
+    """Test that jobs are still available from a new store on the same file."""
+    store = JobStore(tmp_path / "jobs.sqlite")
+    store.record(_job("job-1"))
+    store.close()
+
+    reopened = JobStore(tmp_path / "jobs.sqlite")
+    try:
+        job = reopened.get("job-1")
+        assert job is not None and job["diff"] == SAMPLE_DIFF
+    finally:
+        reopened.close()
+
+
+def test_list_jobs_filters_and_orders(tmp_path):
+    """Test that list_jobs filters by repo and fingerprint, newest first."""
+    store = JobStore(tmp_path / "jobs.sqlite")
+    try:
+        store.record(_job("old", created_at=1.0))
+        store.record(_job("new", created_at=2.0))
+        store.record(_job("other-fp", fingerprint="fp2", created_at=3.0))
+        store.record(_job("other-repo", repo="/other", created_at=4.0))
+
+        jobs = store.list_jobs(repo="/repo")
+        assert [j["job_id"] for j in jobs] == ["other-fp", "new", "old"]
+        assert "diff" not in jobs[0]
+
+        jobs = store.list_jobs(repo="/repo", fingerprint="fp", limit=1)
+        assert [j["job_id"] for j in jobs] == ["new"]
+    finally:
+        store.close()
+
+
+def test_list_jobs_does_not_wait_for_the_writer(tmp_path):
+    """Test that queued jobs are listed without blocking on the sqlite writer."""
+    store = JobStore(tmp_path / "jobs.sqlite")
+    release = threading.Event()
+    write = store._write
+
+    def slow_write(conn, job):
+        release.wait(30)
+        write(conn, job)
+
+    store._write = slow_write  # type: ignore[method-assign]
+    try:
+        store.record(_job("queued", created_at=2.0))
+        store.record(_job("other-repo", repo="/other", created_at=3.0))
+
+        started = time.monotonic()
+        jobs = store.list_jobs(repo="/repo")
+        assert time.monotonic() - started < 10
+        assert [j["job_id"] for j in jobs] == ["queued"]
+        assert "diff" not in jobs[0]
+        assert jobs[0]["usage"] == {"prompt_tokens": 10}
+    finally:
+        release.set()
+        store.close()
@@ -0,0 +1,30 @@
+from aider_mcp_server.atoms.map_budget import MapBudgetController
+
+
+def test_no_samples_keeps_aider_default():
+    """Test that a repository without samples uses Aider's default budget."""
+    controller = MapBudgetController(latency_target=10.0)
+    assert controller.choose("/repo") is None
+
+
+def test_slow_jobs_shrink_the_map_budget():
+    """Test that jobs over the target get a smaller map, down to none."""
+    controller = MapBudgetController(latency_target=10.0)
+    # 20s for 10k input tokens of which 4k were repo map
+    controller.record("/repo", 4096, 1.0, 10_000, 20.0)
+    assert controller.choose("/repo") == 0
+
+    controller.record("/other", 4096, 0.5, 10_000, 11.0)
+    assert controller.choose("/other") == 2048
+
+
+def test_fast_jobs_grow_the_map_budget():
+    """Test that jobs well under the target can afford a larger map."""
+    controller = MapBudgetController(latency_target=30.0)
+    controller.record("/repo", 1024, 0.2, 5_000, 5.0)
+    assert controller.choose("/repo") == 8192
+
+    stats = controller.stats()
+    assert stats["latency_target"] == 30.0
+    assert stats["repos"]["/repo"]["jobs"] == 1
+    assert stats["repos"]["/repo"]["next_map_tokens"] == 8192
@@ -0,0 +1,86 @@
+import pytest
+from aider.models import ModelSettings
+
+from aider_mcp_server.atoms.model_catalog import ModelCatalog
+
+MODEL_COST = {
+    "gpt-4o": {
+        "litellm_provider": "openai",
+        "mode": "chat",
+        "max_input_tokens": 128000,
+        "input_cost_per_token": 2.5e-06,
+        "output_cost_per_token": 1e-05,
+        "supports_vision": True,
+    },
+    "gpt-4o-mini": {
+        "litellm_provider": "openai",
+        "mode": "chat",
+        "max_input_tokens": 128000,
+        "input_cost_per_token": 1.5e-07,
+        "output_cost_per_token": 6e-07,
+        "supports_vision": True,
+    },
+    "gemini/gemini-2.5-pro": {
+        "litellm_provider": "gemini",
+        "mode": "chat",
+        "max_input_tokens": 1048576,
+        "input_cost_per_token": 1.25e-06,
+        "supports_vision": True,
+        "supports_reasoning": True,
+    },
+    "text-embedding-3-small": {"litellm_provider": "openai", "mode": "embedding"},
+}
+MODEL_SETTINGS = [
+    ModelSettings("gpt-4o", edit_format="diff"),
+    ModelSettings("gemini/gemini-2.5-pro", edit_format="diff-fenced"),
+]
+
+
+@pytest.fixture
+def catalog():
+    return ModelCatalog(MODEL_COST, MODEL_SETTINGS)
+
+
+def test_catalog_precomputes_model_metadata(catalog):
+    """Test that chat models get their limits, prices and edit formats."""
+    model = catalog.get("GPT-4o")
+    assert model == {
+        "name": "openai/gpt-4o",
+        "provider": "openai",
+        "context_window": 128000,
+        "max_output_tokens": None,
+        "input_price": 2.5,
+        "output_price": 10.0,
+        "edit_format": "diff",
+        "editor_edit_format": None,
+        "capabilities": ["vision"],
+    }
+    assert catalog.get("text-embedding-3-small") is None
+    assert catalog.stats()["models"] == 3
+
+
+def test_names_match_both_spellings(catalog):
+    """Test that names are listed with and without provider, like Aider does."""
+    assert catalog.names("gpt-4o-mini") == ["gpt-4o-mini", "openai/gpt-4o-mini"]
+    assert catalog.names("gemni-2.5-pro") == []
+    assert catalog.names("gemini/gemni-2.5-pro") == ["gemini/gemini-2.5-pro"]
+
+
+def test_search_filters_ranks_and_pages(catalog):
+    """Test filtering by provider and capability, ordering and pagination."""
+    page = catalog.search(capabilities=["vision"], sort="price", limit=2)
+    assert [m["name"] for m in page["models"]] == [
+        "openai/gpt-4o-mini",
+        "gemini/gemini-2.5-pro",
+    ]
+    assert (page["total"], page["next_offset"]) == (3, 2)
+    last = catalog.search(capabilities=["vision"], sort="price", offset=2, limit=2)
+    assert [m["name"] for m in last["models"]] == ["openai/gpt-4o"]
+    assert last["next_offset"] is None
+
+    assert catalog.search("gpt-4o")["models"][0]["name"] == "openai/gpt-4o"
+    assert catalog.search(provider="gemini", min_context=200000)["total"] == 1
+    assert catalog.search(edit_format="diff")["total"] == 1
+    assert catalog.search(max_input_price=1.0)["total"] == 1
+    with pytest.raises(ValueError):
+        catalog.search(sort="popularity")
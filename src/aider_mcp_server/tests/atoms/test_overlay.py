@@ -0,0 +1,39 @@
+from aider_mcp_server.atoms.overlay import OverlayIO, overlay_diff
+
+
+def test_writes_stay_in_memory(tmp_path):
+    """Test that written files are read back from the overlay, not the disk."""
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    io = OverlayIO()
+
+    assert io.read_text(str(path)) == "x = 1\n"
+    io.write_text(str(path), "x = 2\n")
+    assert io.read_text(str(path)) == "x = 2\n"
+    assert path.read_text() == "x = 1\n"
+    assert io.overlay == {str(path): "x = 2\n"}
+
+
+def test_overlay_is_shared_between_ios(tmp_path):
+    """Test that IO objects of one job see each other's writes."""
+    overlay = {}
+    OverlayIO(overlay).write_text(str(tmp_path / "a.py"), "x = 2\n")
+    assert OverlayIO(overlay).read_text(str(tmp_path / "a.py")) == "x = 2\n"
+
+
+def test_overlay_diff(tmp_path):
+    """Test that only changed files are diffed, in git's format."""
+    (tmp_path / "a.py").write_text("x = 1\n")
+    (tmp_path / "same.py").write_text("y = 1\n")
+    overlay = {
+        str(tmp_path / "a.py"): "x = 2",
+        str(tmp_path / "same.py"): "y = 1\n",
+        str(tmp_path / "new.py"): "z = 1\n",
+    }
+
+    diff, changed = overlay_diff(overlay, str(tmp_path))
+
+    assert changed == ["a.py", "new.py"]
+    assert diff.startswith("diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n")
+    assert "-x = 1\n+x = 2\n\\ No newline at end of file\n" in diff
+    assert "+z = 1\n" in diff
@@ -0,0 +1,50 @@
+import os
+import subprocess
+
+import pytest
+
+from aider_mcp_server.atoms.paths import ignored_paths, normalize_paths
+
+
+def test_normalize_paths_without_root_only_cleans_up():
+    """Test the lexical normalization used when no repository is known."""
+    assert normalize_paths(["./a.py", "a.py", "b//c.py"]) == ["a.py", "b/c.py"]
+    with pytest.raises(ValueError):
+        normalize_paths(["../a.py"])
+
+
+def test_normalize_paths_rejects_symlinks_out_of_the_repository(tmp_path):
+    """Test that a symlink pointing outside the repository is rejected."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    os.symlink(tmp_path, repo / "escape")
+    with pytest.raises(ValueError, match="resolves outside"):
+        normalize_paths(["escape/secret.txt"], str(repo))
+
+
+def test_ignored_paths_respects_tracked_files(tmp_path):
+    """Test that ignore patterns are confirmed by git and .aiderignore applies."""
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / ".aiderignore").write_text("vendor/\n")
+    (tmp_path / "kept.log").write_text("tracked anyway\n")
+    subprocess.run(["git", "add", "-f", "kept.log"], cwd=tmp_path, check=True)
+
+    paths = ["app.py", "debug.log", "kept.log", "vendor/lib.py"]
+    assert ignored_paths(paths, str(tmp_path)) == ["debug.log", "vendor/lib.py"]
+
+    (tmp_path / ".gitignore").write_text("")
+    assert ignored_paths(paths, str(tmp_path)) == ["vendor/lib.py"]
+
+
+def test_ignored_paths_reads_nested_gitignore_files(tmp_path):
+    """Test that a subdirectory's .gitignore applies to the paths below it."""
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    (tmp_path / "web" / "static").mkdir(parents=True)
+    (tmp_path / "web" / ".gitignore").write_text("*.min.js\n/dist/\n")
+
+    paths = ["app.min.js", "web/app.min.js", "web/static/app.min.js", "web/dist/a.js"]
+    assert ignored_paths(paths, str(tmp_path)) == paths[1:]
+
+    (tmp_path / "web" / "static" / ".gitignore").write_text("!app.min.js\n")
+    assert ignored_paths(paths, str(tmp_path)) == ["web/app.min.js", "web/dist/a.js"]
@@ -0,0 +1,57 @@
+import pstats
+import time
+
+import pytest
+
+from aider_mcp_server.atoms.profiler import JobProfiler
+
+
+def _work():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+def test_unarmed_profiler_does_nothing(tmp_path):
+    """Test that jobs are not profiled unless the profiler was armed."""
+    profiler = JobProfiler(str(tmp_path))
+    with profiler.profile("job") as path:
+        _work()
+    assert path is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_deterministic_profile_of_the_next_jobs(tmp_path):
+    """Test that exactly the armed number of jobs write pstats files."""
+    profiler = JobProfiler(str(tmp_path))
+    assert profiler.arm(count=1)["remaining"] == 1
+    with profiler.profile("first") as path:
+        _work()
+    with profiler.profile("second") as skipped:
+        _work()
+
+    assert path.endswith("-first.pstats")
+    assert skipped is None
+    assert any("_work" in name for _, _, name in pstats.Stats(path).stats)
+    stats = profiler.stats()
+    assert (stats["remaining"], stats["profiled"]) == (0, 1)
+    assert stats["recent"][0]["path"] == path
+
+
+def test_sampling_profile_writes_collapsed_stacks(tmp_path):
+    """Test that sampling mode writes "frame;frame count" lines."""
+    profiler = JobProfiler(str(tmp_path))
+    profiler.arm(count=1, mode="sampling", interval=0.001)
+    with pytest.raises(RuntimeError):
+        with profiler.profile("failing") as path:
+            _work()
+            raise RuntimeError("job failed")
+
+    lines = open(path).read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("_work" in line for line in lines)
+
+    with pytest.raises(ValueError):
+        profiler.arm(mode="tracing")
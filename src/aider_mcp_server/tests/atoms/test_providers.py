@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+from aider.models import Model
+from pydantic import ValidationError
+
+from aider_mcp_server.atoms.providers import (
+    CI_VERTEX_PROJECT,
+    ProviderProfile,
+    load_provider_profile,
+)
+
+
+def test_default_profile_keeps_models():
+    """Test that outside CI models and their settings are used as given."""
+    profile = load_provider_profile(environ={})
+    assert profile.model_name("gemini/gemini-2.5-pro") == "gemini/gemini-2.5-pro"
+    assert profile.params_for("gemini/gemini-2.5-pro") == {}
+
+
+def test_ci_profile_maps_to_vertex_without_touching_the_environment(monkeypatch):
+    """Test that CI runs get Vertex AI settings as model parameters."""
+    monkeypatch.delenv("VERTEX_PROJECT", raising=False)
+    profile = load_provider_profile(environ={"GITHUB_ACTIONS": "true"})
+    assert profile.model_name("gemini/gemini-2.5-pro") == "vertex_ai/gemini-2.5-pro"
+    assert profile.model_name("vertex_ai/gemini-2.5-pro") == "vertex_ai/gemini-2.5-pro"
+
+    model = profile.apply(Model("vertex_ai/gemini-2.5-pro"))
+    assert model.extra_params["vertex_project"] == CI_VERTEX_PROJECT
+    assert "VERTEX_PROJECT" not in os.environ
+
+    with pytest.raises(ValidationError):
+        profile.name = "changed"  # type: ignore[misc]
+
+
+def test_config_file_reads_values_from_the_environment(tmp_path):
+    """Test that "env:NAME" values are resolved when the profile is loaded."""
+    config = tmp_path / "providers.json"
+    config.write_text(
+        json.dumps(
+            {
+                "name": "team",
+                "providers": {"openai": {"api_base": "env:OPENAI_BASE", "timeout": 30}},
+            }
+        )
+    )
+    profile = load_provider_profile(str(config), environ={"OPENAI_BASE": "http://x"})
+    assert profile.params_for("openai/gpt-4o") == {
+        "api_base": "http://x",
+        "timeout": 30,
+    }
+
+    model = Model("openai/gpt-4o")
+    model.extra_params = {"timeout": 5}
+    assert profile.apply(model).extra_params == {"api_base": "http://x", "timeout": 5}
+
+    config.write_text("{not json")
+    with pytest.raises(ValueError):
+        load_provider_profile(str(config))
+
+
+def test_profiles_are_immutable():
+    """Test that a resolved profile cannot be changed by a job."""
+    profile = ProviderProfile(providers={"gemini": {"timeout": 10}})
+    profile.params_for("gemini/x")["timeout"] = 99
+    assert profile.params_for("gemini/x") == {"timeout": 10}
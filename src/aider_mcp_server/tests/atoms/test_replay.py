@@ -0,0 +1,125 @@
+import json
+import subprocess
+import sys
+
+from aider.models import Model
+
+from aider_mcp_server.atoms import providers, verify
+from aider_mcp_server.atoms.cassette import Cassette, CassetteRecorder
+from aider_mcp_server.atoms.providers import ProviderProfile
+from aider_mcp_server.atoms.replay import replay_report, timing_deltas
+from aider_mcp_server.atoms.tools.aider_ai_code import code_with_aider
+from aider_mcp_server.atoms.verify import Verifier
+
+REPLY = "calc.py\n```python\n# calculator\ndef add(a, b):\n    return a + b\n```\n"
+JOB = {
+    "ai_coding_prompt": "Add an add(a, b) function",
+    "relative_editable_files": ["calc.py"],
+    "relative_readonly_files": [],
+    "model": "openai/gpt-4o",
+    "edit_format": "whole",
+    "map_tokens": 0,
+    "stream": False,
+}
+
+
+FAILING_REPLY = "calc.py\n```python\n# calculator\nFAIL = True\n```\n"
+# Passes when no file given to it contains "FAIL"
+CHECK = (
+    f"{sys.executable} -c "
+    "\"import sys; sys.exit(any('FAIL' in open(f).read() for f in sys.argv[1:]))\" "
+    "{files}"
+)
+
+
+def _init_repo(repo):
+    repo.mkdir()
+    (repo / "calc.py").write_text("# calculator\n")
+    for args in (["init", "-q"], ["add", "."], ["commit", "-qm", "init"]):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=repo,
+            check=True,
+        )
+
+
+def test_timing_deltas_compare_phases():
+    """Test that phases are compared and missing phases are reported as such."""
+    deltas = timing_deltas({"llm": 2.0, "diff": 0.5}, {"llm": 0.5, "verify": 1.0})
+    assert deltas["llm"] == {
+        "baseline": 2.0,
+        "current": 0.5,
+        "delta": -1.5,
+        "ratio": 0.25,
+    }
+    assert deltas["diff"]["delta"] is None
+    assert deltas["verify"]["baseline"] is None
+
+
+def test_recorded_job_replays_offline(tmp_path, monkeypatch):
+    """Test that a recorded job replays to the same diff without a provider."""
+    repo = tmp_path / "repo"
+    _init_repo(repo)
+
+    # Record against a provider that answers with a canned reply
+    monkeypatch.setattr(
+        providers,
+        "_profile",
+        ProviderProfile(providers={"openai": {"mock_response": REPLY}}),
+    )
+    recorder = CassetteRecorder(str(tmp_path / "cassettes"))
+    with recorder.record("job1", {}, JOB, str(repo)) as cassette:
+        cassette.data["result"] = json.loads(
+            code_with_aider(working_dir=str(repo), **JOB)
+        )
+    assert cassette.data["result"]["success"]
+    assert cassette.data["interactions"][0]["content"] == REPLY
+
+    # Replay without the canned provider
+    monkeypatch.setattr(providers, "_profile", ProviderProfile())
+    report = replay_report([Cassette.load(tmp_path / "cassettes" / "job1.json")])
+    job = report["jobs"][0]
+    assert job["success"]
+    assert job["diff_matches"]
+    assert "llm" in job["deltas"]
+    assert (
+        job["deltas"]["total"]["baseline"]
+        == cassette.data["result"]["timings"]["total"]
+    )
+
+
+def test_verified_job_with_fix_round_replays_offline(tmp_path, monkeypatch):
+    """Test that the fix round of a verified job is recorded and replayed once."""
+    repo = tmp_path / "repo"
+    _init_repo(repo)
+    monkeypatch.setattr(verify, "_verifier", Verifier(lint_cmd=CHECK))
+    job = {**JOB, "verify": True}
+
+    # Record against a provider that first breaks the check, then fixes it
+    replies = iter([FAILING_REPLY, REPLY])
+    send_completion = Model.send_completion
+
+    def canned_send_completion(self, *args, **kwargs):
+        self.extra_params = {
+            **(self.extra_params or {}),
+            "mock_response": next(replies, "Ok."),
+        }
+        return send_completion(self, *args, **kwargs)
+
+    monkeypatch.setattr(Model, "send_completion", canned_send_completion)
+    recorder = CassetteRecorder(str(tmp_path / "cassettes"))
+    with recorder.record("job1", {}, job, str(repo)) as cassette:
+        cassette.data["result"] = json.loads(
+            code_with_aider(working_dir=str(repo), **job)
+        )
+    assert cassette.data["result"]["verification"]["fixed"]
+    assert [i["content"] for i in cassette.data["interactions"]] == [
+        FAILING_REPLY,
+        REPLY,
+    ]
+
+    # Replay without the canned provider
+    monkeypatch.setattr(Model, "send_completion", send_completion)
+    report = replay_report([Cassette.load(tmp_path / "cassettes" / "job1.json")])
+    assert report["jobs"][0]["success"]
+    assert report["jobs"][0]["diff_matches"]
@@ -0,0 +1,65 @@
+import random
+
+from aider_mcp_server.atoms.retry import (
+    AUTH,
+    FATAL,
+    RATE_LIMIT,
+    SERVER,
+    TIMEOUT,
+    backoff_delay,
+    classify_error,
+    failover_chain,
+)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_classify_error_by_exception_name():
+    """Test that provider errors are classified by their exception class name."""
+    assert classify_error(RateLimitError("slow down")) == RATE_LIMIT
+    assert classify_error(AuthenticationError("bad key")) == AUTH
+    assert classify_error(TimeoutError("too slow")) == TIMEOUT
+    assert classify_error(ValueError("bug")) == FATAL
+
+
+def test_classify_error_by_status_code():
+    """Test that errors without a known class name fall back to the status code."""
+    assert classify_error(StatusError(429)) == RATE_LIMIT
+    assert classify_error(StatusError(403)) == AUTH
+    assert classify_error(StatusError(503)) == SERVER
+    assert classify_error(StatusError(400)) == FATAL
+
+
+def test_backoff_delay_is_bounded():
+    """Test that jittered delays stay within the exponential ceiling and the cap."""
+    rng = random.Random(42)
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base_delay=1.0, max_delay=8.0, rng=rng)
+        assert 0 <= delay <= min(8.0, 2**attempt)
+
+
+def test_failover_chain_defaults_to_equivalent_providers():
+    """Test that the default chain tries the same model on equivalent providers."""
+    assert failover_chain("gemini/gemini-2.5-pro") == [
+        "gemini/gemini-2.5-pro",
+        "vertex_ai/gemini-2.5-pro",
+    ]
+    assert failover_chain("gpt-4o") == ["gpt-4o"]
+
+
+def test_failover_chain_uses_explicit_models_without_duplicates():
+    """Test that an explicit failover list is kept in order and deduplicated."""
+    chain = failover_chain("gpt-4o", ["claude-3-5-sonnet", "gpt-4o", "o3-mini"])
+    assert chain == ["gpt-4o", "claude-3-5-sonnet", "o3-mini"]
@@ -0,0 +1,73 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from aider_mcp_server.atoms.sessions import SessionTable
+
+
+def _coder(history):
+    return SimpleNamespace(
+        main_model=SimpleNamespace(name="gpt-4o"),
+        abs_fnames={"/repo/a.py"},
+        abs_read_only_fnames={"/repo/b.py"},
+        done_messages=list(history),
+        cur_messages=[],
+    )
+
+
+def test_evicted_session_is_saved_and_restored(tmp_path):
+    """Test that an evicted session comes back with its history and files."""
+    table = SessionTable(persist_dir=str(tmp_path), idle_timeout=3600)
+    history = [{"role": "user", "content": "add a"}]
+    with table.checkout("s1", "/repo") as session:
+        session.coder = _coder(history)
+
+    assert table.evict(force=True) == 1
+    saved = json.loads((tmp_path / "s1.json").read_text())
+    assert saved["done_messages"] == history
+    assert saved["editable_files"] == ["/repo/a.py"]
+
+    with table.checkout("s1", "/repo") as session:
+        assert session.coder is None
+        assert session.saved["readonly_files"] == ["/repo/b.py"]
+        assert session.turns == 1
+    assert table.stats()["restored"] == 1
+    table.close()
+
+
+def test_least_recently_used_sessions_are_evicted(tmp_path):
+    """Test that the table never keeps more than max_sessions alive."""
+    table = SessionTable(persist_dir=str(tmp_path), max_sessions=2)
+    for session_id in ("s1", "s2", "s3"):
+        with table.checkout(session_id, "/repo") as session:
+            session.coder = _coder([])
+
+    stats = table.stats()
+    assert stats["live_sessions"] == 2
+    assert stats["evicted"] == 1
+    assert (tmp_path / "s1.json").exists()
+    table.close()
+
+
+def test_idle_sessions_are_evicted(tmp_path):
+    """Test that sessions unused for the idle timeout are dropped."""
+    table = SessionTable(persist_dir=None, idle_timeout=0)
+    with table.checkout("s1", "/repo") as session:
+        session.coder = _coder([])
+    assert table.stats()["live_sessions"] == 0
+    table.close()
+
+
+def test_session_rejects_bad_ids_and_other_repos(tmp_path):
+    """Test that session ids are validated and bound to one working dir."""
+    table = SessionTable(persist_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        with table.checkout("../escape", "/repo"):
+            pass
+    with table.checkout("s1", "/repo"):
+        pass
+    with pytest.raises(ValueError):
+        with table.checkout("s1", "/other"):
+            pass
+    table.close()
@@ -0,0 +1,96 @@
+import subprocess
+import threading
+
+import pytest
+
+from aider_mcp_server.atoms.symbol_index import DEFAULT_MAX_AGE, SymbolIndex
+
+FILES = {
+    "models.py": "class User:\n    pass\n\n\nclass Order:\n    pass\n",
+    "pricing.py": "def total(order):\n    return 0\n",
+    "service.py": (
+        "from models import User, Order\n"
+        "from pricing import total\n\n\n"
+        "def checkout(name):\n"
+        "    return total(Order(User(name)))\n"
+    ),
+}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A small git repository whose service module uses the other two."""
+    for name, content in FILES.items():
+        (tmp_path / name).write_text(content)
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    return tmp_path
+
+
+def test_index_finds_definitions(repo):
+    """Test that definitions are indexed with their file and line."""
+    index = SymbolIndex(str(repo))
+    assert index.update()["parsed"] == 3
+    assert index.definitions("Order") == [("models.py", 4)]
+    assert index.definitions("missing") == []
+
+
+def test_update_only_reparses_changed_files(repo, tmp_path_factory):
+    """Test that the persisted index is reused and updated incrementally."""
+    index_path = tmp_path_factory.mktemp("index") / "repo.json"
+    SymbolIndex(str(repo), index_path).update()
+
+    reloaded = SymbolIndex(str(repo), index_path)
+    assert reloaded.update()["parsed"] == 0
+
+    (repo / "pricing.py").write_text("def subtotal(order):\n    return 0\n")
+    (repo / "models.py").unlink()
+    result = reloaded.update()
+    assert result["parsed"] == 1
+    assert result["removed"] == 1
+    assert reloaded.definitions("total") == []
+    assert reloaded.definitions("subtotal") == [("pricing.py", 0)]
+    assert reloaded.definitions("User") == []
+
+
+def test_select_context_files_covers_referenced_symbols(repo):
+    """Test that the files defining the symbols an editable file uses are picked."""
+    index = SymbolIndex(str(repo))
+    index.update()
+    assert index.select_context_files(["service.py"]) == ["models.py", "pricing.py"]
+    assert index.select_context_files(["service.py"], max_files=1) == ["models.py"]
+    assert index.select_context_files(["models.py"]) == []
+
+
+def test_tags_come_from_the_hashed_content(repo):
+    """Test that a file is parsed from the bytes its hash was taken of."""
+    index = SymbolIndex(str(repo))
+    entry = index._index_file("pricing.py", b"def subtotal(order):\n    return 0\n")
+    assert entry["defs"] == [["subtotal", 0]]
+
+
+def test_queries_do_not_wait_for_an_update(repo, monkeypatch):
+    """Test that queries answer from the current index while files are parsed."""
+    index = SymbolIndex(str(repo))
+    index.update()
+    parsing, release = threading.Event(), threading.Event()
+    index_file = index._index_file
+
+    def slow_index_file(rel_fname, content):
+        parsing.set()
+        release.wait(10)
+        return index_file(rel_fname, content)
+
+    monkeypatch.setattr(index, "_index_file", slow_index_file)
+    (repo / "pricing.py").write_text("def subtotal(order):\n    return 0\n")
+    updater = threading.Thread(target=index.update)
+    updater.start()
+    assert parsing.wait(10)
+
+    index.invalidate()
+    assert index.update(max_age=DEFAULT_MAX_AGE)["parsed"] == 0
+    assert index.definitions("total") == [("pricing.py", 0)]
+
+    release.set()
+    updater.join()
+    assert index.definitions("subtotal") == [("pricing.py", 0)]
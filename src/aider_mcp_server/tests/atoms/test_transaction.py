@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from aider_mcp_server.atoms import transaction
+from aider_mcp_server.atoms.transaction import (
+    FileTransaction,
+    TransactionalIO,
+    recover_journals,
+)
+
+
+def test_rollback_restores_and_removes_files(tmp_path):
+    """Test that rolling back restores edited files and removes created ones."""
+    edited = tmp_path / "a.py"
+    edited.write_text("x = 1\n")
+    created = tmp_path / "new.py"
+    txn = FileTransaction(str(tmp_path / "journal"))
+
+    txn.write(str(edited), b"x = 2\n")
+    txn.write(str(edited), b"x = 3\n")
+    txn.write(str(created), b"y = 1\n")
+    assert edited.read_text() == "x = 3\n"
+
+    restored = txn.rollback()
+
+    assert sorted(restored) == [str(edited), str(created)]
+    assert edited.read_text() == "x = 1\n"
+    assert not created.exists()
+    assert not (tmp_path / "journal" / txn.txn_id).exists()
+
+
+def test_commit_keeps_changes(tmp_path):
+    """Test that committing keeps the edits and drops the journal."""
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    os.chmod(path, 0o755)
+    txn = FileTransaction(str(tmp_path / "journal"))
+
+    TransactionalIO(txn).write_text(str(path), "x = 2\n")
+    txn.commit()
+
+    assert path.read_text() == "x = 2\n"
+    assert os.stat(path).st_mode & 0o777 == 0o755
+    assert list((tmp_path / "journal").iterdir()) == []
+
+
+def test_recover_journals_rolls_back_unfinished_jobs(tmp_path):
+    """Test that a journal left behind by a crash is rolled back."""
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    journal = tmp_path / "journal"
+    # A job that tracked a file it created, then "crashed" before finishing
+    txn = FileTransaction(str(journal))
+    txn.write(str(path), b"x = 2\n")
+    txn.write(str(tmp_path / "new.py"), b"y = 1\n")
+
+    restored = recover_journals(str(journal))
+
+    assert len(restored) == 2
+    assert path.read_text() == "x = 1\n"
+    assert not (tmp_path / "new.py").exists()
+    assert list(journal.iterdir()) == []
+
+
+def test_writes_keep_symlinks(tmp_path):
+    """Test that writing through a symlink replaces its target, not the link."""
+    target = tmp_path / "real.py"
+    target.write_text("x = 1\n")
+    link = tmp_path / "link.py"
+    link.symlink_to(target)
+    txn = FileTransaction(str(tmp_path / "journal"))
+
+    txn.write(str(link), b"x = 2\n")
+    assert link.is_symlink()
+    assert target.read_text() == "x = 2\n"
+
+    txn.rollback()
+    assert link.is_symlink()
+    assert target.read_text() == "x = 1\n"
+
+
+def test_writes_are_flushed_before_the_rename(tmp_path, monkeypatch):
+    """Test that content and renames are synced, so a crash cannot lose them."""
+    synced = []
+    fsync = os.fsync
+
+    def recording_fsync(fd):
+        synced.append(os.path.exists(tmp_path / "a.py"))
+        fsync(fd)
+
+    monkeypatch.setattr(transaction.os, "fsync", recording_fsync)
+    FileTransaction().write(str(tmp_path / "a.py"), b"x = 1\n")
+
+    # The temporary file, then the directory after the rename
+    assert synced == [False, True]
+
+
+def test_preimages_are_journaled_on_first_write(tmp_path):
+    """Test that tracking costs no journal writes until a file changes."""
+    existing = tmp_path / "a.py"
+    existing.write_text("x = 1\n")
+    created = tmp_path / "new.py"
+    journal = tmp_path / "journal"
+    txn = FileTransaction(str(journal))
+
+    txn.track(str(existing))
+    assert not journal.exists()
+
+    # Aider creates a missing file empty before it writes it
+    txn.track(str(created))
+    created.touch()
+    txn.write(str(created), b"y = 1\n")
+
+    assert txn.rollback() == [str(created)]
+    assert not created.exists()
+    assert existing.read_text() == "x = 1\n"
+
+
+def test_failed_writes_are_raised(tmp_path):
+    """Test that a write that fails is not reported as done, like Aider's IO."""
+    io = TransactionalIO(FileTransaction())
+    with pytest.raises(OSError):
+        io.write_text(str(tmp_path / "missing" / "a.py"), "x = 1\n")
@@ -0,0 +1,28 @@
+import os
+
+from aider_mcp_server.atoms.utils import STATE_DIR_ENV, default_state_dir, state_path
+
+
+def test_state_dir_comes_from_the_environment(tmp_path, monkeypatch):
+    """Test that the state directory is the env override, else the XDG one."""
+    monkeypatch.setenv(STATE_DIR_ENV, str(tmp_path / "state"))
+    assert default_state_dir() == str(tmp_path / "state")
+
+    monkeypatch.delenv(STATE_DIR_ENV)
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    assert default_state_dir() == str(tmp_path / "aider-mcp-server")
+
+
+def test_state_paths_resolve_against_the_state_dir(tmp_path, monkeypatch):
+    """Test that relative paths land in the state directory, not the CWD."""
+    monkeypatch.chdir(tmp_path)
+    state_dir = str(tmp_path / "state")
+
+    assert state_path("jobs.sqlite", state_dir) == os.path.join(
+        state_dir, "jobs.sqlite"
+    )
+    assert state_path(str(tmp_path / "elsewhere"), state_dir) == str(
+        tmp_path / "elsewhere"
+    )
+    monkeypatch.setenv(STATE_DIR_ENV, state_dir)
+    assert state_path("journal") == os.path.join(state_dir, "journal")
@@ -0,0 +1,113 @@
+import subprocess
+import sys
+
+import pytest
+
+from aider_mcp_server.atoms.verify import ImportGraph, Verifier, failure_report
+
+FILES = {
+    "pkg/__init__.py": "",
+    "pkg/core.py": "def add(a, b):\n    return a + b\n",
+    "pkg/api.py": "from .core import add\n\n\ndef total(items):\n    return 0\n",
+    "pkg/other.py": "VALUE = 1\n",
+    "tests/test_api.py": "from pkg.api import total\n\n\ndef test_total():\n"
+    "    assert total([]) == 0\n",
+    "tests/test_other.py": "from pkg import other\n\n\ndef test_value():\n"
+    "    assert other.VALUE == 1\n",
+}
+
+# Passes when every file given to it contains no "FAIL"
+CHECK = (
+    f"{sys.executable} -c "
+    "\"import sys; sys.exit(any('FAIL' in open(f).read() for f in sys.argv[1:]))\" "
+    "{files}"
+)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A small git repository with a package and its tests."""
+    for name, content in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    return tmp_path
+
+
+def test_affected_tests_follow_imports(repo):
+    """Test that tests importing a changed module, even indirectly, are selected."""
+    graph = ImportGraph(str(repo))
+    assert graph.update() == len(FILES)
+    assert graph.affected_tests(["pkg/core.py"]) == ["tests/test_api.py"]
+    assert graph.affected_tests(["pkg/other.py"]) == ["tests/test_other.py"]
+    assert graph.affected_tests(["tests/test_other.py"]) == ["tests/test_other.py"]
+    assert graph.update() == 0
+
+
+def test_verify_reports_and_caches_results(repo):
+    """Test that checks run on the selected files and reuse identical results."""
+    verifier = Verifier(lint_cmd=CHECK, test_cmd=CHECK)
+    result = verifier.verify(str(repo), ["pkg/core.py"])
+    assert result["status"] == "passed"
+    assert result["selected_tests"] == ["tests/test_api.py"]
+    assert [c["name"] for c in result["checks"]] == ["lint", "test"]
+    assert not any(c["cached"] for c in result["checks"])
+
+    again = verifier.verify(str(repo), ["pkg/core.py"])
+    assert all(c["cached"] for c in again["checks"])
+
+    (repo / "pkg/core.py").write_text("FAIL = True\n")
+    failed = verifier.verify(str(repo), ["pkg/core.py"])
+    assert failed["status"] == "failed"
+    assert [c["status"] for c in failed["checks"]] == ["failed", "passed"]
+    assert not failed["checks"][1]["cached"]
+    assert "$ " in failure_report(failed)
+    assert verifier.stats()["hits"] == 2
+
+
+def test_test_results_depend_on_everything_the_tests_import(repo):
+    """Test that editing an unchanged module or a conftest.py reruns the tests."""
+    (repo / "tests" / "conftest.py").write_text("")
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    verifier = Verifier(test_cmd=CHECK)
+    graph = verifier.import_graph(str(repo))
+    graph.update()
+    assert graph.import_closure(["tests/test_api.py"]) == [
+        "pkg/__init__.py",
+        "pkg/api.py",
+        "pkg/core.py",
+        "tests/conftest.py",
+        "tests/test_api.py",
+    ]
+    assert not verifier.verify(str(repo), ["pkg/api.py"])["checks"][0]["cached"]
+    assert verifier.verify(str(repo), ["pkg/api.py"])["checks"][0]["cached"]
+
+    # Neither file is among the changed ones passed to verify()
+    for name in ("pkg/core.py", "tests/conftest.py"):
+        (repo / name).write_text("FAIL = True\n")
+        check = verifier.verify(str(repo), ["pkg/api.py"])["checks"][0]
+        assert not check["cached"]
+
+
+def test_tests_outside_the_graph_are_not_cached(repo):
+    """Test that results are not reused when a test's imports are unknown."""
+    # Not tracked by git, so not in the import graph
+    (repo / "tests" / "test_new.py").write_text("import pkg.core\n")
+    verifier = Verifier(test_cmd=CHECK)
+    graph = verifier.import_graph(str(repo))
+    graph.update()
+    assert graph.import_closure(["tests/test_new.py"]) is None
+
+    for _ in range(2):
+        check = verifier.verify(str(repo), ["tests/test_new.py"])["checks"][0]
+        assert check["status"] == "passed" and not check["cached"]
+
+
+def test_tests_without_selection_are_skipped(repo):
+    """Test that a test command with no affected tests does not run."""
+    verifier = Verifier(test_cmd=CHECK)
+    result = verifier.verify(str(repo), ["README.md"])
+    assert result["status"] == "skipped"
+    assert result["checks"][0]["status"] == "skipped"
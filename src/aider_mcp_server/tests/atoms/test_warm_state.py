@@ -0,0 +1,127 @@
+import json
+import subprocess
+from collections import OrderedDict
+
+import pytest
+
+from aider_mcp_server.atoms import model_catalog, warm_state
+from aider_mcp_server.atoms.map_budget import configure_map_budget, get_map_budget
+from aider_mcp_server.atoms.model_catalog import ModelCatalog, get_model_catalog
+from aider_mcp_server.atoms.tools import aider_estimate
+from aider_mcp_server.atoms.verify import configure_verifier, get_verifier
+from aider_mcp_server.atoms.warm_state import WARM_STATE_VERSION, WarmStateStore
+
+MODEL_COST = {
+    "gpt-4o": {
+        "mode": "chat",
+        "litellm_provider": "openai",
+        "max_input_tokens": 128000,
+        "input_cost_per_token": 2.5e-06,
+    },
+}
+
+GIT = ["git", "-c", "user.name=test", "-c", "user.email=test@localhost"]
+
+
+def _commit(repo, message):
+    subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    subprocess.run(
+        [*GIT, "commit", "-q", "--no-gpg-sign", "-m", message], cwd=repo, check=True
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A git repository with one commit."""
+    root = tmp_path / "repo"
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "core.py").write_text("import os\n")
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    _commit(root, "Initial")
+    return root
+
+
+@pytest.fixture
+def warm_caches(monkeypatch):
+    """Fresh process-wide caches, put back after the test."""
+    loaded: list[list[str]] = []
+    monkeypatch.setattr(warm_state, "warm_tokenizers", loaded.append)
+
+    def fresh() -> None:
+        monkeypatch.setattr(aider_estimate, "_token_counts", OrderedDict())
+        monkeypatch.setattr(model_catalog, "_catalog", None)
+        configure_map_budget(10.0)
+        configure_verifier(test_cmd="pytest {files}")
+
+    fresh()
+    yield fresh, loaded
+    configure_map_budget(None)
+    configure_verifier()
+
+
+def _warm_up(repo) -> None:
+    aider_estimate.count_tokens("openai/gpt-4o", b"")
+    map_budget, verifier = get_map_budget(), get_verifier()
+    assert map_budget is not None and verifier is not None
+    map_budget.record(str(repo), 1024, 0.5, 4000, 20.0)
+    verifier.import_graph(str(repo)).update()
+
+
+def test_restore_brings_back_the_saved_state(tmp_path, repo, warm_caches):
+    """Test that a restart restores the catalog, token counts and repo state."""
+    fresh, loaded = warm_caches
+    model_catalog._catalog = ModelCatalog(MODEL_COST, [])
+    _warm_up(repo)
+    store = WarmStateStore(str(tmp_path / "warm.json"))
+    assert store.save()
+    assert not store.save()
+
+    fresh()
+    restored = WarmStateStore(str(tmp_path / "warm.json")).restore()
+
+    assert restored == {
+        "model_catalog": 1,
+        "token_counts": 1,
+        "map_budget": 1,
+        "import_graphs": 1,
+        "stale_repos": 0,
+    }
+    assert get_model_catalog().get("gpt-4o")["input_price"] == 2.5
+    assert len(aider_estimate._token_counts) == 1
+    assert loaded == [["openai/gpt-4o"]]
+    assert get_map_budget().stats()["repos"][str(repo)]["jobs"] == 1
+    assert get_verifier().import_graph(str(repo)).update() == 0
+
+
+def test_new_commit_drops_map_budget_but_keeps_hashed_entries(
+    tmp_path, repo, warm_caches
+):
+    """Test that a repository at another commit only reuses unchanged files."""
+    fresh, _ = warm_caches
+    _warm_up(repo)
+    store = WarmStateStore(str(tmp_path / "warm.json"))
+    store.save()
+
+    (repo / "pkg" / "core.py").write_text("import sys\n")
+    _commit(repo, "Change core")
+    fresh()
+    restored = store.restore()
+
+    assert restored["stale_repos"] == 1
+    assert restored["map_budget"] == 0
+    assert get_map_budget().stats()["repos"] == {}
+    # Only the changed file is parsed again
+    assert get_verifier().import_graph(str(repo)).update() == 1
+
+
+def test_snapshots_of_other_versions_are_ignored(tmp_path, warm_caches):
+    """Test that an incompatible snapshot leaves the caches cold."""
+    path = tmp_path / "warm.json"
+    path.write_text(json.dumps({"version": WARM_STATE_VERSION + 1}))
+    assert WarmStateStore(str(path)).restore() == {}
+
+    data = WarmStateStore(str(path)).capture()
+    data["packages"] = {"aider-chat": "0.0.0", "litellm": "0.0.0"}
+    path.write_text(json.dumps(data))
+    assert WarmStateStore(str(path)).restore()["model_catalog"] == 0
@@ -389,3 +389,604 @@ def test_complex_tasks(temp_dir):
     except (AttributeError, TypeError):
         # Some implementations might handle memory differently
         pass
+
+
+class _FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class _FakeCoder:
+    """Minimal stand-in for an Aider coder that mimics its send/run error handling."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.done_messages = []
+        self.cur_messages = []
+        self.main_model = None
+        self.repo_map = None
+
+    def send(self, messages):
+        self.calls.append(messages)
+        if self.failures:
+            raise self.failures.pop(0)
+        yield "ok"
+
+    def run(self, with_message=None):
+        self.cur_messages.append(with_message)
+        try:
+            list(self.send(with_message))
+        except Exception:
+            # Aider swallows send errors and only reports them through its IO
+            return None
+        return "ok"
+
+
+def test_run_with_retries_recovers_from_transient_errors(monkeypatch):
+    """Test that rate limit errors are retried on the same coder and context."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    monkeypatch.setattr(aider_ai_code.time, "sleep", lambda _: None)
+    coder = _FakeCoder([_FakeRateLimitError("busy"), _FakeRateLimitError("busy")])
+
+    error = aider_ai_code._run_with_retries(coder, "do it", ["model-a"], max_retries=3)
+
+    assert error is None
+    assert len(coder.calls) == 3
+    # Failed attempts must not leave duplicate prompts in the chat history
+    assert coder.cur_messages == ["do it"]
+
+
+def test_run_with_retries_fails_over_to_next_model(monkeypatch):
+    """Test that exhausting retries moves on to the next model in the chain."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    switched = []
+    monkeypatch.setattr(aider_ai_code.time, "sleep", lambda _: None)
+    monkeypatch.setattr(
+        aider_ai_code, "_switch_model", lambda coder, name: switched.append(name)
+    )
+    coder = _FakeCoder([_FakeRateLimitError("busy"), _FakeRateLimitError("busy")])
+
+    error = aider_ai_code._run_with_retries(
+        coder, "do it", ["model-a", "model-b"], max_retries=1
+    )
+
+    assert error is None
+    assert switched == ["model-b"]
+    assert len(coder.calls) == 3
+
+
+def test_run_with_retries_leaves_fatal_errors_to_aider(monkeypatch):
+    """Test that a request every model would reject is not retried or failed over."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    switched = []
+    monkeypatch.setattr(
+        aider_ai_code, "_switch_model", lambda coder, name: switched.append(name)
+    )
+    coder = _FakeCoder([ValueError("prompt is too long")])
+
+    error = aider_ai_code._run_with_retries(
+        coder, "do it", ["model-a", "model-b"], max_retries=3
+    )
+
+    assert error is None
+    assert switched == []
+    assert len(coder.calls) == 1
+
+
+def test_prompt_prefix_tracking_replaces_aider_cache_warming():
+    """Test that Aider's warming thread is not started, only the prompt recorded."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    class WarmingCoder:
+        abs_fnames = {"/repo/b.py", "/repo/a.py"}
+        abs_read_only_fnames = {"/repo/c.md"}
+        warmed = []
+
+        def warm_cache(self, chunks):
+            self.warmed.append(chunks)
+
+    coder = WarmingCoder()
+    chunks_seen = aider_ai_code._track_prompt_prefix(coder)
+    coder.warm_cache("chunks")
+
+    assert chunks_seen == ["chunks"]
+    assert coder.warmed == []
+    assert list(coder.abs_fnames) == ["/repo/a.py", "/repo/b.py"]
+
+
+def test_fix_round_reports_provider_errors(monkeypatch):
+    """Test that a provider error during the fix round is not taken for success."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    class FailingVerifier:
+        def verify(self, working_dir, rel_fnames):
+            return {
+                "status": "failed",
+                "checks": [{"command": "lint", "status": "failed", "output": "E1"}],
+            }
+
+    monkeypatch.setattr(aider_ai_code.time, "sleep", lambda _: None)
+    monkeypatch.setattr(
+        aider_ai_code, "_process_coder_results", lambda *args: {"success": True}
+    )
+    coder = _FakeCoder([])
+    assert aider_ai_code._run_with_retries(coder, "do it", ["model-a"]) is None
+
+    coder.failures = [_FakeRateLimitError("busy"), _FakeRateLimitError("busy")]
+    _, verification = aider_ai_code._verify_and_fix(
+        FailingVerifier(), coder, ["a.py"], "/repo", {}, ["model-a"], 1, {}
+    )
+
+    assert "rate_limit error from model-a" in verification["fix_error"]
+    # The fix round retried once, like the first run would have
+    assert len(coder.calls) == 3
+
+
+def test_rollback_removes_files_the_job_created(temp_dir):
+    """Test that a created, git added file is gone after a rollback."""
+    from aider.coders import Coder
+    from aider.models import Model
+
+    from aider_mcp_server.atoms.tools import aider_ai_code
+    from aider_mcp_server.atoms.transaction import FileTransaction, TransactionalIO
+
+    transaction = FileTransaction()
+    io = TransactionalIO(transaction)
+    model = Model("gpt-4o")
+    coder = Coder.create(
+        main_model=model,
+        io=io,
+        repo=aider_ai_code._open_git_repo(io, temp_dir, model),
+        fnames=[],
+        auto_commits=False,
+    )
+    aider_ai_code._journal_new_files(coder)
+
+    # What Aider does when the model edits a file that is not in the chat
+    assert coder.allowed_to_edit("pkg/new.py")
+    new_file = os.path.join(temp_dir, "pkg", "new.py")
+    io.write_text(new_file, "x = 1\n")
+
+    assert aider_ai_code._roll_back(transaction, temp_dir) == [new_file]
+    assert not os.path.exists(new_file)
+    staged = subprocess.run(
+        ["git", "diff", "--cached", "--name-only"],
+        cwd=temp_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert staged.stdout == ""
+
+
+def test_failover_models_go_through_the_provider_profile(monkeypatch):
+    """Test that fallbacks are mapped and configured like the primary model."""
+    from aider_mcp_server.atoms import providers
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    profile = providers.ProviderProfile(
+        model_provider="vertex_ai",
+        providers={"vertex_ai": {"vertex_location": "us-east5"}},
+    )
+    monkeypatch.setattr(providers, "_profile", profile)
+    monkeypatch.setattr(aider_ai_code, "_validate_model", lambda name: (True, []))
+
+    chain = aider_ai_code._model_chain(
+        "vertex_ai/gemini-2.5-pro", ["gemini/gemini-2.5-pro", "openai/gpt-4o"]
+    )
+    assert chain == ["vertex_ai/gemini-2.5-pro", "vertex_ai/gpt-4o"]
+
+    coder = _FakeCoder([])
+    aider_ai_code._switch_model(coder, chain[1])
+    assert coder.main_model.name == "vertex_ai/gpt-4o"
+    assert coder.main_model.extra_params["vertex_location"] == "us-east5"
+
+
+MOCK_MODEL_ID = "gpt-4o"
+MOCK_EDITOR_MODEL_ID = "gpt-4o-mini"
+
+GREET_EDIT = (
+    "greet.py\n```python\n<<<<<<< SEARCH\n# greeting helpers\n=======\n"
+    "# greeting helpers\ndef greet():\n    return 'hi'\n>>>>>>> REPLACE\n```\n"
+)
+
+
+@pytest.fixture
+def mock_llm_response(monkeypatch):
+    """Make Aider models answer with canned responses (by model name) offline."""
+    from aider.models import Model
+
+    responses = {}
+    original_init = Model.__init__
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        if self.name in responses:
+            self.extra_params = dict(self.extra_params or {})
+            self.extra_params["mock_response"] = responses[self.name]
+
+    monkeypatch.setattr(Model, "__init__", init)
+    return responses
+
+
+def test_code_with_aider_does_not_depend_on_process_cwd(
+    temp_dir, tmp_path, monkeypatch, mock_llm_response
+):
+    """Test that relative paths resolve against working_dir, not the process CWD."""
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+    monkeypatch.chdir(tmp_path)
+
+    result = code_with_aider(
+        ai_coding_prompt="Add a greet function.",
+        relative_editable_files=["greet.py"],
+        model=MOCK_MODEL_ID,
+        working_dir=temp_dir,
+    )
+
+    result_dict = json.loads(result)
+    assert result_dict["success"] is True
+    assert "+def greet():" in result_dict["diff"]
+    assert os.getcwd() == str(tmp_path)
+    assert not (tmp_path / "greet.py").exists()
+
+
+def test_architect_plans_once_and_editor_applies_changes(temp_dir, mock_llm_response):
+    """Test that the architect's plan is applied by the editor model."""
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = "Add a greet() function returning 'hi'."
+    mock_llm_response[MOCK_EDITOR_MODEL_ID] = GREET_EDIT
+
+    result = code_with_aider(
+        ai_coding_prompt="Add a greet function.",
+        relative_editable_files=["greet.py"],
+        model=MOCK_MODEL_ID,
+        working_dir=temp_dir,
+        architect=True,
+        editor_model=MOCK_EDITOR_MODEL_ID,
+    )
+
+    result_dict = json.loads(result)
+    assert result_dict["success"] is True
+    assert "+def greet():" in result_dict["diff"]
+    assert result_dict["usage"]["llm_calls"] == 2
+    assert "plan" in result_dict["timings"]
+    assert "edit" in result_dict["timings"]
+
+
+def test_architect_runs_one_editor_per_file(temp_dir, mock_llm_response, monkeypatch):
+    """Test that every file group gets its own editor with the shared plan."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    mock_llm_response[MOCK_MODEL_ID] = "Rename x to y everywhere."
+    calls = []
+
+    def run_editor(plan, fnames, model_chain, *args):
+        calls.append((plan, tuple(fnames), model_chain[0]))
+        return {"llm_calls": 1, "cost": 0.5}, "boom" if "c.py" in fnames else None
+
+    monkeypatch.setattr(aider_ai_code, "_run_editor", run_editor)
+    groups = aider_ai_code._group_files(["a.py", "b.py", "c.py"], [["a.py", "b.py"]])
+
+    usage, sub_jobs, error = aider_ai_code._run_fan_out(
+        "Rename x to y.",
+        groups,
+        [],
+        [MOCK_MODEL_ID],
+        [MOCK_EDITOR_MODEL_ID],
+        temp_dir,
+        0,
+        {},
+    )
+
+    assert sorted(fnames for _, fnames, _ in calls) == [("a.py", "b.py"), ("c.py",)]
+    assert {plan for plan, _, _ in calls} == {"Rename x to y everywhere."}
+    assert {model for _, _, model in calls} == {MOCK_EDITOR_MODEL_ID}
+    assert [job["success"] for job in sub_jobs] == [True, False]
+    assert error == "['c.py']: boom"
+    assert usage["llm_calls"] == 3
+    assert usage["cost"] >= 1.0
+
+
+def test_group_files_rejects_overlapping_groups():
+    """Test that a file can only be edited by one fan-out sub-job."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    assert aider_ai_code._group_files(["a.py", "b.py"], None) == [["a.py"], ["b.py"]]
+    with pytest.raises(ValueError):
+        aider_ai_code._group_files(["a.py", "b.py"], [["a.py"], ["a.py", "b.py"]])
+    with pytest.raises(ValueError):
+        aider_ai_code._group_files(["a.py"], [["other.py"]])
+
+
+def test_fan_out_edits_with_the_main_model(temp_dir, mock_llm_response):
+    """Test that fan-out mode plans and edits with the requested model."""
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    # The same canned answer serves as plan and as edit
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+
+    result = code_with_aider(
+        ai_coding_prompt="Add a greet function.",
+        relative_editable_files=["greet.py"],
+        model=MOCK_MODEL_ID,
+        working_dir=temp_dir,
+        fan_out=True,
+    )
+
+    result_dict = json.loads(result)
+    assert result_dict["success"] is True
+    assert "+def greet():" in result_dict["diff"]
+    assert result_dict["sub_jobs"] == [
+        {"files": ["greet.py"], "success": True, "error": None}
+    ]
+
+
+def test_code_with_aider_applies_request_settings(temp_dir, mock_llm_response):
+    """Test that per-request Aider settings reach the coder."""
+    from aider.coders import Coder
+
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+    coders = []
+    original_create = Coder.create
+
+    def create(*args, **kwargs):
+        coder = original_create(*args, **kwargs)
+        coders.append(coder)
+        return coder
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(Coder, "create", create)
+        result = code_with_aider(
+            ai_coding_prompt="Add a greet function.",
+            relative_editable_files=["greet.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            map_tokens=0,
+            edit_format="diff",
+            max_reflections=1,
+            stream=False,
+        )
+
+    assert json.loads(result)["success"] is True
+    (coder,) = coders
+    assert coder.repo_map is None
+    assert coder.edit_format == "diff"
+    assert coder.max_reflections == 1
+    assert coder.stream is False
+
+
+def test_prompt_files_are_listed_in_sorted_order():
+    """Test that file sets iterate sorted so prompt prefixes are reproducible."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    files = aider_ai_code._SortedSet(["/r/c.py", "/r/a.py", "/r/b.py"])
+    files.add("/r/0.py")
+    assert list(files) == ["/r/0.py", "/r/a.py", "/r/b.py", "/r/c.py"]
+
+    usage = {"prompt_tokens": 200, "cache_hit_tokens": 150}
+    aider_ai_code._add_cache_hit_rate(usage)
+    assert usage["cache_hit_rate"] == 0.75
+
+
+def test_session_keeps_the_coder_between_turns(temp_dir, tmp_path, mock_llm_response):
+    """Test that a follow-up turn reuses the coder and its chat history."""
+    from aider_mcp_server.atoms.sessions import configure_session_table
+
+    table = configure_session_table(persist_dir=str(tmp_path / "sessions"))
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+
+    first = json.loads(
+        code_with_aider(
+            ai_coding_prompt="Add a greet function.",
+            relative_editable_files=["greet.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            session_id="greeter",
+        )
+    )
+    assert first["success"] is True
+    assert first["session_turn"] == 1
+
+    coder = table._sessions["greeter"].coder
+    assert any("Add a greet function." in m["content"] for m in coder.done_messages)
+    coder.main_model.extra_params["mock_response"] = (
+        "greet.py\n```python\n<<<<<<< SEARCH\n    return 'hi'\n=======\n"
+        "    return 'hello'\n>>>>>>> REPLACE\n```\n"
+    )
+
+    second = json.loads(
+        code_with_aider(
+            ai_coding_prompt="Now say hello instead.",
+            relative_editable_files=["greet.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            session_id="greeter",
+        )
+    )
+    assert second["success"] is True
+    assert second["session_turn"] == 2
+    assert table._sessions["greeter"].coder is coder
+    assert "+    return 'hello'" in second["diff"]
+    assert second["usage"]["llm_calls"] == 1
+
+    table.close()
+    assert (tmp_path / "sessions" / "greeter.json").exists()
+
+
+def test_session_turns_switch_models_and_roll_back_history(
+    temp_dir, tmp_path, monkeypatch, mock_llm_response
+):
+    """Test that a turn uses its own model and a failed turn leaves no history."""
+    from aider_mcp_server.atoms.sessions import configure_session_table
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    table = configure_session_table(persist_dir=str(tmp_path / "sessions"))
+    greet_path = os.path.join(temp_dir, "greet.py")
+    with open(greet_path, "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+    mock_llm_response[MOCK_EDITOR_MODEL_ID] = (
+        "greet.py\n```python\n<<<<<<< SEARCH\n    return 'hi'\n=======\n"
+        "    return 'hello'\n>>>>>>> REPLACE\n```\n"
+    )
+
+    def turn(prompt, model):
+        return json.loads(
+            code_with_aider(
+                ai_coding_prompt=prompt,
+                relative_editable_files=["greet.py"],
+                model=model,
+                working_dir=temp_dir,
+                session_id="greeter",
+            )
+        )
+
+    assert turn("Add a greet function.", MOCK_MODEL_ID)["success"] is True
+    second = turn("Now say hello instead.", MOCK_EDITOR_MODEL_ID)
+    assert second["success"] is True
+    coder = table._sessions["greeter"].coder
+    assert coder.main_model.name == MOCK_EDITOR_MODEL_ID
+    history = list(coder.done_messages)
+    with open(greet_path) as f:
+        content = f.read()
+
+    def fail_after_edit(coder, prompt, model_chain, max_retries):
+        coder.cur_messages.append({"role": "user", "content": prompt})
+        coder.io.write_text(greet_path, "broken\n")
+        return "rate_limit error from gpt-4o: busy"
+
+    monkeypatch.setattr(aider_ai_code, "_run_with_retries", fail_after_edit)
+    third = turn("Break it.", MOCK_EDITOR_MODEL_ID)
+
+    assert third["success"] is False
+    assert third["rolled_back_files"] == ["greet.py"]
+    with open(greet_path) as f:
+        assert f.read() == content
+    assert table._sessions["greeter"].coder is coder
+    assert coder.done_messages == history
+    assert coder.cur_messages == []
+    table.close()
+
+
+def test_dry_run_leaves_the_working_tree_untouched(temp_dir, mock_llm_response):
+    """Test that a dry run returns the proposed diff without writing files."""
+    greet_path = os.path.join(temp_dir, "greet.py")
+    with open(greet_path, "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = GREET_EDIT
+
+    result = json.loads(
+        code_with_aider(
+            ai_coding_prompt="Add a greet function.",
+            relative_editable_files=["greet.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            dry_run=True,
+        )
+    )
+
+    assert result["success"] is True
+    assert result["dry_run"] is True
+    assert "+def greet():" in result["diff"]
+    with open(greet_path) as f:
+        assert f.read() == "# greeting helpers\n"
+
+    missing = json.loads(
+        code_with_aider(
+            ai_coding_prompt="Add a greet function.",
+            relative_editable_files=["new.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            dry_run=True,
+        )
+    )
+    assert missing["success"] is False
+    assert not os.path.exists(os.path.join(temp_dir, "new.py"))
+
+
+def test_dry_run_does_not_create_files_outside_the_request(temp_dir, mock_llm_response):
+    """Test that a dry run proposing a new file leaves the tree and index alone."""
+    with open(os.path.join(temp_dir, "greet.py"), "w") as f:
+        f.write("# greeting helpers\n")
+    subprocess.run(["git", "add", "greet.py"], cwd=temp_dir, check=True)
+    subprocess.run(["git", "commit", "-m", "Add greet.py"], cwd=temp_dir, check=True)
+    mock_llm_response[MOCK_MODEL_ID] = (
+        "extra.py\n```python\n<<<<<<< SEARCH\n=======\nX = 1\n>>>>>>> REPLACE\n```\n"
+    )
+
+    json.loads(
+        code_with_aider(
+            ai_coding_prompt="Add a module.",
+            relative_editable_files=["greet.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+            dry_run=True,
+            max_reflections=0,
+        )
+    )
+
+    assert not os.path.exists(os.path.join(temp_dir, "extra.py"))
+    staged = subprocess.run(
+        ["git", "diff", "--cached", "--name-only"],
+        cwd=temp_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert staged.stdout == ""
+
+
+def test_failed_job_rolls_back_its_edits(temp_dir, monkeypatch):
+    """Test that edits made before a job fails are undone in one step."""
+    from aider_mcp_server.atoms.tools import aider_ai_code
+
+    greet_path = os.path.join(temp_dir, "greet.py")
+    with open(greet_path, "w") as f:
+        f.write("# greeting helpers\n")
+
+    def fail_after_edit(coder, prompt, model_chain, max_retries):
+        coder.io.write_text(greet_path, "def greet(:\n")
+        coder.io.write_text(os.path.join(temp_dir, "extra.py"), "x = 1\n")
+        return "server error from gpt-4o: boom"
+
+    monkeypatch.setattr(aider_ai_code, "_run_with_retries", fail_after_edit)
+
+    result = json.loads(
+        code_with_aider(
+            ai_coding_prompt="Add a greet function.",
+            relative_editable_files=["greet.py", "created.py"],
+            model=MOCK_MODEL_ID,
+            working_dir=temp_dir,
+        )
+    )
+
+    assert result["success"] is False
+    assert result["rolled_back_files"] == ["created.py", "extra.py", "greet.py"]
+    with open(greet_path) as f:
+        assert f.read() == "# greeting helpers\n"
+    assert not os.path.exists(os.path.join(temp_dir, "created.py"))
+    assert not os.path.exists(os.path.join(temp_dir, "extra.py"))
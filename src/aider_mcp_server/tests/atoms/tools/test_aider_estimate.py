@@ -0,0 +1,114 @@
+import pytest
+
+from aider_mcp_server.atoms import providers
+from aider_mcp_server.atoms.tools import aider_estimate
+from aider_mcp_server.atoms.tools.aider_estimate import (
+    BYTES_PER_TOKEN,
+    MAX_TOKENIZED_BYTES,
+    PROMPT_OVERHEAD_TOKENS,
+    estimate_context,
+    trim_readonly_files,
+)
+
+MODEL = "gpt-4o"
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Create a small editable file and two read-only files of different sizes."""
+    (tmp_path / "main.py").write_text("print('hello')\n")
+    (tmp_path / "small.md").write_text("notes " * 100)
+    (tmp_path / "large.md").write_text("reference " * 2000)
+    return tmp_path
+
+
+def test_estimate_counts_files_against_context_limit(files):
+    """Test that the estimate adds up file, prompt, map and overhead tokens."""
+    estimate = estimate_context(
+        ["main.py", "new.py"],
+        ["small.md", "large.md", "missing.md"],
+        MODEL,
+        str(files),
+        ai_coding_prompt="Say hello",
+        map_tokens=0,
+    )
+
+    assert estimate["files"]["new.py"]["tokens"] == 0
+    assert (
+        estimate["files"]["large.md"]["tokens"]
+        > estimate["files"]["small.md"]["tokens"]
+    )
+    assert estimate["missing_files"] == ["missing.md"]
+    assert estimate["total_tokens"] == (
+        PROMPT_OVERHEAD_TOKENS
+        + estimate["prompt_tokens"]
+        + sum(f["tokens"] for f in estimate["files"].values())
+    )
+    assert estimate["max_input_tokens"] > estimate["total_tokens"]
+    assert estimate["fits"] is True
+
+
+def test_token_counts_are_memoized_by_content(files, monkeypatch):
+    """Test that unchanged content is not tokenized twice."""
+    content = (files / "large.md").read_bytes()
+    first = aider_estimate.count_tokens(MODEL, content)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("tokenizer called for cached content")
+
+    monkeypatch.setattr(aider_estimate._model(MODEL), "token_count", fail)
+    assert aider_estimate.count_tokens(MODEL, content) == first
+
+
+def test_large_content_is_estimated_from_its_size(monkeypatch):
+    """Test that content above the cap is never handed to the tokenizer."""
+
+    def fail(*args, **kwargs):
+        raise AssertionError("tokenizer called for oversized content")
+
+    monkeypatch.setattr(aider_estimate._model(MODEL), "token_count", fail)
+    content = b"x" * (MAX_TOKENIZED_BYTES + 8)
+    assert aider_estimate.count_tokens(MODEL, content) == (
+        len(content) // BYTES_PER_TOKEN
+    )
+
+
+def test_models_are_resolved_through_the_provider_profile(monkeypatch):
+    """Test that estimates use the model and settings code_with_aider would run."""
+    profile = providers.ProviderProfile(
+        model_provider="openai", providers={"openai": {"timeout": 10}}
+    )
+    monkeypatch.setattr(providers, "_profile", profile)
+    aider_estimate._model.cache_clear()
+    try:
+        model = aider_estimate._model(MODEL)
+        assert model.name == f"openai/{MODEL}"
+        assert model.extra_params["timeout"] == 10
+    finally:
+        aider_estimate._model.cache_clear()
+
+
+def test_trim_drops_largest_readonly_files_first(files):
+    """Test that oversize requests lose their largest read-only files first."""
+    estimate = estimate_context(
+        ["main.py"], ["small.md", "large.md"], MODEL, str(files), map_tokens=0
+    )
+    # Pretend the model only has room for everything but large.md
+    estimate["max_input_tokens"] = (
+        estimate["total_tokens"] - estimate["files"]["large.md"]["tokens"]
+    )
+    estimate["fits"] = False
+
+    assert trim_readonly_files(estimate) == ["large.md"]
+    assert estimate["fits"] is True
+    assert "small.md" in estimate["files"]
+
+
+def test_trim_cannot_shrink_editable_files(files):
+    """Test that a request whose editable files alone are too big still fails."""
+    estimate = estimate_context(["main.py"], ["small.md"], MODEL, str(files))
+    estimate["max_input_tokens"] = 10
+    estimate["fits"] = False
+
+    assert trim_readonly_files(estimate) == ["small.md"]
+    assert estimate["fits"] is False
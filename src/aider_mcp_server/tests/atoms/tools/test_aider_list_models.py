@@ -1,4 +1,4 @@
-from aider_mcp_server.atoms.tools.aider_list_models import list_models
+from aider_mcp_server.atoms.tools.aider_list_models import list_models, search_models
 
 
 def test_list_models_openai():
@@ -27,3 +27,13 @@ def test_list_models_nonexistent():
     """Test that list_models with a nonexistent model returns an empty list."""
     models = list_models("this_model_does_not_exist_12345")
     assert len(models) == 0, "Expected to get no models with a nonexistent model name"
+
+
+def test_search_models_returns_metadata_pages():
+    """Test that search_models returns one page of models with their metadata."""
+    page = search_models("gpt-4o", provider="openai", limit=2)
+    assert len(page["models"]) == 2
+    assert page["models"][0]["name"] == "openai/gpt-4o"
+    assert page["models"][0]["context_window"] > 0
+    assert page["total"] > 2
+    assert page["next_offset"] == 2
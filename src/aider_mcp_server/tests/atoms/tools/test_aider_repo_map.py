@@ -0,0 +1,95 @@
+import subprocess
+
+import pytest
+
+from aider_mcp_server.atoms.symbol_index import configure_symbol_index
+from aider_mcp_server.atoms.tools.aider_repo_map import repo_map, symbol_search
+from aider_mcp_server.server import handle_request
+
+FILES = {
+    "app/models.py": (
+        "class User:\n    pass\n\n\nclass UserProfile:\n    owner = User()\n"
+    ),
+    "app/service.py": "from app.models import User\n\n\ndef load(name):\n"
+    "    return User(name)\n",
+    "scripts/cli.py": "def main():\n    pass\n",
+}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A small git repository with an in-memory symbol index."""
+    for name, content in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
+    configure_symbol_index(None)
+    return str(tmp_path)
+
+
+def test_repo_map_outlines_files(repo):
+    """Test that the map lists each file's definitions with 1-based lines."""
+    result = repo_map(repo, path_prefix="app/")
+    assert result["total_files"] == 2
+    assert result["files"][0] == {
+        "path": "app/models.py",
+        "definitions": [
+            {"name": "User", "line": 1},
+            {"name": "UserProfile", "line": 5},
+        ],
+    }
+
+    truncated = repo_map(repo, max_files=1)
+    assert truncated["truncated"] is True
+    assert len(truncated["files"]) == 1
+
+
+def test_repo_map_focus_files(repo):
+    """Test that focus files limit the map to the files they depend on."""
+    result = repo_map(repo, focus_files=["app/service.py"])
+    assert [f["path"] for f in result["files"]] == ["app/models.py"]
+
+
+def test_symbol_search_ranks_exact_matches_first(repo):
+    """Test that exact matches come before longer names containing the query."""
+    result = symbol_search(repo, "user", include_references=True)
+    assert result["matches"] == [
+        {
+            "name": "User",
+            "path": "app/models.py",
+            "line": 1,
+            "referenced_by": ["app/models.py", "app/service.py"],
+        },
+        {
+            "name": "UserProfile",
+            "path": "app/models.py",
+            "line": 5,
+            "referenced_by": [],
+        },
+    ]
+    assert symbol_search(repo, "user", limit=1)["matches"][0]["name"] == "User"
+    assert symbol_search(repo, "nothing")["matches"] == []
+
+
+def test_handle_request_routes_both_tools(repo, monkeypatch):
+    """Test that the request router serves repo_map and symbol_search."""
+    # handle_request changes into the repository
+    monkeypatch.chdir(repo)
+    outline = handle_request(
+        {"name": "repo_map", "parameters": {"path_prefix": "scripts/"}},
+        repo,
+        "gpt-4o",
+    )
+    assert [f["path"] for f in outline["files"]] == ["scripts/cli.py"]
+
+    found = handle_request(
+        {"name": "symbol_search", "parameters": {"query": "load"}}, repo, "gpt-4o"
+    )
+    assert [m["name"] for m in found["matches"]] == ["load"]
+
+    invalid = handle_request(
+        {"name": "symbol_search", "parameters": {}}, repo, "gpt-4o"
+    )
+    assert invalid["error"].startswith("Invalid parameters")